@@ -0,0 +1,264 @@
+"""
+Run the reference engine (Train.move through Logic.simulate) and the alternative engines
+on the same seeded network and fleet, compare the state of every train after every tick
+and report the divergence and the throughput of every engine.
+
+All engines draw their delays from the same counter-based streams (CounterRandom), so
+an engine that behaves exactly like the reference gives the same trajectories. The
+coverage line shows how often the trains exercised the corner cases of the reference:
+turning around at the last stations (Train.set_station), the last stations added by
+Logic.create_last_stations and the stations without a delay probability in the stations
+file (0 by Logic.populate_probabilities; the synthetic network drops some on purpose).
+
+Run from the repository root:
+    python -m benchmarks.equivalence -datasets small stockholm synthetic -trains 1000 -ticks 200
+    python -m benchmarks.equivalence -datasets synthetic -lines 64 -stations 200 -trains 100000 -ticks 20
+"""
+import argparse
+import sys
+import time
+from typing import Callable, Iterator
+from classes.blocking import TrackBlocking
+from classes.compiled import CompiledNetwork, FleetState
+from classes.fastforward import FastForward
+from classes.logic import Logic
+from classes.shard import ShardedSimulation
+from classes.shared import SharedPool, SharedState
+from classes.snapshot import SimulationState
+from classes.streams import CounterRandom
+from classes.synthetic import SyntheticNetwork
+from classes.train import Train
+
+# an engine yields a function returning its state: first after the setup, then after every tick
+Engine = Iterator[Callable[[], FleetState]]
+
+
+def reference(connections: list[str], stations: list[str], args, streams: CounterRandom) -> Engine:
+    """
+    Train objects moved by Logic.simulate
+    """
+    logic = Logic()
+    lines, network = logic.build_network(connections, stations)
+    trains: list[Train] = logic.generate_trains(args.trains, network, streams)
+    compiled: CompiledNetwork = logic.compile_network(network)
+    blocking = TrackBlocking(lines, trains) if args.blocking else None
+    yield lambda: FleetState.from_trains(compiled, trains)
+    for tick in range(args.ticks):
+        trains = logic.simulate(trains, tick, blocking, streams)
+        yield lambda: FleetState.from_trains(compiled, trains)
+
+
+def compiled(connections: list[str], stations: list[str], args, streams: CounterRandom) -> Engine:
+    """
+    CompiledNetwork.step on a FleetState
+    """
+    logic = Logic()
+    _, network = logic.build_network(connections, stations)
+    compiled_network: CompiledNetwork = logic.compile_network(network)
+    fleet = FleetState.from_trains(compiled_network, logic.generate_trains(args.trains, network, streams))
+    occupied = compiled_network.occupancy(fleet) if args.blocking else None
+    yield lambda: fleet
+    for tick in range(args.ticks):
+        compiled_network.step(fleet, tick=tick, occupied=occupied, streams=streams)
+        yield lambda: fleet
+
+
+def snapshot(connections: list[str], stations: list[str], args, streams: CounterRandom) -> Engine:
+    """
+    SimulationState.step, copying and publishing the fleet every tick
+    """
+    logic = Logic()
+    _, network = logic.build_network(connections, stations)
+    state = SimulationState(logic.compile_network(network), logic.generate_trains(args.trains, network, streams))
+    yield state.snapshot().fleet
+    for tick in range(args.ticks):
+        # one draw per train in fleet order, like CompiledNetwork.step
+        draws = iter(streams.uniforms(state.snapshot().fleet().table("id"), tick))
+        state.step(tick, draws.__next__)
+        yield state.snapshot().fleet
+
+
+def fast_forward(connections: list[str], stations: list[str], args, streams: CounterRandom) -> Engine:
+    """
+    FastForward.fleet replaying the streams, one tick at a time
+    """
+    logic = Logic()
+    _, network = logic.build_network(connections, stations)
+    compiled_network: CompiledNetwork = logic.compile_network(network)
+    fleet = FleetState.from_trains(compiled_network, logic.generate_trains(args.trains, network, streams))
+    forward = FastForward(compiled_network)
+    yield lambda: fleet
+    for tick in range(args.ticks):
+        forward.fleet(fleet, 1, tick=tick, streams=streams)
+        yield lambda: fleet
+
+
+def shared(connections: list[str], stations: list[str], args, streams: CounterRandom) -> Engine:
+    """
+    SharedPool workers stepping ranges of a fleet in shared memory
+    """
+    logic = Logic()
+    _, network = logic.build_network(connections, stations)
+    compiled_network: CompiledNetwork = logic.compile_network(network)
+    state = SharedState.export(
+        compiled_network, FleetState.from_trains(compiled_network, logic.generate_trains(args.trains, network, streams)))
+    try:
+        with SharedPool(state, args.workers) as pool:
+            yield state.fleet
+            for _ in range(args.ticks):
+                pool.advance(1, streams=streams)
+                yield state.fleet
+    finally:
+        state.close()
+
+
+def sharded(connections: list[str], stations: list[str], args, streams: CounterRandom) -> Engine:
+    """
+    ShardedSimulation workers simulating the trains of their own lines
+    """
+    logic = Logic()
+    _, network = logic.build_network(connections, stations)
+    compiled_network: CompiledNetwork = logic.compile_network(network)
+    trains: list[Train] = logic.generate_trains(args.trains, network, streams)
+    with ShardedSimulation(connections, stations, trains, args.workers, streams=streams) as simulation:
+        # wait for the workers to build their network
+        simulation.train_states()
+        yield lambda: FleetState.from_trains(compiled_network, trains)
+        for _ in range(args.ticks):
+            simulation.advance(1)
+            simulation.sync(trains)
+            yield lambda: FleetState.from_trains(compiled_network, trains)
+
+
+ENGINES: dict[str, Callable[..., Engine]] = {
+    "compiled": compiled, "snapshot": snapshot, "fastforward": fast_forward,
+    "shared": shared, "sharded": sharded,
+}
+# engines that support trains blocking each other
+BLOCKING: tuple[str, ...] = ("compiled",)
+
+
+def dataset(name: str, args) -> tuple[list[str], list[str]]:
+    """
+    Get the connections and stations file lines of a dataset
+    """
+    logic = Logic()
+    if name == "small":
+        return logic.read_data("connections.txt"), logic.read_data("stations.txt")
+    if name == "stockholm":
+        return logic.read_data("stockholm_connections.txt"), logic.read_data("stockholm_stations.txt")
+    network = SyntheticNetwork(args.lines, args.stations, _seed=args.seed)
+    stations: list[str] = network.stations()
+    if args.missing > 0:
+        stations = [line for index, line in enumerate(stations) if (index + 1) % args.missing]
+    return network.connections(), stations
+
+
+def coverage(connections: list[str], stations: list[str], states: list[FleetState]) -> str:
+    """
+    Count the turnarounds, the visits of added last stations and of stations without a delay
+    probability in the reference trajectory
+    """
+    logic = Logic()
+    _, network = logic.build_network(connections, stations)
+    stations_objects = logic.compile_network(network).stations()
+    named: set[str] = {line.split(",")[0] for line in stations}
+    last: set[int] = {index for index, station in enumerate(stations_objects) if not station.next_station()}
+    missing: set[int] = {index for index, station in enumerate(stations_objects) if station.name() not in named}
+    turnarounds, last_visits, missing_visits = 0, 0, 0
+    for before, after in zip(states, states[1:]):
+        turnarounds += sum(x != y for x, y in zip(before.table("direction"), after.table("direction")))
+        last_visits += sum(x in last for x in after.table("station"))
+        missing_visits += sum(x in missing for x in after.table("station"))
+    return (f"{turnarounds} turnarounds, {last_visits} visits of {len(last)} added last stations, "
+            f"{missing_visits} visits of {len(missing)} stations without delay probability")
+
+
+def compare(expected: FleetState, actual: FleetState) -> list[int]:
+    """
+    Get the ids of the trains whose station, direction or delay differ
+    """
+    if list(expected.table("id")) != list(actual.table("id")):
+        return list(expected.table("id"))
+    return [train for train, *pair in zip(
+        expected.table("id"),
+        zip(expected.table("station"), actual.table("station")),
+        zip(expected.table("direction"), actual.table("direction")),
+        zip(expected.table("delayed"), actual.table("delayed")))
+        if any(x != y for x, y in pair)]
+
+
+def run(name: str, args) -> bool:
+    """
+    Run the reference and the alternative engines tick by tick on a dataset, print the report
+    and return whether all engines matched the reference
+    """
+    connections, stations = dataset(name, args)
+    streams = CounterRandom(args.seed)
+    names: list[str] = [x for x in args.engines if not args.blocking or x in BLOCKING]
+    engines: dict[str, Engine] = {"reference": reference(connections, stations, args, streams)}
+    engines.update((x, ENGINES[x](connections, stations, args, streams)) for x in names)
+    seconds: dict[str, float] = {x: 0.0 for x in engines}
+    # divergent ticks, divergent train-steps and the first (tick, train id), by engine
+    divergent: dict[str, list] = {x: [0, 0, None] for x in names}
+    history: list[FleetState] = []
+
+    # tick -1 is the generated fleet, the setup is not timed
+    for tick in range(-1, args.ticks):
+        states: dict[str, FleetState] = {}
+        for engine, steps in engines.items():
+            start: float = time.perf_counter()
+            state = next(steps)
+            if tick >= 0:
+                seconds[engine] += time.perf_counter() - start
+            states[engine] = state()
+        # the reference state is a new FleetState every tick
+        expected: FleetState = states["reference"]
+        if tick < args.coverage_ticks:
+            history.append(expected)
+        for engine in names:
+            different: list[int] = compare(expected, states[engine])
+            if different:
+                divergent[engine][0] += 1
+                divergent[engine][1] += len(different)
+                if divergent[engine][2] is None:
+                    divergent[engine][2] = (tick, different[0])
+    for steps in engines.values():
+        steps.close()
+
+    print(f"\n{name}: {len(stations)} stations file lines, {args.trains} trains, {args.ticks} ticks"
+          f"{', blocking' if args.blocking else ''}")
+    print(f"coverage: {coverage(connections, stations, history)}")
+    print(f"{'engine':>12} {'train-steps/s':>14} {'divergent ticks':>16} {'train-steps':>12} {'first (tick, train)':>20}")
+    matched: bool = True
+    for engine in engines:
+        rate: float = args.trains * args.ticks / seconds[engine] if seconds[engine] > 0 else float("inf")
+        if engine == "reference":
+            print(f"{engine:>12} {rate:>14,.0f} {'-':>16} {'-':>12} {'-':>20}")
+            continue
+        ticks, train_steps, first = divergent[engine]
+        matched = matched and ticks == 0
+        print(f"{engine:>12} {rate:>14,.0f} {ticks:>16} {train_steps:>12} {str(first or '-'):>20}")
+    return matched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-datasets', type=str, nargs="+", choices=["small", "stockholm", "synthetic"],
+                        default=["small", "stockholm", "synthetic"])
+    parser.add_argument('-engines', type=str, nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument('-trains', type=int, default=1000)
+    parser.add_argument('-ticks', type=int, default=100)
+    parser.add_argument('-seed', type=int, default=0)
+    parser.add_argument('-workers', type=int, default=2)
+    parser.add_argument('-blocking', action="store_true", help="trains block each other (compiled engine only)")
+    parser.add_argument('-lines', type=int, default=16, help="lines of the synthetic network")
+    parser.add_argument('-stations', type=int, default=50, help="stations per line of the synthetic network")
+    parser.add_argument('-missing', type=int, default=10,
+                        help="drop every n-th delay probability of the synthetic network, 0 keeps all")
+    parser.add_argument('-coverage-ticks', type=int, default=1000,
+                        help="ticks of the reference trajectory kept for the coverage counts")
+    args = parser.parse_args()
+
+    results: list[bool] = [run(name, args) for name in args.datasets]
+    sys.exit(0 if all(results) else 1)
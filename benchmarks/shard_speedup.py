@@ -0,0 +1,50 @@
+"""
+Compare serial and line-sharded simulation on a multi-line synthetic network.
+
+Run from the repository root:
+    python -m benchmarks.shard_speedup -lines 32 -stations 40 -trains 200000 -ticks 20
+"""
+import argparse
+import multiprocessing
+import random
+import time
+from classes.logic import Logic
+from classes.shard import ShardedSimulation
+from classes.synthetic import SyntheticNetwork
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-lines', type=int, default=32)
+    parser.add_argument('-stations', type=int, default=40)
+    parser.add_argument('-trains', type=int, default=200000)
+    parser.add_argument('-ticks', type=int, default=20)
+    parser.add_argument('-workers', type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args()
+
+    random.seed(0)
+    Lgc = Logic()
+    network = SyntheticNetwork(args.lines, args.stations)
+    connections, stations = network.connections(), network.stations()
+    _, STATIONS = Lgc.build_network(connections, stations)
+    TRAINS = Lgc.generate_trains(args.trains, STATIONS)
+
+    with ShardedSimulation(connections, stations, TRAINS, args.workers, seed=0) as sharded:
+        # wait for the workers to build their network before timing
+        sharded.train_states()
+        start = time.perf_counter()
+        sharded.advance(args.ticks)
+        sharded.sync(TRAINS)
+        sharded_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        Lgc.simulate(TRAINS)
+    serial_time = time.perf_counter() - start
+
+    train_steps = args.trains * args.ticks
+    print(f"{args.lines} lines, {len(STATIONS)} stations, {args.trains} trains, {args.ticks} ticks")
+    print(f"serial:  {serial_time:.2f}s ({train_steps / serial_time:,.0f} train-steps/s)")
+    print(f"sharded: {sharded_time:.2f}s ({train_steps / sharded_time:,.0f} train-steps/s) "
+          f"on {args.workers} workers")
+    print(f"speed-up: {serial_time / sharded_time:.2f}x")
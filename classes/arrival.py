@@ -0,0 +1,201 @@
+import math
+import random
+from typing import Union
+from classes.compiled import CompiledNetwork
+
+# largest route length * timesteps computed exactly before falling back to Monte Carlo
+EXACT_LIMIT: int = 2_000_000
+# number of Monte Carlo samples of the fallback
+SAMPLES: int = 10_000
+
+
+class ArrivalProbability:
+    """
+    A class to compute the probability of completing a route within "t" timesteps
+    when trains are delayed like in the simulation.
+
+    A route is the shortest route between two stations (see CompiledNetwork.hub_path),
+    taking on every hop the line whose station is least likely to delay. Every tick
+    at a station the train is delayed with that station's delay probability,
+    otherwise it moves to the next station of the route; changing lines costs no
+    time. The probability is computed exactly over (station, elapsed time)
+    distributions, or estimated by Monte Carlo for long routes.
+    Routes and results are memoized.
+
+    ...
+
+    Attributes
+    ----------
+    _network (CompiledNetwork): network the trains run on
+    _routes (dict[tuple[int, int], list[int]]): station ids of the route, by (origin hub, destination hub)
+    _results (dict[tuple, float]): computed probabilities, by route and query
+
+    Methods
+    -------
+    route():
+        Returns the station ids of the route between two stations
+    distribution():
+        Returns the probability of arriving at each elapsed time
+    sample():
+        Returns a Monte Carlo estimate of arriving in time
+    probability():
+        Returns the probability of completing the route between two stations in time
+    """
+
+    def __init__(self, _network: CompiledNetwork):
+        """
+        Constructs the memoization tables of a network.
+
+        Parameters
+        ----------
+        _network (CompiledNetwork): network the trains run on
+        """
+        self._network: CompiledNetwork = _network
+        self._routes: dict[tuple[int, int], list[int]] = {}
+        self._results: dict[tuple, float] = {}
+
+    def route(self, origin: str, destination: str) -> list[int]:
+        """
+        Get the station ids of the shortest route between two stations: the station
+        the train leaves from on every hop, followed by the destination station
+
+        Parameters
+        ----------
+        origin (str): origin station name
+        destination (str): destination station name
+
+        Returns
+        -------
+        list[int]: station ids, empty if a station does not exist or is not reachable
+        """
+        network: CompiledNetwork = self._network
+        hubs: tuple[int, int] = (network.hub(origin), network.hub(destination))
+        if hubs[0] < 0 or hubs[1] < 0:
+            return []
+        if hubs in self._routes:
+            return self._routes[hubs]
+
+        hub, delay = network.table("hub"), network.table("delay")
+        offsets, members = network.table("member_offsets"), network.table("members")
+        path: list[int] = network.hub_path(*hubs)
+        result: list[int] = []
+        last: int = members[offsets[path[0]]] if path else -1
+        for current, following in zip(path, path[1:]):
+            hops: list[tuple[float, int, int]] = [
+                (delay[station], station, neighbour)
+                for station in members[offsets[current]:offsets[current + 1]]
+                for neighbour in network.neighbours(station) if hub[neighbour] == following]
+            _, station, last = min(hops)
+            result.append(station)
+        if path:
+            result.append(last)
+
+        self._routes[hubs] = result
+        return result
+
+    def _delay(self, station: int, tick: Union[int, None], elapsed: int) -> float:
+        """
+        Get the delay probability of a station after some elapsed time
+        """
+        return self._network.delay(station, None if tick is None else tick + elapsed)
+
+    def distribution(self, route: list[int], timesteps: int, tick: Union[int, None] = None) -> list[float]:
+        """
+        Get the probability of arriving at the end of a route after each elapsed time:
+        for every station the chance of still being there at each time is carried over
+        (delayed) or moved on to the next station (not delayed)
+
+        Parameters
+        ----------
+        route (list[int]): station ids (see route())
+        timesteps (int): last elapsed time
+        tick (int) default None: tick of departure, for stations with a delay profile
+
+        Returns
+        -------
+        list[float]: probability of arriving after 0 to "t" timesteps
+        """
+        arriving: list[float] = [1.0] + [0.0] * timesteps
+        for station in route[:-1]:
+            following: list[float] = [0.0] * (timesteps + 1)
+            waiting: float = 0.0
+            for elapsed in range(timesteps):
+                waiting += arriving[elapsed]
+                delay: float = self._delay(station, tick, elapsed)
+                following[elapsed + 1] = waiting * (1.0 - delay)
+                waiting *= delay
+            arriving = following
+        return arriving
+
+    def sample(self, route: list[int], timesteps: int, tick: Union[int, None] = None,
+               samples: int = SAMPLES, seed: Union[int, None] = None) -> float:
+        """
+        Get a Monte Carlo estimate of the probability of completing a route in time
+
+        Parameters
+        ----------
+        route (list[int]): station ids (see route())
+        timesteps (int): amount timesteps
+        tick (int) default None: tick of departure, for stations with a delay profile
+        samples (int) default SAMPLES: number of simulated journeys
+        seed (int) default None: seed of the random generator
+
+        Returns
+        -------
+        float: share of journeys that arrived in time
+        """
+        rand = random.Random(seed).random
+        arrived: int = 0
+        for _ in range(samples):
+            elapsed: int = 0
+            for station in route[:-1]:
+                if tick is None:
+                    # ticks until the train leaves are geometric
+                    delay: float = self._delay(station, None, 0)
+                    if delay >= 1.0:
+                        elapsed = timesteps + 1
+                    elif delay > 0.0:
+                        elapsed += int(math.log(1.0 - rand()) / math.log(delay))
+                    elapsed += 1
+                else:
+                    while elapsed <= timesteps and rand() < self._delay(station, tick, elapsed):
+                        elapsed += 1
+                    elapsed += 1
+                if elapsed > timesteps:
+                    break
+            arrived += elapsed <= timesteps
+        return arrived / samples if samples else 0.0
+
+    def probability(self, origin: str, destination: str, timesteps: int,
+                    tick: Union[int, None] = None, samples: int = 0) -> float:
+        """
+        Get the probability of completing the route between two stations within "t" timesteps,
+        exactly unless the route is too long (see EXACT_LIMIT) or samples are given
+
+        Parameters
+        ----------
+        origin (str): origin station name
+        destination (str): destination station name
+        timesteps (int): amount timesteps
+        tick (int) default None: tick of departure, for stations with a delay profile
+        samples (int) default 0: number of Monte Carlo samples, 0 to compute exactly
+
+        Returns
+        -------
+        float: probability of arriving in time, 0 if not reachable
+        """
+        route: list[int] = self.route(origin, destination)
+        if not route or timesteps < 0:
+            return 0.0
+        if tick is not None:
+            tick %= self._network.delay_period()
+        if not samples and (len(route) - 1) * timesteps > EXACT_LIMIT:
+            samples = SAMPLES
+
+        key: tuple = (tuple(route), timesteps, tick, samples)
+        if key not in self._results:
+            if samples:
+                self._results[key] = self.sample(route, timesteps, tick, samples, seed=0)
+            else:
+                self._results[key] = min(sum(self.distribution(route, timesteps, tick)), 1.0)
+        return self._results[key]
@@ -0,0 +1,116 @@
+from array import array
+from typing import Union
+from classes.line import Line
+from classes.station import Station
+from classes.train import Train
+
+
+class TrackBlocking:
+    """
+    A class to keep trains from entering a station that another train occupies in the same direction.
+
+    Every line has an array counting the trains at each (station, direction)
+    of the line. Trains report their moves (see Train.add_observer), so checking
+    whether a train may move is one array lookup. A held train counts as delayed,
+    so delays cascade back along the line.
+
+    ...
+
+    Attributes
+    ----------
+    _occupied (dict[Line, array]): trains by station index on the line * 2 + direction, by line
+    _positions (dict[Station, int]): index of each station on its line
+
+    Methods
+    -------
+    add():
+        Adds a train and starts following its moves
+    train_moved():
+        Moves a train's count from its old to its new station
+    is_free():
+        Returns whether no train is at a station in a direction
+    can_enter():
+        Returns whether a train may make its next move
+    """
+    DIRECTIONS: dict[str, int] = {"N": 0, "S": 1}
+
+    def __init__(self, lines: list[Line], trains: Union[list[Train], None] = None):
+        """
+        Constructs the occupancy arrays for a list of lines and optionally a list of trains.
+
+        Parameters
+        ----------
+        lines (list[Line]): list of Line objects (after Logic.set_line_stations)
+        trains (list[Train]) default None: trains to add
+        """
+        self._occupied: dict[Line, array] = {}
+        self._positions: dict[Station, int] = {}
+        for line in lines:
+            self._occupied[line] = array("l", [0]) * (len(line.stations()) * 2)
+            for index, station in enumerate(line.stations()):
+                self._positions[station] = index
+
+        for train in trains or []:
+            self.add(train)
+
+    def add(self, train: Train) -> None:
+        """
+        Add a train and register the blocking model as the train's observer
+
+        Parameters
+        ----------
+        train (Train): train to add
+        """
+        self._occupied[train.station_obj().line()][self._key(train.station_obj(), train.direction())] += 1
+        train.add_observer(self)
+
+    def train_moved(self, train: Train, old_station: Station, old_direction: str) -> None:
+        """
+        Update the occupancy after a train changed station or direction
+
+        Parameters
+        ----------
+        train (Train): train that moved
+        old_station (Station): station the train was at before moving
+        old_direction (str): direction the train had before moving
+        """
+        occupied: array = self._occupied[old_station.line()]
+        occupied[self._key(old_station, old_direction)] -= 1
+        occupied[self._key(train.station_obj(), train.direction())] += 1
+
+    def is_free(self, station: Station, direction: str) -> bool:
+        """
+        Get whether no train is at a station in a direction
+
+        Parameters
+        ----------
+        station (Station): Station object
+        direction (str): direction
+
+        Returns
+        -------
+        bool: whether the station is free in that direction
+        """
+        return self._occupied[station.line()][self._key(station, direction)] == 0
+
+    def can_enter(self, train: Train) -> bool:
+        """
+        Get whether a train may make its next move: the station and direction
+        it would have after moving must be free
+
+        Parameters
+        ----------
+        train (Train): train about to move
+
+        Returns
+        -------
+        bool: whether the train may move
+        """
+        station, direction = train.next_position()
+        return self.is_free(station, direction)
+
+    def _key(self, station: Station, direction: str) -> int:
+        """
+        Get index of a station and direction in its line's array
+        """
+        return self._positions[station] * 2 + self.DIRECTIONS[direction]
@@ -0,0 +1,140 @@
+import bisect
+import heapq
+from typing import Union
+from classes.station import Station
+from classes.train import Train
+
+# an upcoming arrival: (expected timesteps, train id, direction on arrival)
+Arrival = tuple[float, int, str]
+
+
+class DepartureBoard:
+    """
+    A class to keep the next trains arriving at every station, with their expected arrival.
+
+    Every train lists its next "horizon" stops with the expected timesteps to
+    reach them: a train leaves a station after 1 / (1 - delay probability)
+    timesteps on average. Each station keeps the arrivals sorted. Waiting
+    for a delay does not change how long a train is expected to still wait
+    (the delays are random every tick), so only the arrivals of trains that
+    moved are updated (see Train.add_observer). The board does not know the
+    tick, so it uses the constant delay probabilities and ignores delay
+    profiles; FleetSnapshot.arrivals gives the arrivals of a tick with them.
+
+    ...
+
+    Attributes
+    ----------
+    _horizon (int): number of upcoming stops listed per train
+    _arrivals (dict[Station, list[Arrival]]): sorted arrivals, by station
+    _listed (dict[int, list[tuple[Station, Arrival]]]): arrivals of each train, by train id
+    _trains (dict[int, Train]): trains by id
+    _by_name (dict[str, list[Station]]): Station objects grouped by lower case station name
+
+    Methods
+    -------
+    add():
+        Adds a train and starts following its moves
+    train_moved():
+        Updates the arrivals of a train that moved
+    arrivals():
+        Returns the next trains arriving at a station
+    """
+
+    def __init__(self, stations: list[Station], trains: Union[list[Train], None] = None, horizon: int = 10):
+        """
+        Constructs the boards of a list of stations and optionally a list of trains.
+
+        Parameters
+        ----------
+        stations (list[Station]): list of Station objects
+        trains (list[Train]) default None: trains to add
+        horizon (int) default 10: number of upcoming stops listed per train
+        """
+        self._horizon: int = horizon
+        self._arrivals: dict[Station, list[Arrival]] = {}
+        self._listed: dict[int, list[tuple[Station, Arrival]]] = {}
+        self._trains: dict[int, Train] = {}
+        self._by_name: dict[str, list[Station]] = {}
+        for station in stations:
+            self._by_name.setdefault(station.name().lower(), []).append(station)
+
+        for train in trains or []:
+            self.add(train)
+
+    def add(self, train: Train) -> None:
+        """
+        Add a train and register the board as the train's observer
+
+        Parameters
+        ----------
+        train (Train): train to add
+        """
+        self._trains[train.id()] = train
+        self._list(train)
+        train.add_observer(self)
+
+    def train_moved(self, train: Train, old_station: Station, old_direction: str) -> None:
+        """
+        Replace the arrivals of a train after it changed station or direction
+
+        Parameters
+        ----------
+        train (Train): train that moved
+        old_station (Station): station the train was at before moving
+        old_direction (str): direction the train had before moving
+        """
+        for station, arrival in self._listed.pop(train.id(), []):
+            arrivals: list[Arrival] = self._arrivals[station]
+            del arrivals[bisect.bisect_left(arrivals, arrival)]
+        self._list(train)
+
+    def _list(self, train: Train) -> None:
+        """
+        Walk the next stops of a train and add its arrivals
+        """
+        listed: list[tuple[Station, Arrival]] = []
+        station, direction = train.station_obj(), train.direction()
+        expected: float = 0.0
+        while len(listed) < self._horizon:
+            delay: float = station.delay()
+            if delay >= 1.0:
+                break
+            expected += 1.0 / (1.0 - delay)
+            following, direction = Train.following_position(station, direction)
+            # turning around at a last station is not an arrival
+            if following is not station:
+                arrival: Arrival = (expected, train.id(), direction)
+                bisect.insort(self._arrivals.setdefault(following, []), arrival)
+                listed.append((following, arrival))
+            elif not isinstance(station.next_station(), Station) and not isinstance(station.previous_station(), Station):
+                break
+            station = following
+        self._listed[train.id()] = listed
+
+    def arrivals(self, station: str, direction: Union[str, None] = None, line: Union[str, None] = None,
+                 limit: int = 5) -> list[tuple[float, Train, str]]:
+        """
+        Get the next trains arriving at a station, soonest first
+
+        Parameters
+        ----------
+        station (str): station name
+        direction (str) default None: only include trains arriving in this direction
+        line (str) default None: only include trains on this line
+        limit (int) default 5: most trains returned
+
+        Returns
+        -------
+        list[tuple[float, Train, str]]: expected timesteps, train and direction on arrival
+        """
+        stations: list[Station] = [
+            x for x in self._by_name.get(station.lower(), [])
+            if line is None or x.line().name().lower() == line.lower()]
+        result: list[tuple[float, Train, str]] = []
+        for expected, train, heading in heapq.merge(*(self._arrivals.get(x, []) for x in stations)):
+            if len(result) >= limit:
+                break
+            if direction is None or heading == direction:
+                result.append((expected, self._trains[train], heading))
+        return result
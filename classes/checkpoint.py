@@ -0,0 +1,247 @@
+import hashlib
+import os
+import random
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Union
+from classes.station import Station
+from classes.train import Train
+
+
+class Checkpoint:
+    """
+    A class to save and restore a running simulation to a compact binary file.
+
+    File layout (little endian):
+        header: magic, version, network hash, tick, number of trains, whether the
+            trains draw from counter-based streams and their seed (see CounterRandom)
+        random state: version, 625 state words, gauss flag and value
+        trains: ids (int32), station ids (int32), directions (N/S bytes), delays (0/1 bytes)
+    A station id is the index of the station in the stations list, the network
+    hash makes sure a checkpoint is only restored on the same network, the seed
+    that the trains keep drawing the same delays after it is restored.
+
+    ...
+
+    Attributes
+    ----------
+    _path (str): checkpoint file path
+    _every (int): save every "every" ticks in step(), 0 never
+    _seed (int): seed of the trains' counter-based streams, None if they draw from the random module
+    _index (dict[Station, int]): station id of each Station object
+    _index_hash (bytes): network hash of the stations list _index was built for
+
+    Methods
+    -------
+    path():
+        Returns checkpoint file path
+    exists():
+        Returns whether a checkpoint file exists
+    network_hash():
+        Returns a hash identifying a network
+    save():
+        Saves the simulation atomically
+    step():
+        Saves the simulation if the tick is a multiple of "every"
+    load():
+        Restores trains, tick and random state
+    """
+    MAGIC: bytes = b"TRCK"
+    VERSION: int = 2
+    HEADER = struct.Struct("<4sB16sQIBQ")
+    # the streams only use the low 64 bits of the seed
+    SEED_MASK: int = (1 << 64) - 1
+    RANDOM_HEADER = struct.Struct("<I625IBd")
+
+    def __init__(self, _path: str, _every: int = 0, _seed: Union[int, None] = None):
+        """
+        Constructs all the necessary attributes for the checkpoint.
+
+        Parameters
+        ----------
+        _path (str): checkpoint file path
+        _every (int) default 0: save every "every" ticks in step(), 0 never
+        _seed (int) default None: seed of the trains' counter-based streams, None if they
+            draw from the random module
+        """
+        self._path: str = _path
+        self._every: int = _every
+        self._seed: Union[int, None] = _seed
+        self._index: dict[Station, int] = {}
+        self._index_hash: bytes = b""
+
+    def path(self) -> str:
+        """
+        Get checkpoint file path
+
+        Returns
+        -------
+        str: file path
+        """
+        return self._path
+
+    def exists(self) -> bool:
+        """
+        Get whether a checkpoint file exists
+
+        Returns
+        -------
+        bool: whether the file exists
+        """
+        return os.path.isfile(self._path)
+
+    def network_hash(self, stations: list[Station]) -> bytes:
+        """
+        Get a hash identifying the stations, their lines, links and delays, in order
+
+        Parameters
+        ----------
+        stations (list[Station]): list of Station objects
+
+        Returns
+        -------
+        bytes: 16 bytes hash
+        """
+        result = hashlib.sha256()
+        for station in stations:
+            next_station, previous_station = station.next_station(), station.previous_station()
+            result.update("|".join([
+                station.name(),
+                station.line().name(),
+                next_station.name() if isinstance(next_station, Station) else "",
+                previous_station.name() if isinstance(previous_station, Station) else "",
+                station.direction(),
+                repr(station.delay()),
+                repr(station._delay_table)]).encode("utf-8") + b"\n")
+        return result.digest()[:16]
+
+    def save(self, stations: list[Station], trains: list[Train], tick: int) -> None:
+        """
+        Save the simulation: write a temporary file next to the checkpoint,
+        then replace the checkpoint with it, so a crash never leaves half a file
+
+        Parameters
+        ----------
+        stations (list[Station]): list of Station objects the trains run on
+        trains (list[Train]): list of Train objects
+        tick (int): number of simulated ticks
+        """
+        network_hash: bytes = self.network_hash(stations)
+        if self._index_hash != network_hash:
+            self._index, self._index_hash = {}, network_hash
+
+        ids, station_ids = array("i"), array("i")
+        directions, delays = bytearray(), bytearray()
+        for train in trains:
+            ids.append(train.id())
+            if train.station_obj() not in self._index:
+                # a rebuilt network with the same hash has new Station objects
+                self._index = {station: index for index, station in enumerate(stations)}
+            station_ids.append(self._index[train.station_obj()])
+            directions.append(ord(train.direction()))
+            delays.append(int(train.is_delayed()))
+        if sys.byteorder != "little":
+            ids.byteswap()
+            station_ids.byteswap()
+
+        random_version, random_words, gauss = random.getstate()
+        data: bytes = b"".join([
+            self.HEADER.pack(self.MAGIC, self.VERSION, network_hash, tick, len(trains),
+                             self._seed is not None, (self._seed or 0) & self.SEED_MASK),
+            self.RANDOM_HEADER.pack(random_version, *random_words,
+                                    gauss is not None, gauss or 0.0),
+            ids.tobytes(), station_ids.tobytes(), bytes(directions), bytes(delays)])
+
+        directory: str = os.path.dirname(os.path.abspath(self._path))
+        handle, temporary = tempfile.mkstemp(dir=directory, prefix=".checkpoint-")
+        try:
+            with os.fdopen(handle, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self._path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def step(self, stations: list[Station], trains: list[Train], tick: int) -> bool:
+        """
+        Save the simulation if the tick is a multiple of "every"
+
+        Parameters
+        ----------
+        stations (list[Station]): list of Station objects the trains run on
+        trains (list[Train]): list of Train objects
+        tick (int): number of simulated ticks
+
+        Returns
+        -------
+        bool: whether a checkpoint was saved
+        """
+        if self._every and tick % self._every == 0:
+            self.save(stations, trains, tick)
+            return True
+        return False
+
+    def load(self, stations: list[Station]) -> tuple[list[Train], int]:
+        """
+        Restore the trains, the tick and the random state from the checkpoint
+
+        Parameters
+        ----------
+        stations (list[Station]): list of Station objects of the same network
+
+        Raises
+        ------
+        FileNotFoundError: if there is no checkpoint
+        ValueError: if the file is not a checkpoint of this network and seed, or a train's
+            station or direction is not valid
+
+        Returns
+        -------
+        list[Train]: restored Train objects
+        int: number of simulated ticks
+        """
+        if not self.exists():
+            raise FileNotFoundError
+        with open(self._path, "rb") as f:
+            data: bytes = f.read()
+
+        try:
+            magic, version, network, tick, count, seeded, seed = self.HEADER.unpack_from(data, 0)
+            state = self.RANDOM_HEADER.unpack_from(data, self.HEADER.size)
+        except struct.error:
+            raise ValueError
+        offset: int = self.HEADER.size + self.RANDOM_HEADER.size
+        if (magic != self.MAGIC or version != self.VERSION
+                or network != self.network_hash(stations)
+                or (seeded, seed) != (self._seed is not None, (self._seed or 0) & self.SEED_MASK)
+                or len(data) != offset + count * 10):
+            raise ValueError
+
+        ids, station_ids = array("i"), array("i")
+        ids.frombytes(data[offset:offset + count * 4])
+        station_ids.frombytes(data[offset + count * 4:offset + count * 8])
+        if sys.byteorder != "little":
+            ids.byteswap()
+            station_ids.byteswap()
+        directions: bytes = data[offset + count * 8:offset + count * 9]
+        delays: bytes = data[offset + count * 9:]
+
+        trains: list[Train] = []
+        for index in range(count):
+            if not 0 <= station_ids[index] < len(stations) or directions[index] not in b"NS":
+                raise ValueError
+            station: Station = stations[station_ids[index]]
+            train = Train(ids[index], station.line(), station, chr(directions[index]))
+            train._is_delayed = bool(delays[index])
+            trains.append(train)
+
+        gauss: Union[float, None] = state[627] if state[626] else None
+        try:
+            random.setstate((state[0], tuple(state[1:626]), gauss))
+        except (TypeError, ValueError):
+            raise ValueError
+        return trains, tick
@@ -0,0 +1,714 @@
+import math
+import random
+from array import array
+from typing import Callable, Union
+from classes.station import Station
+from classes.train import Train
+from classes.streams import CounterRandom
+
+
+# train directions are stored as indexes of this tuple
+DIRECTIONS: tuple[str, str] = ("N", "S")
+
+
+class CompiledNetwork:
+    """
+    A class to represent the network as flat integer tables.
+
+    Every Station object (a station on one line) gets a dense integer id (its index
+    in the stations list) and the linked Station objects are replaced by tables
+    indexed by that id. Every physical station name gets a hub id, the stations
+    sharing a hub are the transfers between lines.
+    The move tables are indexed by station id * 2 + direction and hold where a
+    train at that station heading in that direction moves to, and whether it
+    turns around there (same rules as Train.set_station).
+
+    ...
+
+    Attributes
+    ----------
+    _stations (list[Station]): Station object of each id (empty if built from tables)
+    _index (dict[Station, int]): id of each Station object
+    _hub_names (list[str]): station name of each hub id
+    _hub_index (dict[str, int]): hub id of each lower case station name
+    _line_names (list[str]): line name of each line id
+    _period (int): ticks after which all delay probabilities repeat, computed on first use
+    _row (tuple[int, array]): the last computed delay probabilities of a tick, by tick
+    _tables (dict[str, array]): the network tables
+        next (i): id of next station or -1
+        previous (i): id of previous station or -1
+        direction (b): direction to next station as index of DIRECTIONS or -1
+        delay (d): delay probability
+        delay_offsets, delay_ticks (d): delay probability of every tick of each station's own
+            period (one entry without a delay profile), at delay_offsets[id] + tick % period
+        move (i): station a train moves to, by station id * 2 + direction
+        flip (b): 1 if the train turns around after the move, by station id * 2 + direction
+        line (i): line id
+        hub (i): hub id
+        line_offsets, line_edges (i): CSR adjacency of stations on the same line
+        member_offsets, members (i): CSR list of station ids of each hub (transfers)
+        hub_offsets, hub_edges (i): CSR adjacency between hubs
+
+    Methods
+    -------
+    from_tables():
+        Builds a network from existing tables (arrays or memoryviews)
+    stations():
+        Returns the Station objects
+    size():
+        Returns the number of stations
+    id():
+        Returns the id of a Station object
+    hubs():
+        Returns the number of hubs
+    hub():
+        Returns the hub id of a station name
+    hub_name():
+        Returns the station name of a hub id
+    line_name():
+        Returns the line name of a line id
+    neighbours():
+        Returns ids of the stations next to a station on its line
+    transfers():
+        Returns ids of the stations of other lines at the same hub
+    hub_neighbours():
+        Returns hub ids connected to a hub
+    hub_path():
+        Returns a shortest path of hubs between two hubs
+    hub_distances():
+        Returns number of timesteps from source hubs to every hub (BFS)
+    delay_period():
+        Returns number of ticks after which the delay probabilities repeat
+    delay():
+        Returns the delay probability of a station at a tick
+    delays():
+        Returns the delay probability of every station at a tick
+    table():
+        Returns one of the network tables
+    tables():
+        Returns all network tables
+    step():
+        Simulates a range of trains of a FleetState one turn
+    occupancy():
+        Returns trains by station and direction, for blocking
+    """
+    TABLES: dict[str, str] = {
+        "next": "i", "previous": "i", "direction": "b", "delay": "d",
+        "delay_offsets": "i", "delay_ticks": "d",
+        "move": "i", "flip": "b",
+        "line": "i", "hub": "i", "line_offsets": "i", "line_edges": "i",
+        "member_offsets": "i", "members": "i", "hub_offsets": "i", "hub_edges": "i"}
+
+    def __init__(self, stations: list[Station]):
+        """
+        Compiles a list of Station objects (after Logic.set_station_objects)
+
+        Parameters
+        ----------
+        stations (list[Station]): list of Station objects
+        """
+        self._stations: list[Station] = stations
+        self._index: dict[Station, int] = {
+            station: index for index, station in enumerate(stations)}
+        self._tables: dict = {name: array(code) for name, code in self.TABLES.items()}
+        self._period: Union[int, None] = None
+        self._row: tuple[int, Union[array, None]] = (-1, None)
+
+        for station in stations:
+            self._tables["next"].append(self._station_id(station.next_station()))
+            self._tables["previous"].append(self._station_id(station.previous_station()))
+            self._tables["direction"].append(
+                DIRECTIONS.index(station.direction()) if station.direction() in DIRECTIONS else -1)
+            self._tables["delay"].append(station.delay())
+
+            for direction in DIRECTIONS:
+                if station.direction() == direction:
+                    target = station.next_station() if isinstance(
+                        station.next_station(), Station) else station
+                    turns = not isinstance(target.next_station(), Station)
+                else:
+                    target = station.previous_station() if isinstance(
+                        station.previous_station(), Station) else station
+                    turns = not isinstance(target.previous_station(), Station)
+                self._tables["move"].append(self._index[target])
+                self._tables["flip"].append(int(turns))
+
+        self._hub_names: list[str] = []
+        self._hub_index: dict[str, int] = {}
+        self._line_names: list[str] = []
+        line_index: dict[str, int] = {}
+        hub_ids: dict[str, int] = {}
+        for station in stations:
+            # the line is still a string if compiled before Logic.set_station_line
+            line = station.line()
+            line_name: str = line.name() if hasattr(line, "name") else str(line)
+            if line_name not in line_index:
+                line_index[line_name] = len(self._line_names)
+                self._line_names.append(line_name)
+            if station.name() not in hub_ids:
+                hub_ids[station.name()] = len(self._hub_names)
+                self._hub_names.append(station.name())
+                self._hub_index.setdefault(station.name().lower(), hub_ids[station.name()])
+            self._tables["line"].append(line_index[line_name])
+            self._tables["hub"].append(hub_ids[station.name()])
+
+        # line edges in both directions, some stations are only pointed at by their neighbours
+        line_edges: list[set[int]] = [set() for _ in stations]
+        for index in range(len(stations)):
+            for neighbour in (self._tables["next"][index], self._tables["previous"][index]):
+                if neighbour >= 0 and neighbour != index:
+                    line_edges[index].add(neighbour)
+                    line_edges[neighbour].add(index)
+        self._csr("line_offsets", "line_edges", line_edges)
+
+        members: list[list[int]] = [[] for _ in self._hub_names]
+        for index, hub in enumerate(self._tables["hub"]):
+            members[hub].append(index)
+        self._csr("member_offsets", "members", members)
+
+        hub = self._tables["hub"]
+        hub_edges: list[set[int]] = [set() for _ in self._hub_names]
+        for index, neighbours in enumerate(line_edges):
+            for neighbour in neighbours:
+                if hub[index] != hub[neighbour]:
+                    hub_edges[hub[index]].add(hub[neighbour])
+        self._csr("hub_offsets", "hub_edges", hub_edges)
+
+        # every station keeps its own period, the common period (their least common
+        # multiple) can be far too long to store a row of all stations per tick
+        self._tables["delay_offsets"].append(0)
+        for station in stations:
+            self._tables["delay_ticks"].extend(station._delay_table or [station.delay()])
+            self._tables["delay_offsets"].append(len(self._tables["delay_ticks"]))
+
+    @classmethod
+    def from_tables(cls, tables: dict) -> "CompiledNetwork":
+        """
+        Build a network from existing tables, without Station objects
+
+        Parameters
+        ----------
+        tables (dict): table name to array or memoryview, see TABLES
+
+        Returns
+        -------
+        CompiledNetwork: network using the given tables
+        """
+        result = cls.__new__(cls)
+        result._stations = []
+        result._index = {}
+        result._hub_names = []
+        result._hub_index = {}
+        result._line_names = []
+        result._tables = dict(tables)
+        result._period = None
+        result._row = (-1, None)
+        return result
+
+    def _station_id(self, station) -> int:
+        """
+        Get id of a Station object, or -1 if it is not a Station
+        """
+        return self._index[station] if isinstance(station, Station) else -1
+
+    def _csr(self, offsets_name: str, edges_name: str, rows: list) -> None:
+        """
+        Store a list of rows as a CSR offsets table and a flat (sorted rows) edges table
+        """
+        offsets, edges = self._tables[offsets_name], self._tables[edges_name]
+        offsets.append(0)
+        for row in rows:
+            edges.extend(sorted(row))
+            offsets.append(len(edges))
+
+    def stations(self) -> list[Station]:
+        """
+        Get the Station object of each id
+
+        Returns
+        -------
+        list[Station]: Station objects
+        """
+        return self._stations
+
+    def size(self) -> int:
+        """
+        Get number of stations
+
+        Returns
+        -------
+        int: number of stations
+        """
+        return len(self._tables["delay"])
+
+    def id(self, station: Station) -> int:
+        """
+        Get id of a Station object
+
+        Parameters
+        ----------
+        station (Station): Station object
+
+        Returns
+        -------
+        int: station id
+        """
+        return self._index[station]
+
+    def hubs(self) -> int:
+        """
+        Get number of hubs (physical stations)
+
+        Returns
+        -------
+        int: number of hubs
+        """
+        return len(self._tables["hub_offsets"]) - 1
+
+    def hub(self, name: str) -> int:
+        """
+        Get hub id of a station name (not case sensitive)
+
+        Parameters
+        ----------
+        name (str): station name
+
+        Returns
+        -------
+        int: hub id, -1 if there is no such station
+        """
+        return self._hub_index.get(name.lower(), -1)
+
+    def hub_name(self, hub: int) -> str:
+        """
+        Get station name of a hub id
+
+        Parameters
+        ----------
+        hub (int): hub id
+
+        Returns
+        -------
+        str: station name
+        """
+        return self._hub_names[hub]
+
+    def line_name(self, line: int) -> str:
+        """
+        Get line name of a line id
+
+        Parameters
+        ----------
+        line (int): line id
+
+        Returns
+        -------
+        str: line name
+        """
+        return self._line_names[line]
+
+    def neighbours(self, station: int):
+        """
+        Get ids of the stations next to a station on its line
+
+        Parameters
+        ----------
+        station (int): station id
+
+        Returns
+        -------
+        array: station ids
+        """
+        offsets = self._tables["line_offsets"]
+        return self._tables["line_edges"][offsets[station]:offsets[station + 1]]
+
+    def transfers(self, station: int) -> list[int]:
+        """
+        Get ids of the stations of other lines at the same hub
+
+        Parameters
+        ----------
+        station (int): station id
+
+        Returns
+        -------
+        list[int]: station ids
+        """
+        offsets, hub = self._tables["member_offsets"], self._tables["hub"][station]
+        return [x for x in self._tables["members"][offsets[hub]:offsets[hub + 1]] if x != station]
+
+    def hub_neighbours(self, hub: int):
+        """
+        Get hub ids connected to a hub by a line
+
+        Parameters
+        ----------
+        hub (int): hub id
+
+        Returns
+        -------
+        array: hub ids
+        """
+        offsets = self._tables["hub_offsets"]
+        return self._tables["hub_edges"][offsets[hub]:offsets[hub + 1]]
+
+    def hub_distances(self, sources: list[int], limit: Union[int, None] = None) -> array:
+        """
+        Get number of timesteps from the nearest source hub to every hub,
+        changing lines at a hub costs no time
+
+        Parameters
+        ----------
+        sources (list[int]): hub ids to start from
+        limit (int) default None: stop expanding hubs further away than this
+
+        Returns
+        -------
+        array: distance of every hub, -1 if not reachable (within limit)
+        """
+        offsets, edges = self._tables["hub_offsets"], self._tables["hub_edges"]
+        result: array = array("i", [-1]) * self.hubs()
+        frontier: list[int] = []
+        for source in sources:
+            if result[source] < 0:
+                result[source] = 0
+                frontier.append(source)
+        distance: int = 0
+        while frontier and (limit is None or distance < limit):
+            distance += 1
+            next_frontier: list[int] = []
+            for hub in frontier:
+                for neighbour in edges[offsets[hub]:offsets[hub + 1]]:
+                    if result[neighbour] < 0:
+                        result[neighbour] = distance
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+        return result
+
+    def hub_path(self, source: int, target: int, limit: Union[int, None] = None) -> list[int]:
+        """
+        Get a shortest path of hubs between two hubs by a bidirectional search:
+        both ends are expanded level by level, the smaller frontier first,
+        until the frontiers meet. Changing lines at a hub costs no time
+
+        Parameters
+        ----------
+        source (int): hub id to start from
+        target (int): hub id to reach
+        limit (int) default None: give up on paths longer than this many timesteps
+
+        Returns
+        -------
+        list[int]: hub ids from source to target, empty if not reachable (within limit)
+        """
+        if source == target:
+            return [source]
+        offsets, edges = self._tables["hub_offsets"], self._tables["hub_edges"]
+        # parent of every visited hub, by side (0 from source, 1 from target)
+        parents: tuple[dict[int, int], dict[int, int]] = ({source: -1}, {target: -1})
+        frontiers: list[list[int]] = [[source], [target]]
+        depths: list[int] = [0, 0]
+
+        while frontiers[0] and frontiers[1] and (limit is None or depths[0] + depths[1] < limit):
+            side: int = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            visited, other = parents[side], parents[1 - side]
+            meeting: Union[tuple[int, int], None] = None
+            next_frontier: list[int] = []
+            for hub in frontiers[side]:
+                for neighbour in edges[offsets[hub]:offsets[hub + 1]]:
+                    if neighbour in visited:
+                        continue
+                    visited[neighbour] = hub
+                    next_frontier.append(neighbour)
+                    # the first meeting of a level is a shortest path, every
+                    # meeting of the level has the same length
+                    if meeting is None and neighbour in other:
+                        meeting = (hub, neighbour)
+            if meeting is not None:
+                return self._join(parents, meeting[1])
+            frontiers[side] = next_frontier
+            depths[side] += 1
+        return []
+
+    def _join(self, parents: tuple[dict[int, int], dict[int, int]], meeting: int) -> list[int]:
+        """
+        Get the path through the hub where the two searches met
+        """
+        halves: list[list[int]] = []
+        for search in parents:
+            half: list[int] = [meeting]
+            while search[half[-1]] >= 0:
+                half.append(search[half[-1]])
+            halves.append(half)
+        return halves[0][::-1] + halves[1][1:]
+
+    def delay_period(self) -> int:
+        """
+        Get number of ticks after which the delay probabilities repeat
+
+        Returns
+        -------
+        int: period (1 without delay profiles), the least common multiple of the stations' periods
+        """
+        if self._period is None:
+            offsets = self._tables["delay_offsets"]
+            self._period = math.lcm(1, *{offsets[x + 1] - offsets[x] for x in range(self.size())})
+        return self._period
+
+    def delay(self, station: int, tick: Union[int, None] = None) -> float:
+        """
+        Get the delay probability of a station at a tick
+
+        Parameters
+        ----------
+        station (int): station id
+        tick (int) default None: tick, None for the constant delay probability
+
+        Returns
+        -------
+        float: delay probability
+        """
+        if tick is None:
+            return self._tables["delay"][station]
+        offsets = self._tables["delay_offsets"]
+        start: int = offsets[station]
+        return self._tables["delay_ticks"][start + tick % (offsets[station + 1] - start)]
+
+    def delays(self, tick: Union[int, None] = None):
+        """
+        Get the delay probability of every station at a tick
+
+        Parameters
+        ----------
+        tick (int) default None: tick, None for the constant delay probabilities
+
+        Returns
+        -------
+        memoryview: delay probability by station id
+        """
+        if tick is None or self.delay_period() == 1:
+            return memoryview(self._tables["delay"])
+        # the row of the last tick is kept, step() and most callers ask for one tick at a time
+        if self._row[0] != tick:
+            offsets, ticks = self._tables["delay_offsets"], self._tables["delay_ticks"]
+            self._row = (tick, array("d", [ticks[offsets[x] + tick % (offsets[x + 1] - offsets[x])]
+                                           for x in range(self.size())]))
+        return memoryview(self._row[1])
+
+    def table(self, name: str):
+        """
+        Get one of the network tables
+
+        Parameters
+        ----------
+        name (str): table name, see TABLES
+
+        Returns
+        -------
+        array: the table
+        """
+        return self._tables[name]
+
+    def tables(self) -> dict:
+        """
+        Get all network tables
+
+        Returns
+        -------
+        dict: table name to table
+        """
+        return self._tables
+
+    def step(self, fleet: "FleetState", start: int = 0, stop: Union[int, None] = None,
+             rand: Callable[[], float] = random.random, tick: Union[int, None] = None,
+             occupied: Union[array, None] = None, streams: Union[CounterRandom, None] = None) -> None:
+        """
+        Simulate trains start..stop of a fleet one turn, in place.
+        Draws one random number per train in order, like Logic.simulate
+
+        Parameters
+        ----------
+        fleet (FleetState): trains to simulate
+        start (int) default 0: index of first train
+        stop (int) default None: index after the last train, None for all
+        rand (Callable) default random.random: random number generator
+        tick (int) default None: the simulated tick, for stations with a delay profile
+        occupied (array) default None: trains by station id * 2 + direction (see occupancy),
+            trains cannot enter an occupied station and direction (like TrackBlocking)
+        streams (CounterRandom) default None: draw from the trains' counter-based streams
+            (all at once) instead of rand (needs a tick)
+        """
+        move, flip, delay = self._tables["move"], self._tables["flip"], self.delays(tick)
+        station, direction, delayed = fleet.table("station"), fleet.table("direction"), fleet.table("delayed")
+        stop = len(station) if stop is None else stop
+        if streams is not None:
+            if tick is None:
+                raise ValueError("Counter-based streams need a tick")
+            draws = iter(streams.uniforms(fleet.table("id")[start:stop], tick))
+            rand = draws.__next__
+        for index in range(start, stop):
+            current: int = station[index]
+            if rand() < delay[current]:
+                delayed[index] = 1
+                continue
+            key: int = current * 2 + direction[index]
+            if occupied is not None:
+                target: int = move[key] * 2 + (direction[index] ^ flip[key])
+                if occupied[target]:
+                    delayed[index] = 1
+                    continue
+                occupied[key] -= 1
+                occupied[target] += 1
+            delayed[index] = 0
+            station[index] = move[key]
+            direction[index] ^= flip[key]
+
+    def occupancy(self, fleet: "FleetState") -> array:
+        """
+        Count the trains of a fleet by station id * 2 + direction, for step() with blocking
+
+        Parameters
+        ----------
+        fleet (FleetState): trains
+
+        Returns
+        -------
+        array: trains by station id * 2 + direction
+        """
+        result: array = array("l", [0]) * (self.size() * 2)
+        station, direction = fleet.table("station"), fleet.table("direction")
+        for index in range(len(station)):
+            result[station[index] * 2 + direction[index]] += 1
+        return result
+
+
+class FleetState:
+    """
+    A class to represent the state of all trains as flat arrays.
+
+    ...
+
+    Attributes
+    ----------
+    _tables (dict[str, array]): the state tables, indexed by train position in the fleet
+        id (i): train id
+        station (i): station id
+        direction (b): direction as index of DIRECTIONS
+        delayed (b): 1 if the train is delayed
+
+    Methods
+    -------
+    from_trains():
+        Builds the state of a list of Train objects
+    from_tables():
+        Builds a state from existing tables (arrays or memoryviews)
+    size():
+        Returns the number of trains
+    table():
+        Returns one of the state tables
+    tables():
+        Returns all state tables
+    to_trains():
+        Copies the state into Train objects
+    """
+    TABLES: dict[str, str] = {"id": "i", "station": "i", "direction": "b", "delayed": "b"}
+
+    def __init__(self):
+        """
+        Constructs an empty fleet state
+        """
+        self._tables: dict = {name: array(code) for name, code in self.TABLES.items()}
+
+    @classmethod
+    def from_trains(cls, network: CompiledNetwork, trains: list[Train]) -> "FleetState":
+        """
+        Build the state of a list of Train objects
+
+        Parameters
+        ----------
+        network (CompiledNetwork): network the trains run on
+        trains (list[Train]): list of Train objects
+
+        Returns
+        -------
+        FleetState: state of the trains, in the same order
+        """
+        result = cls()
+        for train in trains:
+            result._tables["id"].append(train.id())
+            result._tables["station"].append(network.id(train.station_obj()))
+            result._tables["direction"].append(DIRECTIONS.index(train.direction()))
+            result._tables["delayed"].append(int(train.is_delayed()))
+        return result
+
+    @classmethod
+    def from_tables(cls, tables: dict) -> "FleetState":
+        """
+        Build a state from existing tables
+
+        Parameters
+        ----------
+        tables (dict): table name to array or memoryview, see TABLES
+
+        Returns
+        -------
+        FleetState: state using the given tables
+        """
+        result = cls.__new__(cls)
+        result._tables = dict(tables)
+        return result
+
+    def size(self) -> int:
+        """
+        Get number of trains
+
+        Returns
+        -------
+        int: number of trains
+        """
+        return len(self._tables["id"])
+
+    def table(self, name: str):
+        """
+        Get one of the state tables
+
+        Parameters
+        ----------
+        name (str): table name, see TABLES
+
+        Returns
+        -------
+        array: the table
+        """
+        return self._tables[name]
+
+    def tables(self) -> dict:
+        """
+        Get all state tables
+
+        Returns
+        -------
+        dict: table name to table
+        """
+        return self._tables
+
+    def to_trains(self, network: CompiledNetwork, trains: list[Train]) -> list[Train]:
+        """
+        Copy the state into the Train objects it was built from
+
+        Parameters
+        ----------
+        network (CompiledNetwork): network the trains run on (built from Station objects)
+        trains (list[Train]): Train objects, in the same order as the state
+
+        Returns
+        -------
+        list[Train]: the updated Train objects
+        """
+        stations: list[Station] = network.stations()
+        station, direction, delayed = self._tables["station"], self._tables["direction"], self._tables["delayed"]
+        for index, train in enumerate(trains):
+            train._station = stations[station[index]]
+            train._direction = DIRECTIONS[direction[index]]
+            train._is_delayed = bool(delayed[index])
+        return trains
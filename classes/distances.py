@@ -0,0 +1,218 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from classes.compiled import CompiledNetwork
+
+
+class DistanceTable:
+    """
+    A class to store the timesteps between every two stations in a memory-mapped file.
+
+    File layout (little endian):
+        header: magic, version, network hash, number of hubs
+        distances: hubs * hubs uint16, row by row, UNREACHABLE if not reachable
+    Rows and columns are hub ids of the compiled network (one hub per station
+    name, see CompiledNetwork). The file name contains the network hash, so
+    tables of different networks live side by side and a changed network gets
+    a new table. The file is only mapped, a query reads two bytes from the OS
+    page cache and nothing is loaded into memory.
+
+    ...
+
+    Attributes
+    ----------
+    _file: the opened table file
+    _map (mmap.mmap): the mapped table file
+    _hubs (int): number of hubs
+
+    Methods
+    -------
+    network_hash():
+        Returns a hash identifying the routes of a network
+    path():
+        Returns the table file path of a network in a directory
+    build():
+        Computes and writes the table of a network
+    open():
+        Opens the table of a network, building it if missing
+    hubs():
+        Returns number of hubs
+    distance():
+        Returns timesteps between two hubs
+    close():
+        Unmaps and closes the table file
+    """
+    MAGIC: bytes = b"TRDT"
+    VERSION: int = 1
+    HEADER = struct.Struct("<4sB3x16sQ")
+    DISTANCE = struct.Struct("<H")
+    UNREACHABLE: int = 0xFFFF
+    # most hubs of a table, the file holds hubs * hubs distances (128 MiB at the limit)
+    MAX_HUBS: int = 8192
+
+    def __init__(self, _path: str, _network: CompiledNetwork):
+        """
+        Maps an existing table file of a network.
+
+        Parameters
+        ----------
+        _path (str): table file path
+        _network (CompiledNetwork): network the table was built for
+
+        Raises
+        ------
+        ValueError: if the file is not a table of the network
+        """
+        self._file = open(_path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError("Distance table is empty")
+        if len(self._map) < self.HEADER.size:
+            self.close()
+            raise ValueError("Distance table is truncated")
+
+        magic, version, network_hash, hubs = self.HEADER.unpack_from(self._map)
+        self._hubs: int = hubs
+        if (magic != self.MAGIC or version != self.VERSION or network_hash != self.network_hash(_network)
+                or hubs != _network.hubs() or len(self._map) != self.HEADER.size + hubs * hubs * 2):
+            self.close()
+            raise ValueError("Distance table does not match the network")
+
+    @staticmethod
+    def network_hash(network: CompiledNetwork) -> bytes:
+        """
+        Get a hash identifying the hubs of a network and the lines between them
+
+        Parameters
+        ----------
+        network (CompiledNetwork): compiled network
+
+        Returns
+        -------
+        bytes: 16 bytes hash
+        """
+        result = hashlib.sha256()
+        for hub in range(network.hubs()):
+            result.update(network.hub_name(hub).encode("utf-8") + b"\n")
+        for name in ("hub_offsets", "hub_edges"):
+            result.update(bytes(array("q", network.table(name))))
+        return result.digest()[:16]
+
+    @classmethod
+    def path(cls, directory: str, network: CompiledNetwork) -> str:
+        """
+        Get the table file path of a network in a directory
+
+        Parameters
+        ----------
+        directory (str): directory of the table, e.g. of the network files
+        network (CompiledNetwork): compiled network
+
+        Returns
+        -------
+        str: table file path
+        """
+        return os.path.join(directory, f"distances-{cls.network_hash(network).hex()}.bin")
+
+    @classmethod
+    def build(cls, network: CompiledNetwork, path: str) -> None:
+        """
+        Compute the timesteps between every two hubs (a BFS from every hub)
+        and write the table atomically, one row at a time
+
+        Parameters
+        ----------
+        network (CompiledNetwork): compiled network
+        path (str): table file path
+
+        Raises
+        ------
+        ValueError: if the network has more than MAX_HUBS hubs or a distance does not fit the table
+        """
+        hubs: int = network.hubs()
+        if hubs > cls.MAX_HUBS:
+            raise ValueError("Network has too many stations for a distance table")
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".distances-")
+        try:
+            with os.fdopen(handle, "wb") as f:
+                f.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, cls.network_hash(network), hubs))
+                for hub in range(hubs):
+                    distances = network.hub_distances([hub])
+                    if max(distances, default=0) >= cls.UNREACHABLE:
+                        raise ValueError("Network is too long for a distance table")
+                    row = array("H", [x if x >= 0 else cls.UNREACHABLE for x in distances])
+                    if sys.byteorder != "little":
+                        row.byteswap()
+                    f.write(row.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    @classmethod
+    def open(cls, directory: str, network: CompiledNetwork) -> "DistanceTable":
+        """
+        Open the table of a network in a directory, building it first if missing or invalid
+
+        Parameters
+        ----------
+        directory (str): directory of the table, e.g. of the network files
+        network (CompiledNetwork): compiled network
+
+        Raises
+        ------
+        ValueError: if the table cannot be built (see build)
+
+        Returns
+        -------
+        DistanceTable: the mapped table
+        """
+        path: str = cls.path(directory, network)
+        if os.path.isfile(path):
+            try:
+                return cls(path, network)
+            except ValueError:
+                pass
+        cls.build(network, path)
+        return cls(path, network)
+
+    def hubs(self) -> int:
+        """
+        Get number of hubs
+
+        Returns
+        -------
+        int: number of hubs
+        """
+        return self._hubs
+
+    def distance(self, hub1: int, hub2: int) -> int:
+        """
+        Get number of timesteps between two hubs
+
+        Parameters
+        ----------
+        hub1 (int): first hub id
+        hub2 (int): second hub id
+
+        Returns
+        -------
+        int: timesteps, -1 if not reachable
+        """
+        result: int = self.DISTANCE.unpack_from(self._map, self.HEADER.size + (hub1 * self._hubs + hub2) * 2)[0]
+        return -1 if result == self.UNREACHABLE else result
+
+    def close(self) -> None:
+        """
+        Unmap and close the table file
+        """
+        self._map.close()
+        self._file.close()
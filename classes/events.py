@@ -0,0 +1,208 @@
+import json
+import operator
+import queue
+import struct
+import threading
+from array import array
+from typing import Union
+from classes.compiled import CompiledNetwork, DIRECTIONS, FleetState
+from classes.train import Train
+
+# event kinds, by their code in the binary format
+EVENTS: tuple[str, str, str] = ("move", "delay", "reverse")
+# raw state of a Train object as taken by EventLog.record
+_TRAIN_STATE = operator.attrgetter("_id", "_station", "_direction", "_is_delayed")
+_DIRECTION_INDEX: dict[str, int] = {x: index for index, x in enumerate(DIRECTIONS)}
+
+
+class EventLog:
+    """
+    A class to write every move, delay and direction reversal of the trains to a file.
+
+    Every record() only copies the raw positions of the trains (one C level pass
+    over the trains, or a copy of the fleet arrays) and queues them; a background
+    thread converts them to station ids, compares them with the previous
+    snapshot, encodes the events and writes them in large batches.
+    The first snapshot is the starting positions and produces no events.
+
+    Formats:
+        jsonl: one JSON object per line, e.g.
+            {"tick":3,"train":7,"event":"move","station":"B","line":"blue","direction":"S"}
+        binary (little endian): per snapshot a frame of tick (int64) and number of
+            events (uint32), then per event: train id (int32), event (uint8, index
+            of EVENTS), station id (int32, see CompiledNetwork), direction (uint8,
+            index of DIRECTIONS)
+    A move is reported at the station the train moved to, a delay at the station
+    it is delayed at and a reversal with the new direction.
+
+    ...
+
+    Attributes
+    ----------
+    _network (CompiledNetwork): network the trains run on
+    _binary (bool): write the binary format instead of JSON lines
+    _buffer (int): bytes collected before they are written
+    _file: the opened output file
+    _queue (queue.Queue): snapshots waiting for the writer thread
+    _writer (threading.Thread): thread encoding and writing the events
+    _error (Exception): error of the writer thread, raised by record() and returned by close()
+
+    Methods
+    -------
+    record():
+        Queues the positions of Train objects after a tick
+    record_fleet():
+        Queues the positions of a FleetState after a tick
+    close():
+        Writes the queued events and closes the file
+    """
+    FRAME = struct.Struct("<qI")
+    EVENT = struct.Struct("<iBiB")
+
+    def __init__(self, _path: str, _network: CompiledNetwork, _format: str = "jsonl",
+                 _buffer: int = 1 << 20, _queue: int = 64):
+        """
+        Opens the output file and starts the writer thread.
+
+        Parameters
+        ----------
+        _path (str): output file path
+        _network (CompiledNetwork): network the trains run on (built from Station objects)
+        _format (str) default "jsonl": "jsonl" or "binary"
+        _buffer (int) default 1 MiB: bytes collected before they are written
+        _queue (int) default 64: most snapshots waiting, record() blocks when the writer is behind
+        """
+        if _format not in ("jsonl", "binary"):
+            raise ValueError(f"Unknown event log format: {_format}")
+        self._network: CompiledNetwork = _network
+        self._binary: bool = _format == "binary"
+        self._buffer: int = _buffer
+        self._file = open(_path, "wb")
+        self._queue: queue.Queue = queue.Queue(_queue)
+        self._error: Union[Exception, None] = None
+        self._writer = threading.Thread(target=self._write, name="EventLog", daemon=True)
+        self._writer.start()
+
+    def record(self, trains: list[Train], tick: int) -> None:
+        """
+        Queue the positions of the trains after they were simulated at a tick
+
+        Parameters
+        ----------
+        trains (list[Train]): list of Train objects, always in the same order
+        tick (int): simulated tick
+
+        Raises
+        ------
+        Exception: the error of the writer thread, if it failed
+        """
+        self._put(tick, list(map(_TRAIN_STATE, trains)))
+
+    def record_fleet(self, fleet: FleetState, tick: int) -> None:
+        """
+        Queue the positions of a fleet after it was simulated at a tick
+
+        Parameters
+        ----------
+        fleet (FleetState): trains, always in the same order
+        tick (int): simulated tick
+
+        Raises
+        ------
+        Exception: the error of the writer thread, if it failed
+        """
+        self._put(tick, *(array(FleetState.TABLES[name], bytes(fleet.table(name)))
+                          for name in ("id", "station", "direction", "delayed")))
+
+    def _put(self, tick: int, *snapshot) -> None:
+        """
+        Queue a snapshot for the writer thread
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put((tick,) + snapshot)
+
+    def close(self) -> Union[Exception, None]:
+        """
+        Write the queued events, stop the writer thread and close the file
+
+        Returns
+        -------
+        Union[Exception, None]: the error of the writer thread or of closing the file, if it failed
+        """
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        try:
+            self._file.close()
+        except OSError as error:
+            self._error = self._error or error
+        return self._error
+
+    def _positions(self, snapshot: tuple) -> tuple:
+        """
+        Get tick, ids, station ids, directions and delays of a queued snapshot
+        """
+        if len(snapshot) == 5:
+            return snapshot
+        tick, states = snapshot
+        network: CompiledNetwork = self._network
+        return (tick, [x[0] for x in states], [network.id(x[1]) for x in states],
+                [_DIRECTION_INDEX[x[2]] for x in states], [x[3] for x in states])
+
+    def _write(self) -> None:
+        """
+        Writer thread: compare every snapshot with the previous one and write the events in batches
+        """
+        network: CompiledNetwork = self._network
+        hub, line = network.table("hub"), network.table("line")
+        names: list[str] = [json.dumps(network.hub_name(hub[x])) for x in range(network.size())]
+        lines: list[str] = [json.dumps(network.line_name(line[x])) for x in range(network.size())]
+        directions: list[str] = [json.dumps(x) for x in DIRECTIONS]
+        frame, event = self.FRAME.pack, self.EVENT.pack
+
+        batch: list[bytes] = []
+        size: int = 0
+        previous: Union[tuple, None] = None
+        snapshot: Union[tuple, None] = ()
+        try:
+            while True:
+                snapshot = self._queue.get()
+                if snapshot is None:
+                    break
+                snapshot = self._positions(snapshot)
+                if previous is None or len(previous[1]) != len(snapshot[1]):
+                    previous = snapshot
+                    continue
+                tick, ids, station, direction, delayed = snapshot
+                _, _, old_station, old_direction, _ = previous
+                previous = snapshot
+
+                records: list = []
+                for index, current in enumerate(station):
+                    if delayed[index]:
+                        records.append((ids[index], 1, current, direction[index]))
+                        continue
+                    if current != old_station[index]:
+                        records.append((ids[index], 0, current, direction[index]))
+                    if direction[index] != old_direction[index]:
+                        records.append((ids[index], 2, current, direction[index]))
+
+                if self._binary:
+                    data: bytes = frame(tick, len(records)) + b"".join(event(*x) for x in records)
+                else:
+                    data: bytes = "".join(
+                        f'{{"tick":{tick},"train":{train},"event":"{EVENTS[kind]}","station":{names[at]},'
+                        f'"line":{lines[at]},"direction":{directions[heading]}}}\n'
+                        for train, kind, at, heading in records).encode("utf-8")
+                batch.append(data)
+                size += len(data)
+                if size >= self._buffer:
+                    self._file.write(b"".join(batch))
+                    batch, size = [], 0
+            self._file.write(b"".join(batch))
+        except Exception as error:
+            self._error = error
+            # keep taking snapshots until close(), so record() does not block forever
+            while snapshot is not None:
+                snapshot = self._queue.get()
@@ -0,0 +1,236 @@
+import math
+import random
+from array import array
+from typing import Union
+from classes.compiled import CompiledNetwork, FleetState
+from classes.streams import CounterRandom
+
+# standard deviations of margin when skipping whole cycles, overshooting is less likely than 1e-15
+MARGIN: float = 8.0
+
+
+def _poisson(mean: float, rng) -> int:
+    """
+    Sample a Poisson distributed number: by multiplying uniforms for small means,
+    otherwise by transformed rejection with squeeze (PTRS, Hörmann 1993)
+    """
+    if mean < 10.0:
+        limit: float = math.exp(-mean)
+        result: int = 0
+        product: float = rng.random()
+        while product > limit:
+            result += 1
+            product *= rng.random()
+        return result
+
+    root: float = math.sqrt(mean)
+    log_mean: float = math.log(mean)
+    b: float = 0.931 + 2.53 * root
+    a: float = -0.059 + 0.02483 * b
+    inverse_alpha: float = 1.1239 + 1.1328 / (b - 3.4)
+    v_r: float = 0.9277 - 3.6224 / (b - 2)
+    while True:
+        u: float = rng.random() - 0.5
+        v: float = rng.random()
+        us: float = 0.5 - abs(u)
+        k: int = math.floor((2 * a / us + b) * u + mean + 0.43)
+        if us >= 0.07 and v <= v_r:
+            return k
+        if k < 0 or (us < 0.013 and v > us):
+            continue
+        if (math.log(v) + math.log(inverse_alpha) - math.log(a / (us * us) + b)
+                <= -mean + k * log_mean - math.lgamma(k + 1)):
+            return k
+
+
+class FastForward:
+    """
+    A class to advance trains by many ticks at once, without simulating every tick.
+
+    Without delays a train runs a fixed cycle of (station, direction) states,
+    the bounce of Train.set_station. Every tick at a station the train is
+    delayed with the station's delay probability, so the number of delays
+    before it leaves is geometric and the delays over m laps of its cycle are
+    negative binomial per station (sampled as Poisson of Gamma). A train first
+    skips as many whole laps as surely fit in the ticks (MARGIN standard
+    deviations short of them), then goes station by station with geometric
+    dwell times. The positions have the same distribution as simulating every
+    tick, with constant delay probabilities.
+
+    With counter-based streams (see CounterRandom) every draw is fixed by the
+    seed, so a train replays its draws up to each departure instead and ends
+    exactly where simulating every tick would put it; stations that never
+    delay (or always delay) need no draws.
+
+    ...
+
+    Attributes
+    ----------
+    _network (CompiledNetwork): network the trains run on
+    _next (array): following state, by station id * 2 + direction
+    _lap (array): lap of each state, -1 if the state is not on a lap
+    _laps (list[tuple]): states, length, mean and variance of ticks of every lap
+
+    Methods
+    -------
+    advance():
+        Returns the state of one train after a number of ticks
+    replay():
+        Returns the state of one train after a number of ticks, drawn from its counter-based stream
+    fleet():
+        Advances trains of a FleetState by a number of ticks
+    """
+
+    def __init__(self, _network: CompiledNetwork):
+        """
+        Constructs the cycle (lap) of states of every train state.
+
+        Parameters
+        ----------
+        _network (CompiledNetwork): network the trains run on
+        """
+        self._network: CompiledNetwork = _network
+        move, flip, delay = _network.table("move"), _network.table("flip"), _network.table("delay")
+        size: int = _network.size() * 2
+        self._next: array = array("l", [move[key] * 2 + ((key & 1) ^ flip[key]) for key in range(size)])
+        self._lap: array = array("l", [-1]) * size
+        self._laps: list[tuple] = []
+
+        # walk from every state until a state seen on this walk (a new lap) or on an earlier walk
+        seen: array = array("l", [-1]) * size
+        for first in range(size):
+            key: int = first
+            while seen[key] < 0:
+                seen[key] = first
+                key = self._next[key]
+            if seen[key] != first:
+                continue
+            states: list[int] = [key]
+            while self._next[states[-1]] != key:
+                states.append(self._next[states[-1]])
+            probabilities: list[float] = [delay[x // 2] for x in states]
+            if max(probabilities) >= 1.0:
+                # a train on this lap gets stuck, it is never skipped
+                mean, variance = math.inf, math.inf
+            else:
+                mean = len(states) + sum(p / (1 - p) for p in probabilities)
+                variance = sum(p / (1 - p) ** 2 for p in probabilities)
+            for state in states:
+                self._lap[state] = len(self._laps)
+            self._laps.append((states, probabilities, mean, variance))
+
+    def advance(self, key: int, ticks: int, rng=random) -> tuple[int, bool]:
+        """
+        Get the state of one train after a number of ticks
+
+        Parameters
+        ----------
+        key (int): station id * 2 + direction of the train
+        ticks (int): number of ticks
+        rng (random.Random) default random: random number generator
+
+        Returns
+        -------
+        int: station id * 2 + direction after the ticks
+        bool: whether the train was delayed in the last tick
+        """
+        delay = self._network.table("delay")
+        remaining: int = ticks
+        delayed: bool = False
+        while remaining > 0:
+            lap: int = self._lap[key]
+            if lap >= 0:
+                remaining = self._skip(lap, remaining, rng)
+
+            p: float = delay[key // 2]
+            if p >= 1.0:
+                return key, True
+            delays: int = int(math.log(1.0 - rng.random()) / math.log(p)) if p > 0.0 else 0
+            if delays >= remaining:
+                return key, True
+            remaining -= delays + 1
+            key = self._next[key]
+            delayed = False
+        return key, delayed
+
+    def replay(self, key: int, ticks: int, train_id: int, tick: int, streams: CounterRandom) -> tuple[int, bool]:
+        """
+        Get the state of one train after a number of ticks, drawing its delays from its
+        counter-based stream like CompiledNetwork.step
+
+        Parameters
+        ----------
+        key (int): station id * 2 + direction of the train
+        ticks (int): number of ticks
+        train_id (int): train id
+        tick (int): first simulated tick
+        streams (CounterRandom): counter-based random source
+
+        Returns
+        -------
+        int: station id * 2 + direction after the ticks
+        bool: whether the train was delayed in the last tick
+        """
+        network: CompiledNetwork = self._network
+        profiles: bool = network.delay_period() > 1
+        delay = network.table("delay")
+        delayed: bool = False
+        for current in range(tick, tick + ticks):
+            p: float = network.delay(key // 2, current) if profiles else delay[key // 2]
+            if not profiles and p >= 1.0:
+                return key, True
+            delayed = p > 0.0 and streams.uniform(train_id, current) < p
+            if not delayed:
+                key = self._next[key]
+        return key, delayed
+
+    def _skip(self, lap: int, remaining: int, rng) -> int:
+        """
+        Skip whole laps that surely fit in the remaining ticks, returns the remaining ticks
+        """
+        states, probabilities, mean, variance = self._laps[lap]
+        if mean == math.inf or remaining < 4 * mean:
+            return remaining
+        # largest number of laps m with m * mean + MARGIN * sqrt(m * variance) <= remaining
+        root: float = (-MARGIN * math.sqrt(variance) + math.sqrt(MARGIN * MARGIN * variance + 4 * mean * remaining))
+        laps: int = int((root / (2 * mean)) ** 2)
+        if laps < 2:
+            return remaining
+        ticks: int = laps * len(states)
+        for p in probabilities:
+            if p > 0.0:
+                ticks += _poisson(rng.gammavariate(laps, p / (1 - p)), rng)
+        # overshooting is negligible (see MARGIN), the laps are then simulated station by station
+        return remaining - ticks if ticks < remaining else remaining
+
+    def fleet(self, fleet: FleetState, ticks: int, start: int = 0, stop: Union[int, None] = None,
+              rng=random, tick: Union[int, None] = None, streams: Union[CounterRandom, None] = None) -> None:
+        """
+        Advance trains start..stop of a fleet by a number of ticks, in place
+
+        Parameters
+        ----------
+        fleet (FleetState): trains to advance
+        ticks (int): number of ticks
+        start (int) default 0: index of first train
+        stop (int) default None: index after the last train, None for all
+        rng (random.Random) default random: random number generator
+        tick (int) default None: first simulated tick, needed with streams
+        streams (CounterRandom) default None: replay the trains' counter-based streams instead of sampling
+
+        Raises
+        ------
+        ValueError: if streams are given without a tick
+        """
+        if streams is not None and tick is None:
+            raise ValueError("Counter-based streams need a tick")
+        station, direction, delayed = fleet.table("station"), fleet.table("direction"), fleet.table("delayed")
+        ids = fleet.table("id")
+        for index in range(start, len(station) if stop is None else stop):
+            if streams is not None:
+                key, is_delayed = self.replay(station[index] * 2 + direction[index], ticks, ids[index], tick, streams)
+            else:
+                key, is_delayed = self.advance(station[index] * 2 + direction[index], ticks, rng)
+            station[index], direction[index] = key // 2, key & 1
+            if ticks > 0:
+                delayed[index] = is_delayed
@@ -4,6 +4,13 @@ import random
 from classes.line import Line
 from classes.station import Station
 from classes.train import Train
+from classes.compiled import CompiledNetwork, FleetState
+from classes.fastforward import FastForward
+from classes.arrival import ArrivalProbability
+from classes.distances import DistanceTable
+from classes.raptor import Raptor, Leg
+from classes.streams import CounterRandom, STATION, DIRECTION
+from classes.risk import DelayRisk
 
 
 class Logic:
@@ -22,6 +29,16 @@ class Logic:
 
     def __init__(self, debug: bool = False):
         self.debug: bool = debug
+        # stations list and its compiled network, see compile_network
+        self._compiled: tuple = (None, None)
+        # compiled network and its memoized arrival probabilities, see get_arrival_probability
+        self._arrivals: tuple = (None, None)
+        # compiled network and its distance table, see load_distances
+        self._distances: tuple = (None, None)
+        # lines list and its journey router, see get_journeys
+        self._raptor: tuple = (None, None)
+        # compiled network and its fast-forward laps, see fast_forward
+        self._fast_forward: tuple = (None, None)
 
     def get_user_input(self):
         """
@@ -152,16 +169,19 @@ class Logic:
                     return False
                 return True
 
-            # station list format: ["station_name","delay probability"]
-            # length of 2
+            # station list format: ["station_name","delay probability"(,"delay profile")]
+            # length of 2, or 3 with a delay profile
             # delay probability must be able to be converted to float
+            # delay profile must be parsable by parse_delay_profile
             case "station":
-                if len(list_to_validate) != 2:
+                if len(list_to_validate) not in [2, 3]:
                     return False
                 if not list_to_validate[0]:
                     return False
                 try:
                     list_to_validate[1] = float(list_to_validate[1])
+                    if len(list_to_validate) == 3:
+                        list_to_validate[2] = self.parse_delay_profile(list_to_validate[2])
                 except:
                     return False
                 return True
@@ -169,6 +189,81 @@ class Logic:
             case _:
                 return False
 
+    def parse_delay_profile(self, profile: str) -> list[tuple[int, int, float]]:
+        """
+        Parse a delay profile: ";" separated "start-end:multiplier" segments,
+        the delay probability is multiplied by "multiplier" from tick "start"
+        up to (not including) tick "end". The profile repeats every "period" ticks,
+        where period is the highest end. Ticks outside any segment use multiplier 1.
+        example: "0-30:1.0;30-45:2.5;45-120:1.0" (rush hour from tick 30 to 45 of 120)
+
+        Parameters
+        ----------
+        profile (str): delay profile
+
+        Raises
+        ------
+        ValueError: if the profile is not valid
+
+        Returns
+        -------
+        list[tuple[int, int, float]]: (start, end, multiplier) segments
+        """
+        result: list[tuple[int, int, float]] = []
+        for segment in profile.split(";"):
+            ticks, multiplier = segment.split(":")
+            start, end = ticks.split("-")
+            start, end, multiplier = int(start), int(end), float(multiplier)
+            if start < 0 or end <= start or multiplier < 0:
+                raise ValueError
+            result.append((start, end, multiplier))
+        return result
+
+    def create_delay_table(self, delay_probability: float, profile: list[tuple[int, int, float]]) -> list[float]:
+        """
+        Compile a delay profile into the delay probability of every tick of its period
+
+        Parameters
+        ----------
+        delay_probability (float): station's delay probability
+        profile (list[tuple[int, int, float]]): parsed delay profile
+
+        Returns
+        -------
+        list[float]: delay probability of each tick, capped at 1
+        """
+        period: int = max(end for _, end, _ in profile)
+        result: list[float] = [delay_probability] * period
+        for start, end, multiplier in profile:
+            for tick in range(start, end):
+                result[tick] = min(1.0, delay_probability * multiplier)
+        return result
+
+    def set_delay_profiles(self, stations: list[Station], stations_probabilities: list[list]) -> list[Station]:
+        """
+        Set the delay table of every station that has a delay profile in the stations file
+
+        Parameters
+        ----------
+        stations (list[Station]): list of Station objects
+        stations_probabilities (list[list]): validated stations file lines
+
+        Returns
+        -------
+        list[Station]: list of Station objects
+        """
+        profiles: dict[str, list[tuple[int, int, float]]] = {}
+        for station in stations_probabilities:
+            # like populate_probabilities, the first line of a station is used
+            if station[0] not in profiles:
+                profiles[station[0]] = station[2] if len(station) == 3 else None
+
+        for station in stations:
+            profile = profiles.get(station.name())
+            if profile:
+                station._delay_table = self.create_delay_table(station.delay(), profile)
+        return stations
+
     def validate_connections(self, connections: list[list[str]]) -> list[list[str]]:
         """
         Validate the connections list by a defined format, and returns list of valid lines
@@ -220,7 +315,8 @@ class Logic:
 
     def get_unique_lines(self, data: list[list[str]]) -> list[str]:
         """
-        Get unique lines from stations list
+        Get unique lines from stations list, sorted so that the stations
+        are created in the same order every run
 
         Parameters
         ----------
@@ -230,7 +326,7 @@ class Logic:
         -------
         list[str]: list of unique lines
         """
-        result = list(set([i[2] for i in data]))
+        result = sorted(set([i[2] for i in data]))
         return result
 
     def group_stations(self, data: list[list[str]], unique_lines: list[str]) -> list[list[list[str]]]:
@@ -326,12 +422,16 @@ class Logic:
         list[list[list]]: list of grouped stations by line, including delay probability
         """
         length_of_full_station_list = 5
+        # index of the first delay probability of each station name
+        delay_indexes: dict[str, int] = {}
+        for index, station in enumerate(stations_probabilities):
+            delay_indexes.setdefault(station[0], index)
+
         for line in data:
             line: list[list]
             for index, station in enumerate(line):
 
-                delay_index = next(
-                    (stations_probabilities.index(x) for x in stations_probabilities if x[0] == station[0]), None)
+                delay_index = delay_indexes.get(station[0])
 
                 station_dont_have_delay_probability: bool = len(
                     line[index]) != length_of_full_station_list
@@ -454,24 +554,25 @@ class Logic:
         list[Station]: list of Station objects (changed next and previous stations to Station objects)
         """
         result: list[Station] = stations.copy()
+        # positions of the stations by (name, line), so each station only
+        # compares the stations that can be its next or previous station
+        positions: dict[tuple, list[int]] = {}
+        for index, station in enumerate(result):
+            positions.setdefault((station.name(), station.line()), []).append(index)
+
         for station in result:
             station: Station
-            for second_station in result:
-                second_station: Station
-                # station1NextStat: str = station.next_station()
-                # station1PrevStat: str = station.previous_station()
-                # station1Line: str = station.line()
-                # station2Line: str = second_station.line()
-                # station2: str = second_station.name()
-                # same_nxt_station: bool = station1NextStat == station2
-                # same_prv_station: bool = station1PrevStat == station2
-                # same_lines: bool = station1Line == station2Line
+            candidates: set[int] = set()
+            for name in (station.next_station(), station.previous_station()):
+                if isinstance(name, str):
+                    candidates.update(positions.get((name, station.line()), ()))
+            for index in sorted(candidates):
+                second_station: Station = result[index]
                 same_nxt_station: bool = station.next_station() == second_station.name()
                 same_prv_station: bool = station.previous_station() == second_station.name()
-                same_lines: bool = station.line() == second_station.line()
-                if (same_nxt_station and same_lines):
+                if same_nxt_station:
                     station._next_station = second_station
-                elif (same_prv_station and same_lines):
+                elif same_prv_station:
                     station._previous_station = second_station
         return result
 
@@ -514,7 +615,47 @@ class Logic:
                     station._line = line
         return result
 
-    def generate_trains(self, number_of_trains: int, stations: list[Station]) -> list[Train]:
+    def build_network(self, connections: list[str], stations: list[str]) -> tuple[list[Line], list[Station]]:
+        """
+        Build Line and Station objects from connections and stations file lines
+
+        Parameters
+        ----------
+        connections (list[str]): lines of a connections file
+        stations (list[str]): lines of a stations file
+
+        Raises
+        ------
+        ValueError: if the data could not be splitted
+
+        Returns
+        -------
+        list[Line]: list of Line objects
+        list[Station]: list of Station objects
+        """
+        splitted_connections = self.validate_connections(
+            self.split_data(connections, "connections"))
+        splitted_stations = self.validate_stations(
+            self.split_data(stations, "stations"))
+
+        unique_lines: list[str] = self.get_unique_lines(splitted_connections)
+
+        data = self.group_stations(splitted_connections, unique_lines)
+        data = self.create_last_stations(data)
+        data = self.populate_probabilities(data, splitted_stations)
+
+        lines: list[Line] = self.create_lines(data, unique_lines)
+
+        result: list[Station] = self.create_stations(data)
+        result = self.set_station_objects(result)
+
+        lines = self.set_line_stations(lines, result)
+        result = self.set_station_line(lines, result)
+        result = self.set_delay_profiles(result, splitted_stations)
+        return lines, result
+
+    def generate_trains(self, number_of_trains: int, stations: list[Station],
+                        streams: Union[CounterRandom, None] = None) -> list[Train]:
         """
         Generate trains and set them at random line, station and driection
 
@@ -522,6 +663,8 @@ class Logic:
         ----------
         number_of_trains (int): number of trains to generate
         stations (list[Station]): list of Station objects
+        streams (CounterRandom) default None: draw from the trains' counter-based streams
+            instead of the random module
 
         Returns
         -------
@@ -532,24 +675,33 @@ class Logic:
         result: list[Train] = []
 
         for number in range(1, number_of_trains+1):
-            station = random.choice(stations)
+            if streams is None:
+                station = random.choice(stations)
+                direction = random.choice(["N", "S"])
+            else:
+                station = stations[int(streams.uniform(number, 0, STATION) * len(stations))]
+                direction = ["N", "S"][int(streams.uniform(number, 0, DIRECTION) * 2)]
             result.append(
                 Train(
                     number,
                     station.line(),
                     station,
-                    random.choice(["N", "S"])
+                    direction
                 )
             )
         return result
 
-    def simulate(self, trains: list[Train]) -> list[Train]:
+    def simulate(self, trains: list[Train], tick: Union[int, None] = None, blocking=None,
+                 streams: Union[CounterRandom, None] = None) -> list[Train]:
         """
         Simulate all trains one turn
 
         Parameters
         ----------
         trains list[Train]: list of Train objects to simulate
+        tick (int) default None: the simulated tick, for stations with a delay profile
+        blocking (TrackBlocking) default None: blocking model, trains cannot enter occupied stations
+        streams (CounterRandom) default None: counter-based random source, None uses the random module
 
         Returns
         -------
@@ -558,7 +710,7 @@ class Logic:
         result: list[Train] = trains.copy()
         for train in result:
             train: Train
-            train = train.move()
+            train = train.move(tick, blocking, streams)
         return result
 
     # TODO: create type hints, and refactor
@@ -613,110 +765,242 @@ class Logic:
             if _station.name().lower() == station.lower():
                 return _station
 
-    def get_common_stations(self, station1: Station, station2: Station) -> list[Station]:
+    def get_route_info(self, stations: list[Station], station1: str, station2: str, timesteps: int,
+                       with_path: bool = False) -> Union[bool, tuple[bool, list[str]]]:
         """
-        Get if two stations have a common station
+        Check if it is possible to get from station 1 to station 2 by "t" timesteps,
+        changing lines at a shared station costs no timesteps.
+        A route may change lines at any number of shared stations and its timesteps are the
+        moves between neighbouring stations.
+        Looks the timesteps up in the distance table if one is loaded (see load_distances),
+        otherwise searches from both stations at once (see CompiledNetwork.hub_path)
+        and gives up once the searches are more than "t" timesteps apart
 
         Parameters
         ----------
-        station1 (Station): first station 
-        station2 (Station): second station
+        stations (list[Station]): list of Station objects
+        station1 (str): first station
+        station2 (str): second station
+        timesteps (int): amount timesteps 
+        with_path (bool) default False: also return the stations of the route
 
         Returns
         -------
-        list[Station]: list of all common stations
+        bool: whether station 2 is reachable from station 1 by "t" timesteps
+        list[str]: (with_path only) station names from station 1 to station 2, empty if not reachable
         """
-        # store all stations on the same line of stations one and two (parameters)
-        station1_line_stations = station1.line().stations()
-        station2_line_stations = [x.name() for x in station2.line().stations()]
-        common_stations = [station for station in station1_line_stations
-                           if station.name() in station2_line_stations]
-        return common_stations
+        network: CompiledNetwork = self.compile_network(stations)
+        hub1: int = network.hub(station1)
+        hub2: int = network.hub(station2)
+
+        if hub1 < 0 or hub2 < 0:
+            print("Invalid station names")
+            return (False, []) if with_path else False
+
+        distances_network, distances = self._distances
+        if distances_network is network:
+            steps: int = distances.distance(hub1, hub2)
+            is_reachable: bool = 0 <= steps <= timesteps
+            if not with_path:
+                return is_reachable
+            path: list[int] = network.hub_path(hub1, hub2, steps) if is_reachable else []
+        else:
+            path: list[int] = network.hub_path(hub1, hub2, timesteps) if timesteps >= 0 else []
+            is_reachable: bool = bool(path)
+        if with_path:
+            return is_reachable, [network.hub_name(hub) for hub in path]
+        return is_reachable
 
-    def get_shortest_common_steps(self, station1: Station, station2: Station, common_stations: list[Station]) -> int:
+    def fast_forward(self, trains: list[Train], stations: list[Station], ticks: int,
+                     tick: Union[int, None] = None, streams: Union[CounterRandom, None] = None) -> list[Train]:
         """
-        Get the shortest path from station 1 to station 2 by going through a common station 
+        Simulate all trains "n" turns at once (see FastForward), the positions have the same
+        distribution as calling simulate() "n" times. With delay profiles every turn is simulated.
+        With counter-based streams the positions are the same as calling simulate() "n" times
+
+        Parameters
+        ----------
+        trains (list[Train]): list of Train objects to simulate
+        stations (list[Station]): list of Station objects the trains run on
+        ticks (int): number of turns
+        tick (int) default None: the first simulated tick, for stations with a delay profile
+        streams (CounterRandom) default None: counter-based random source (needs a tick)
+
+        Returns
+        -------
+        list[Train]: list of Train objects after the turns
+        """
+        network: CompiledNetwork = self.compile_network(stations)
+        if streams is None and tick is not None and network.delay_period() > 1:
+            for turn in range(ticks):
+                trains = self.simulate(trains, tick + turn)
+            return trains
+
+        fast_forward_network, fast_forward = self._fast_forward
+        if fast_forward_network is not network:
+            fast_forward = FastForward(network)
+            self._fast_forward = (network, fast_forward)
+        fleet: FleetState = FleetState.from_trains(network, trains)
+        fast_forward.fleet(fleet, ticks, tick=tick, streams=streams)
+
+        before: list[tuple[Station, str]] = [(train.station_obj(), train.direction()) for train in trains]
+        fleet.to_trains(network, trains)
+        for train, (old_station, old_direction) in zip(trains, before):
+            if train.station_obj() is not old_station or train.direction() != old_direction:
+                for observer in train._observers:
+                    observer.train_moved(train, old_station, old_direction)
+        return trains
+
+    def compile_network(self, stations: list[Station]) -> CompiledNetwork:
+        """
+        Get the compiled network of a stations list, compiled once and reused
+        while the same list is passed
 
         Parameters
         ----------
-        station1 (Station): first station
-        station2 (Station): second station
-        common_stations list[Station]: list of all common stations
+        stations (list[Station]): list of Station objects
 
         Returns
         -------
-        int: number of steps of the shortest path
+        CompiledNetwork: compiled network
         """
-        steps: int = 9999
-        for common_station in common_stations:
-            station1_steps: int = self.get_timesteps(station1, common_station)
-            station2_steps: int = self.get_timesteps(station2, common_station)
-            total_steps: int = station1_steps + station2_steps
-            # if steps is greater than total_steps then update its value to total_steps,
-            # otherwise keep steps value unchanged.
-            steps = total_steps if total_steps < steps else steps
-        return steps
+        compiled_stations, network = self._compiled
+        if compiled_stations is not stations or network.size() != len(stations):
+            network = CompiledNetwork(stations)
+            self._compiled = (stations, network)
+        return network
 
-    def get_timesteps(self, station1: Station, station2: Station) -> int:
+    def get_journeys(self, lines: list[Line], station1: str, station2: str, transfer_penalty: int = 0,
+                     max_transfers: Union[int, None] = None) -> list[tuple[int, int, list[Leg]]]:
         """
-        Get number of steps between two stations on the same line
+        Get the journeys from station 1 to station 2 that trade timesteps against
+        line changes (see Raptor), fewest transfers first
 
         Parameters
         ----------
-        station1 (Station): first station
-        station2 (Station): second station
+        lines (list[Line]): list of Line objects
+        station1 (str): first station
+        station2 (str): second station
+        transfer_penalty (int) default 0: timesteps a line change counts for when journeys are
+            compared, not included in the reported timesteps
+        max_transfers (int) default None: most line changes, None for no limit
 
         Returns
         -------
-        int: absoulte value of steps between two stations
+        list[tuple[int, int, list[Leg]]]: (timesteps, transfers, legs) of every journey
         """
-        # get line's stations "in order", then find each station's index,
-        # then subtract the indexes from each other and return the absoulte value
-        stations_order: list[str] = station1.line().stations_list_string()
-        station1_indx: int = stations_order.index(station1.name())
-        station2_indx: int = stations_order.index(station2.name())
-        return abs(station2_indx - station1_indx)
+        raptor_lines, raptor = self._raptor
+        if raptor_lines is not lines:
+            raptor = Raptor(lines)
+            self._raptor = (lines, raptor)
+        return raptor.journeys(station1, station2, transfer_penalty, max_transfers)
 
-    def get_route_info(self, stations: list[Station], station1: str, station2: str, timesteps: int) -> bool:
+    def load_distances(self, stations: list[Station], directory: str) -> DistanceTable:
         """
-        Check if it is possible to get from station 1 to station 2 by "t" timesteps
+        Map the distance table of a stations list from a directory, building it if missing,
+        get_route_info then answers from the table
 
         Parameters
         ----------
         stations (list[Station]): list of Station objects
-        station1 (str): first station
-        station2 (str): second station
-        timesteps (int): amount timesteps 
+        directory (str): directory of the distance tables, e.g. of the network files
+
+        Raises
+        ------
+        ValueError: if the network is too big or too long for a distance table
 
         Returns
         -------
-        bool: whether station 2 is reachable from station 1 by "t" timesteps
+        DistanceTable: the mapped table
         """
-        st1_obj: Union[Station, None] = self.get_station_obj(
-            stations, station1)
-        st2_obj: Union[Station, None] = self.get_station_obj(
-            stations, station2)
+        network: CompiledNetwork = self.compile_network(stations)
+        distances_network, distances = self._distances
+        if distances_network is not network:
+            if distances is not None:
+                distances.close()
+            distances = DistanceTable.open(directory, network)
+            self._distances = (network, distances)
+        return distances
 
-        if not st1_obj or not st2_obj:
-            print("Invalid station names")
-            return False
+    def get_isochrone(self, stations: list[Station], sources: list[str], timesteps: int) -> dict[str, int]:
+        """
+        Get all stations reachable from one or more stations within "t" timesteps,
+        changing lines at a shared station costs no timesteps (like get_route_info)
 
-        on_same_line: bool = st1_obj.line() == st2_obj.line()
+        Parameters
+        ----------
+        stations (list[Station]): list of Station objects
+        sources (list[str]): names of the stations to start from
+        timesteps (int): amount timesteps
 
-        if on_same_line:
-            station1_to_station2: int = self.get_timesteps(st1_obj, st2_obj)
-            is_reachable: bool = timesteps >= station1_to_station2
+        Returns
+        -------
+        dict[str, int]: timesteps to each reachable station, nearest first
+        """
+        network: CompiledNetwork = self.compile_network(stations)
+        hubs: list[int] = [network.hub(x) for x in sources if network.hub(x) >= 0]
+        if not hubs or timesteps < 0:
+            return {}
+        distances = network.hub_distances(hubs, timesteps)
+        reachable = sorted((distance, hub) for hub, distance in enumerate(distances) if distance >= 0)
+        return {network.hub_name(hub): distance for distance, hub in reachable}
 
-        else:  # different lines
-            # get all common stations between station1 and station2
-            # find out which common station has the shortest path
-            # check if total timesteps is in range of the wished timesteps
-            common_stations: list[Station] = self.get_common_stations(
-                st1_obj, st2_obj)
-            if not common_stations:
-                return False
-            shortest_common_station: int = self.get_shortest_common_steps(
-                st1_obj, st2_obj, common_stations)
-            is_reachable: bool = timesteps >= shortest_common_station
+    def get_arrival_probability(self, stations: list[Station], station1: str, station2: str, timesteps: int,
+                                tick: Union[int, None] = None, samples: int = 0) -> float:
+        """
+        Get the probability of getting from station 1 to station 2 by "t" timesteps
+        when trains are delayed by the stations' delay probabilities (see ArrivalProbability)
 
-        return is_reachable
+        Parameters
+        ----------
+        stations (list[Station]): list of Station objects
+        station1 (str): first station
+        station2 (str): second station
+        timesteps (int): amount timesteps
+        tick (int) default None: tick of departure, for stations with a delay profile
+        samples (int) default 0: number of Monte Carlo samples, 0 to compute exactly
+
+        Returns
+        -------
+        float: probability of arriving in time, 0 if not reachable
+        """
+        network: CompiledNetwork = self.compile_network(stations)
+        arrivals_network, arrivals = self._arrivals
+        if arrivals_network is not network:
+            arrivals = ArrivalProbability(network)
+            self._arrivals = (network, arrivals)
+        return arrivals.probability(station1, station2, timesteps, tick, samples)
+
+    def get_delay_risk(self, trains: list[Train], stations: list[Station], run: int = 3, timesteps: int = 100,
+                       relative_error: float = 0.1, method: str = "ce", tick: Union[int, None] = None,
+                       rng=random) -> dict:
+        """
+        Estimate the probability that a train of the fleet is delayed at "k" or more consecutive
+        stations within "t" timesteps (see DelayRisk), with the exact probability to check it
+
+        Parameters
+        ----------
+        trains (list[Train]): list of Train objects, a sample starts from a random one
+        stations (list[Station]): list of Station objects the trains run on
+        run (int) default 3: number of consecutive delayed stations
+        timesteps (int) default 100: amount timesteps
+        relative_error (float) default 0.1: half width of the 95% confidence interval relative to the estimate
+        method (str) default "ce": "ce" for importance sampling tilted by cross-entropy, "mc" for plain Monte Carlo
+        tick (int) default None: the first simulated tick, for stations with a delay profile
+        rng (random.Random) default random: random number generator
+
+        Returns
+        -------
+        dict: see DelayRisk.estimate, with the "exact" probability and the "train_steps"
+            of the cross-entropy iterations included
+        """
+        network: CompiledNetwork = self.compile_network(stations)
+        fleet: FleetState = FleetState.from_trains(network, trains)
+        keys: list[int] = [station * 2 + direction for station, direction
+                           in zip(fleet.table("station"), fleet.table("direction"))]
+        risk = DelayRisk(network, run, timesteps)
+        tilt, steps = risk.cross_entropy(keys, tick=tick, rng=rng) if method == "ce" else (None, 0)
+        result: dict = risk.estimate(keys, tilt, relative_error, tick=tick, rng=rng)
+        result["train_steps"] += steps
+        result["exact"] = sum(risk.exact(key, tick) for key in keys) / len(keys) if keys else 0.0
+        return result
@@ -0,0 +1,182 @@
+from typing import Union
+from classes.station import Station
+from classes.train import Train
+
+
+class StationOccupancy:
+    """
+    A class to index which trains are at, arriving at or departing from a station.
+
+    The index is updated by the trains themselves (see Train.add_observer),
+    so every query only touches the stations involved and the trains returned.
+
+    ...
+
+    Attributes
+    ----------
+    _trains (dict[Station, dict[str, set[Train]]]): trains at each station grouped by direction
+    _by_name (dict[str, list[Station]]): Station objects grouped by lower case station name
+    _neighbours (dict[Station, list[Station]]): stations connected to each station on its line
+
+    Methods
+    -------
+    add():
+        Adds a train to the index and starts following its moves
+    train_moved():
+        Moves a train from its old station bucket to its current one
+    trains_at():
+        Returns trains currently at a station
+    trains_arriving():
+        Returns trains whose next stop is the station
+    trains_departing():
+        Returns trains at the station whose next stop is another station
+    """
+
+    def __init__(self, stations: list[Station], trains: Union[list[Train], None] = None):
+        """
+        Constructs the index for a list of stations and optionally a list of trains.
+
+        Parameters
+        ----------
+        stations (list[Station]): list of Station objects
+        trains (list[Train]) default None: trains to add to the index
+        """
+        self._trains: dict[Station, dict[str, set[Train]]] = {}
+        self._by_name: dict[str, list[Station]] = {}
+        self._neighbours: dict[Station, list[Station]] = {}
+
+        for station in stations:
+            self._by_name.setdefault(station.name().lower(), []).append(station)
+            self._neighbours.setdefault(station, [])
+            # link stations both ways, some stations are only pointed at by their neighbours
+            for neighbour in (station.next_station(), station.previous_station()):
+                if isinstance(neighbour, Station):
+                    if neighbour not in self._neighbours[station]:
+                        self._neighbours[station].append(neighbour)
+                    back_links = self._neighbours.setdefault(neighbour, [])
+                    if station not in back_links:
+                        back_links.append(station)
+
+        for train in trains or []:
+            self.add(train)
+
+    def add(self, train: Train) -> None:
+        """
+        Add a train to the index and register the index as the train's observer
+
+        Parameters
+        ----------
+        train (Train): train to add
+        """
+        self._bucket(train.station_obj(), train.direction()).add(train)
+        train.add_observer(self)
+
+    def train_moved(self, train: Train, old_station: Station, old_direction: str) -> None:
+        """
+        Update the index after a train changed station or direction
+
+        Parameters
+        ----------
+        train (Train): train that moved
+        old_station (Station): station the train was at before moving
+        old_direction (str): direction the train had before moving
+        """
+        self._bucket(old_station, old_direction).discard(train)
+        self._bucket(train.station_obj(), train.direction()).add(train)
+
+    def trains_at(self, station: str, line: Union[str, None] = None, direction: Union[str, None] = None) -> list[Train]:
+        """
+        Get trains currently at a station
+
+        Parameters
+        ----------
+        station (str): station name
+        line (str) default None: only include trains on this line
+        direction (str) default None: only include trains heading in this direction
+
+        Returns
+        -------
+        list[Train]: trains at the station
+        """
+        result: list[Train] = []
+        for _station in self._stations(station, line):
+            for _direction, trains in self._trains.get(_station, {}).items():
+                if direction is None or _direction == direction:
+                    result.extend(trains)
+        return result
+
+    def trains_arriving(self, station: str, line: Union[str, None] = None, direction: Union[str, None] = None) -> list[Train]:
+        """
+        Get trains at a neighbouring station that will stop at the station on their next move
+
+        Parameters
+        ----------
+        station (str): station name
+        line (str) default None: only include trains on this line
+        direction (str) default None: only include trains heading in this direction
+
+        Returns
+        -------
+        list[Train]: trains arriving at the station
+        """
+        result: list[Train] = []
+        for _station in self._stations(station, line):
+            for neighbour in self._neighbours.get(_station, []):
+                heading: Union[str, None] = self._heading(neighbour, _station)
+                if heading and (direction is None or heading == direction):
+                    result.extend(self._trains.get(neighbour, {}).get(heading, ()))
+        return result
+
+    def trains_departing(self, station: str, line: Union[str, None] = None, direction: Union[str, None] = None) -> list[Train]:
+        """
+        Get trains at the station that will leave for another station on their next move
+        (trains at a last station that still have to turn around are not departing)
+
+        Parameters
+        ----------
+        station (str): station name
+        line (str) default None: only include trains on this line
+        direction (str) default None: only include trains heading in this direction
+
+        Returns
+        -------
+        list[Train]: trains departing from the station
+        """
+        result: list[Train] = []
+        for _station in self._stations(station, line):
+            for _direction, trains in self._trains.get(_station, {}).items():
+                if direction is not None and _direction != direction:
+                    continue
+                if _station.direction() == _direction:
+                    next_stop = _station.next_station()
+                else:
+                    next_stop = _station.previous_station()
+                if isinstance(next_stop, Station):
+                    result.extend(trains)
+        return result
+
+    def _bucket(self, station: Station, direction: str) -> set[Train]:
+        """
+        Get (or create) the set of trains at a station heading in a direction
+        """
+        return self._trains.setdefault(station, {}).setdefault(direction, set())
+
+    def _stations(self, station: str, line: Union[str, None]) -> list[Station]:
+        """
+        Get the Station objects with a given name, optionally only on one line
+        """
+        stations: list[Station] = self._by_name.get(station.lower(), [])
+        if line is None:
+            return stations
+        return [x for x in stations if x.line().name().lower() == line.lower()]
+
+    def _heading(self, from_station: Station, to_station: Station) -> Union[str, None]:
+        """
+        Get the direction a train at from_station must have to move to to_station
+        (same rules as Train.set_station)
+        """
+        if from_station.next_station() is to_station:
+            return from_station.direction()
+        if from_station.previous_station() is to_station:
+            return "N" if (from_station.direction() == "S") else "S"
+        return None
@@ -0,0 +1,303 @@
+import random
+from array import array
+from collections import deque
+from typing import Union
+from classes.compiled import CompiledNetwork, DIRECTIONS, FleetState
+from classes.train import Train
+
+
+class PassengerFlow:
+    """
+    A class to simulate passengers travelling between stations on the trains.
+
+    Every tick, each origin-destination pair of the demand matrix generates riders
+    at its origin. Riders follow the shortest route (changing lines at shared
+    stations), split into legs on one line each: they wait at the leg's first
+    station for a train heading towards the leg's last station, ride it and
+    alight there, then wait for the next leg or leave the network.
+
+    Riders are not objects, only counts: the waiting riders of every
+    (station, direction) and the riders on every train are grouped by leg.
+
+    ...
+
+    Attributes
+    ----------
+    _network (CompiledNetwork): network the trains run on
+    _capacity (int): most passengers on one train, 0 for no limit
+    _random (random.Random): generator of the riders (separate from the trains' delays)
+    _legs (list[tuple[int, int, int]]): (boarding key, alighting station id, next leg or -1) of each leg
+    _demand (list[tuple[int, float]]): (first leg, riders per tick) of each origin-destination pair
+    _waiting (list[dict[int, int]]): waiting riders by leg, by station id * 2 + direction
+    _waiting_total (array): number of waiting riders by station id * 2 + direction
+    _cargo (list[dict[int, dict[int, int]]]): riders by alighting station id and leg, by train
+    _load (array): number of riders by train
+    _generated (int): number of generated riders
+    _delivered (int): number of riders that reached their destination
+
+    Methods
+    -------
+    parse_demand():
+        Returns the demand matrix of demand file lines
+    step():
+        Generates, boards and alights riders for a FleetState
+    step_trains():
+        Generates, boards and alights riders for Train objects
+    queue_lengths():
+        Returns number of waiting riders by station name
+    train_loads():
+        Returns number of riders on each train
+    report():
+        Returns a printable report of the longest queues and fullest trains
+    """
+
+    def __init__(self, _network: CompiledNetwork, _demand: dict[tuple[str, str], float],
+                 _trains: int, _capacity: int = 0, _seed: Union[int, None] = None):
+        """
+        Constructs the passenger flow and routes every origin-destination pair.
+
+        Parameters
+        ----------
+        _network (CompiledNetwork): network the trains run on (built from Station objects)
+        _demand (dict[tuple[str, str], float]): riders per tick by (origin, destination) station names
+        _trains (int): number of trains
+        _capacity (int) default 0: most passengers on one train, 0 for no limit
+        _seed (int) default None: seed of the riders' random generator
+        """
+        self._network: CompiledNetwork = _network
+        self._capacity: int = _capacity
+        self._random = random.Random(_seed)
+        self._legs: list[tuple[int, int, int]] = []
+        self._demand: list[tuple[int, float]] = []
+        self._waiting: list[dict[int, int]] = [{} for _ in range(_network.size() * 2)]
+        self._waiting_total: array = array("l", [0]) * (_network.size() * 2)
+        self._cargo: list[dict[int, dict[int, int]]] = [{} for _ in range(_trains)]
+        self._load: array = array("l", [0]) * _trains
+        self._generated: int = 0
+        self._delivered: int = 0
+
+        for (origin, destination), rate in _demand.items():
+            first_leg: int = self._route(origin, destination)
+            if first_leg >= 0 and rate > 0:
+                self._demand.append((first_leg, rate))
+
+    @staticmethod
+    def parse_demand(data: list[str]) -> dict[tuple[str, str], float]:
+        """
+        Get the demand matrix of demand file lines, formatted as
+        "origin station,destination station,riders per tick" (invalid lines are dropped)
+
+        Parameters
+        ----------
+        data (list[str]): demand file lines
+
+        Returns
+        -------
+        dict[tuple[str, str], float]: riders per tick by (origin, destination)
+        """
+        result: dict[tuple[str, str], float] = {}
+        for line in data:
+            row: list[str] = line.strip().split(",")
+            if line.startswith("#") or len(row) != 3 or not row[0] or not row[1]:
+                continue
+            try:
+                rate = float(row[2])
+            except ValueError:
+                continue
+            result[(row[0], row[1])] = result.get((row[0], row[1]), 0.0) + rate
+        return result
+
+    def _route(self, origin: str, destination: str) -> int:
+        """
+        Find the shortest route between two station names (0-1 BFS over station ids,
+        changing lines costs nothing) and store it as legs, returns the first leg or -1
+        """
+        network: CompiledNetwork = self._network
+        origin_hub, destination_hub = network.hub(origin), network.hub(destination)
+        if origin_hub < 0 or destination_hub < 0 or origin_hub == destination_hub:
+            return -1
+
+        hub = network.table("hub")
+        offsets, members = network.table("member_offsets"), network.table("members")
+        distance: dict[int, int] = {}
+        parent: dict[int, int] = {}
+        queue: deque = deque()
+        for station in members[offsets[origin_hub]:offsets[origin_hub + 1]]:
+            distance[station] = 0
+            parent[station] = -1
+            queue.append(station)
+
+        end: int = -1
+        while queue:
+            station: int = queue.popleft()
+            if hub[station] == destination_hub:
+                end = station
+                break
+            edges = [(x, 0) for x in network.transfers(station)] + [(x, 1) for x in network.neighbours(station)]
+            for neighbour, cost in edges:
+                if neighbour not in distance or distance[station] + cost < distance[neighbour]:
+                    distance[neighbour] = distance[station] + cost
+                    parent[neighbour] = station
+                    if cost:
+                        queue.append(neighbour)
+                    else:
+                        queue.appendleft(neighbour)
+        if end < 0:
+            return -1
+
+        path: list[int] = [end]
+        while parent[path[-1]] >= 0:
+            path.append(parent[path[-1]])
+        path.reverse()
+
+        # split the path into legs on one line, a change of hub-mates is a transfer
+        legs: list[tuple[int, int, int]] = []
+        start: int = 0
+        for index in range(1, len(path)):
+            if hub[path[index]] == hub[path[index - 1]]:
+                if index - 1 > start:
+                    legs.append((path[start], path[start + 1], path[index - 1]))
+                start = index
+        if len(path) - 1 > start:
+            legs.append((path[start], path[start + 1], path[-1]))
+
+        move = network.table("move")
+        first_leg: int = len(self._legs)
+        for number, (board, towards, alight) in enumerate(legs):
+            keys: list[int] = [board * 2 + d for d in range(len(DIRECTIONS)) if move[board * 2 + d] == towards]
+            if not keys:
+                del self._legs[first_leg:]
+                return -1
+            next_leg: int = first_leg + number + 1 if number + 1 < len(legs) else -1
+            self._legs.append((keys[0], alight, next_leg))
+        return first_leg
+
+    def step(self, fleet: FleetState) -> None:
+        """
+        Alight and board riders on every train at its current station,
+        then generate the riders of this tick. Call after the trains moved
+
+        Parameters
+        ----------
+        fleet (FleetState): trains, in the same order as when the flow was created
+        """
+        station, direction = fleet.table("station"), fleet.table("direction")
+        for index in range(len(station)):
+            self._stop(index, station[index], station[index] * 2 + direction[index])
+        self._generate()
+
+    def step_trains(self, trains: list[Train]) -> None:
+        """
+        Alight and board riders on every train at its current station,
+        then generate the riders of this tick. Call after the trains moved
+
+        Parameters
+        ----------
+        trains (list[Train]): trains, in the same order as when the flow was created
+        """
+        for index, train in enumerate(trains):
+            station: int = self._network.id(train.station_obj())
+            self._stop(index, station, station * 2 + DIRECTIONS.index(train.direction()))
+        self._generate()
+
+    def _stop(self, train: int, station: int, key: int) -> None:
+        """
+        Alight the riders of a train at its station and board the waiting riders
+        """
+        cargo: dict[int, dict[int, int]] = self._cargo[train]
+        if cargo and station in cargo:
+            for leg, count in cargo.pop(station).items():
+                self._load[train] -= count
+                next_leg: int = self._legs[leg][2]
+                if next_leg < 0:
+                    self._delivered += count
+                else:
+                    self._wait(next_leg, count)
+
+        if not self._waiting_total[key]:
+            return
+        room: int = self._capacity - self._load[train] if self._capacity else self._waiting_total[key]
+        waiting: dict[int, int] = self._waiting[key]
+        for leg in list(waiting):
+            if room <= 0:
+                break
+            count: int = min(waiting[leg], room)
+            alight: int = self._legs[leg][1]
+            riders: dict[int, int] = cargo.setdefault(alight, {})
+            riders[leg] = riders.get(leg, 0) + count
+            self._load[train] += count
+            self._waiting_total[key] -= count
+            room -= count
+            if count == waiting[leg]:
+                del waiting[leg]
+            else:
+                waiting[leg] -= count
+
+    def _wait(self, leg: int, count: int) -> None:
+        """
+        Add riders to the queue of a leg's boarding station and direction
+        """
+        key: int = self._legs[leg][0]
+        self._waiting[key][leg] = self._waiting[key].get(leg, 0) + count
+        self._waiting_total[key] += count
+
+    def _generate(self) -> None:
+        """
+        Generate this tick's riders, the fraction of a rate is a probability of one more rider
+        """
+        rand = self._random.random
+        for leg, rate in self._demand:
+            count: int = int(rate) + (rand() < rate - int(rate))
+            if count:
+                self._wait(leg, count)
+                self._generated += count
+
+    def queue_lengths(self) -> dict[str, int]:
+        """
+        Get number of waiting riders by station name (all lines and directions)
+
+        Returns
+        -------
+        dict[str, int]: waiting riders by station name
+        """
+        hub = self._network.table("hub")
+        result: dict[str, int] = {}
+        for key, count in enumerate(self._waiting_total):
+            if count:
+                name: str = self._network.hub_name(hub[key // 2])
+                result[name] = result.get(name, 0) + count
+        return result
+
+    def train_loads(self) -> array:
+        """
+        Get number of riders on each train
+
+        Returns
+        -------
+        array: riders by train, in fleet order
+        """
+        return self._load
+
+    def report(self, trains: list[Train], top: int = 5) -> str:
+        """
+        Get a printable report of the longest queues and the fullest trains
+
+        Parameters
+        ----------
+        trains (list[Train]): trains, in the same order as when the flow was created
+        top (int) default 5: number of stations and trains to list
+
+        Returns
+        -------
+        str: printed string of passengers information
+        """
+        queues = sorted(self.queue_lengths().items(), key=lambda x: x[1], reverse=True)[:top]
+        loads = sorted(range(len(self._load)), key=lambda x: self._load[x], reverse=True)[:top]
+        result: str = (f'\nPassengers: {self._generated} generated, {self._delivered} arrived, '
+                       f'{sum(self._waiting_total)} waiting, {sum(self._load)} on trains\n')
+        for name, count in queues:
+            result += f'\nStation {name} has {count} waiting passengers\n'
+        for index in loads:
+            if self._load[index]:
+                result += f'\nTrain {trains[index].id()} carries {self._load[index]} passengers\n'
+        return result
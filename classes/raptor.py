@@ -0,0 +1,160 @@
+from typing import Union
+from classes.line import Line
+from classes.station import Station
+
+# a leg of a journey: (line name, boarding station, alighting station)
+Leg = tuple[str, str, str]
+
+
+class Raptor:
+    """
+    A class to find the journeys between two stations that trade timesteps against line changes.
+
+    Round-based (RAPTOR): round k finds the fewest timesteps to every station
+    using k lines. A round only scans the lines serving a station improved in
+    the previous round, each line once in both directions in track order
+    (every station in between counts one timestep). The track order is walked
+    along the next stations from a first station, as Line.stations() follows
+    the order of the connections file. A station only counts
+    as improved when it gets strictly faster than with fewer lines, so the
+    result of every round that improves the destination is one journey of the
+    Pareto set of (timesteps, transfers). A transfer penalty is added to the
+    timesteps of every line change while journeys are compared, so a journey
+    with more transfers must be faster by more than the penalty; the reported
+    timesteps are the travel timesteps without it.
+
+    ...
+
+    Attributes
+    ----------
+    _lines (list[Line]): list of Line objects
+    _tracks (list[tuple[str, list[Station]]]): line name and stations in track order of every
+        connected run of stations of a line
+    _serving (dict[str, list[tuple[int, int]]]): tracks and positions on them, by lower case station name
+    _names (dict[str, str]): station name, by lower case station name
+
+    Methods
+    -------
+    journeys():
+        Returns the Pareto set of journeys between two stations
+    """
+
+    def __init__(self, _lines: list[Line]):
+        """
+        Constructs the index of the lines serving every station.
+
+        Parameters
+        ----------
+        _lines (list[Line]): list of Line objects (after Logic.set_line_stations)
+        """
+        self._lines: list[Line] = _lines
+        self._tracks: list[tuple[str, list[Station]]] = [
+            (line.name(), track) for line in _lines for track in self._track_order(line)]
+        self._serving: dict[str, list[tuple[int, int]]] = {}
+        self._names: dict[str, str] = {}
+        for track, (_, stations) in enumerate(self._tracks):
+            for index, station in enumerate(stations):
+                self._serving.setdefault(station.name().lower(), []).append((track, index))
+                self._names.setdefault(station.name().lower(), station.name())
+
+    @staticmethod
+    def _track_order(line: Line) -> list[list[Station]]:
+        """
+        Walk the stations of a line along their next stations, starting from the stations
+        without a previous station (a loop starts anywhere), returns every connected run
+        """
+        stations: list[Station] = line.stations()
+        members: set[Station] = set(stations)
+        seen: set[Station] = set()
+        result: list[list[Station]] = []
+        starts: list[Station] = [x for x in stations if not isinstance(x.previous_station(), Station)]
+        for station in starts + stations:
+            track: list[Station] = []
+            while isinstance(station, Station) and station in members and station not in seen:
+                seen.add(station)
+                track.append(station)
+                station = station.next_station()
+            if track:
+                result.append(track)
+        return result
+
+    def journeys(self, origin: str, destination: str, transfer_penalty: int = 0,
+                 max_transfers: Union[int, None] = None) -> list[tuple[int, int, list[Leg]]]:
+        """
+        Get the Pareto set of journeys between two stations: no journey of the set
+        is both as fast and with as few transfers as another one
+
+        Parameters
+        ----------
+        origin (str): origin station name
+        destination (str): destination station name
+        transfer_penalty (int) default 0: timesteps a line change counts for when journeys are
+            compared, not included in the reported timesteps
+        max_transfers (int) default None: most line changes, None for no limit
+
+        Returns
+        -------
+        list[tuple[int, int, list[Leg]]]: (timesteps, transfers, legs) of every journey,
+            fewest transfers first, empty if a station does not exist or is not reachable
+        """
+        origin, destination = origin.lower(), destination.lower()
+        if origin not in self._serving or destination not in self._serving:
+            return []
+        if origin == destination:
+            return [(0, 0, [])]
+
+        best: dict[str, int] = {origin: 0}
+        # (track, boarding position, alighting position) of every improved station, by round
+        parents: list[dict[str, tuple[int, int, int]]] = [{}]
+        marked: set[str] = {origin}
+        result: list[tuple[int, int, list[Leg]]] = []
+        rounds: int = 0
+
+        while marked and (max_transfers is None or rounds <= max_transfers):
+            rounds += 1
+            penalty: int = transfer_penalty if rounds > 1 else 0
+            boarding: dict[str, int] = {name: best[name] + penalty for name in marked}
+            tracks: set[int] = {track for name in marked for track, _ in self._serving[name]}
+            improved: dict[str, tuple[int, int, int]] = {}
+
+            for track in tracks:
+                stations: list[Station] = self._tracks[track][1]
+                for order in (range(len(stations)), range(len(stations) - 1, -1, -1)):
+                    carried: Union[int, None] = None
+                    board: int = -1
+                    for index in order:
+                        name: str = stations[index].name().lower()
+                        if carried is not None:
+                            carried += 1
+                            # a station is only improved if it is faster than the destination too
+                            limit: int = min(best.get(name, carried + 1), best.get(destination, carried + 1))
+                            if carried < limit:
+                                best[name] = carried
+                                improved[name] = (track, board, index)
+                        if name in boarding and (carried is None or boarding[name] < carried):
+                            carried, board = boarding[name], index
+
+            parents.append(improved)
+            if destination in improved:
+                # the journey of round k rides k lines, so it carries k - 1 penalties
+                timesteps: int = best[destination] - (rounds - 1) * transfer_penalty
+                result.append((timesteps, rounds - 1, self._legs(parents, destination, rounds)))
+            marked = set(improved)
+        return result
+
+    def _legs(self, parents: list[dict[str, tuple[int, int, int]]], name: str, rounds: int) -> list[Leg]:
+        """
+        Get the legs of the journey to a station found in a round
+        """
+        result: list[Leg] = []
+        while rounds > 0:
+            track, board, alight = parents[rounds][name]
+            line, stations = self._tracks[track]
+            result.append((line, stations[board].name(), stations[alight].name()))
+            name = stations[board].name().lower()
+            rounds -= 1
+            # the boarding station was reached in the latest earlier round that improved it
+            while rounds > 0 and name not in parents[rounds]:
+                rounds -= 1
+        result.reverse()
+        return result
@@ -0,0 +1,274 @@
+import os
+import struct
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Union
+from classes.compiled import CompiledNetwork, DIRECTIONS
+from classes.train import Train
+
+# Pillow is only needed to use a map image (e.g. stockholm-metro-map.jpg) as background
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# marker colours of the lines, by line id
+PALETTE: list[tuple[int, int, int]] = [
+    (220, 40, 40), (30, 110, 220), (40, 160, 60), (240, 150, 20), (150, 60, 190),
+    (20, 170, 170), (200, 60, 140), (110, 110, 110), (160, 120, 40), (0, 0, 0)]
+# rows per separately compressed band of a frame
+BAND: int = 16
+MARKER: int = 6
+
+
+class FrameRenderer:
+    """
+    A class to record train positions every tick and render them as PNG frames.
+
+    Stations are drawn at the coordinates of an optional coordinates file
+    ("station,x,y" lines, in pixels of the background), otherwise every line is
+    drawn as a row. The background is the map image if Pillow is installed and
+    an image is given, otherwise a blank canvas.
+
+    A frame draws one marker per (station, line, direction) that has trains.
+    Frames are rendered by a process pool, each worker rendering a run of
+    consecutive frames: between two frames only the markers that changed are
+    redrawn, and only the bands of rows they touch are compressed again.
+
+    ...
+
+    Attributes
+    ----------
+    _network (CompiledNetwork): network the trains run on
+    _width (int): frame width
+    _height (int): frame height
+    _background (bytes): RGB pixels of the background, with the stations drawn
+    _markers (dict[int, tuple]): rectangle (x, y) and colour of each marker (station id * 2 + direction)
+    _frames (list[array]): sorted markers of every recorded tick
+
+    Methods
+    -------
+    parse_coordinates():
+        Returns station coordinates of coordinates file lines
+    record():
+        Records the positions of the trains
+    frames():
+        Returns number of recorded frames
+    render():
+        Writes all frames as PNG files
+    """
+
+    def __init__(self, _network: CompiledNetwork, _coordinates: Union[dict[str, tuple[int, int]], None] = None,
+                 _image: str = "", _size: tuple[int, int] = (0, 0)):
+        """
+        Constructs the renderer and draws the background.
+
+        Parameters
+        ----------
+        _network (CompiledNetwork): network the trains run on (built from Station objects)
+        _coordinates (dict[str, tuple[int, int]]) default None: pixel coordinates by station name
+        _image (str) default "": background image file, needs Pillow
+        _size (tuple[int, int]) default (0, 0): frame size without image, (0, 0) fits the stations
+        """
+        self._network: CompiledNetwork = _network
+        self._frames: list[array] = []
+        positions: dict[int, tuple[int, int]] = self._layout(_coordinates)
+
+        if _image and Image is not None:
+            with Image.open(_image) as image:
+                image = image.convert("RGB")
+                self._width, self._height = image.size
+                background = bytearray(image.tobytes())
+        else:
+            self._width = _size[0] or max([x for x, _ in positions.values()] + [0]) + 40
+            self._height = _size[1] or max([y for _, y in positions.values()] + [0]) + 40
+            background = bytearray(b"\xf5") * (self._width * self._height * 3)
+
+        # marker of a station's line and direction, next to the station position
+        self._markers: dict[int, tuple] = {}
+        line = _network.table("line")
+        for station, (x, y) in positions.items():
+            for direction in range(len(DIRECTIONS)):
+                offset: int = (line[station] % 4) * (MARKER + 1)
+                rectangle = (x + offset - 2 * MARKER if direction == 0 else x + offset,
+                             y - MARKER - 1 if direction == 0 else y + 2)
+                colour = PALETTE[line[station] % len(PALETTE)]
+                self._markers[station * 2 + direction] = (rectangle, colour)
+            self._fill(background, (x - 2, y - 2), 4, (60, 60, 60))
+        self._background: bytes = bytes(background)
+
+    @staticmethod
+    def parse_coordinates(data: list[str]) -> dict[str, tuple[int, int]]:
+        """
+        Get station coordinates of coordinates file lines formatted as "station,x,y"
+        (invalid lines are dropped)
+
+        Parameters
+        ----------
+        data (list[str]): coordinates file lines
+
+        Returns
+        -------
+        dict[str, tuple[int, int]]: (x, y) by station name
+        """
+        result: dict[str, tuple[int, int]] = {}
+        for line in data:
+            row: list[str] = line.strip().split(",")
+            if line.startswith("#") or len(row) != 3 or not row[0]:
+                continue
+            try:
+                result[row[0]] = (int(float(row[1])), int(float(row[2])))
+            except ValueError:
+                continue
+        return result
+
+    def _layout(self, coordinates: Union[dict[str, tuple[int, int]], None]) -> dict[int, tuple[int, int]]:
+        """
+        Get the pixel position of every station id, from the coordinates or one row per line
+        """
+        network: CompiledNetwork = self._network
+        result: dict[int, tuple[int, int]] = {}
+        if coordinates:
+            lower: dict[str, tuple[int, int]] = {name.lower(): xy for name, xy in coordinates.items()}
+            for station in range(network.size()):
+                name: str = network.hub_name(network.table("hub")[station]).lower()
+                if name in lower:
+                    result[station] = lower[name]
+            return result
+
+        columns: dict[int, int] = {}
+        for station in range(network.size()):
+            line: int = network.table("line")[station]
+            columns[line] = columns.get(line, 0) + 1
+            result[station] = (20 + columns[line] * 4 * MARKER, 20 + line * 5 * MARKER)
+        return result
+
+    def _fill(self, pixels: bytearray, corner: tuple[int, int], size: int, colour: tuple[int, int, int]) -> None:
+        """
+        Fill a square of a pixel buffer, clipped to the frame
+        """
+        x0, y0 = max(corner[0], 0), max(corner[1], 0)
+        x1, y1 = min(corner[0] + size, self._width), min(corner[1] + size, self._height)
+        if x1 <= x0:
+            return
+        row: bytes = bytes(colour) * (x1 - x0)
+        for y in range(y0, y1):
+            start: int = (y * self._width + x0) * 3
+            pixels[start:start + len(row)] = row
+
+    def record(self, trains: list[Train]) -> None:
+        """
+        Record the positions of the trains as the next frame
+
+        Parameters
+        ----------
+        trains (list[Train]): list of Train objects
+        """
+        markers: set[int] = {self._network.id(train.station_obj()) * 2 + DIRECTIONS.index(train.direction())
+                             for train in trains}
+        self._frames.append(array("i", sorted(x for x in markers if x in self._markers)))
+
+    def frames(self) -> int:
+        """
+        Get number of recorded frames
+
+        Returns
+        -------
+        int: number of frames
+        """
+        return len(self._frames)
+
+    def render(self, directory: str, workers: int = 0) -> list[str]:
+        """
+        Write every recorded frame as a PNG file, rendered by a process pool
+
+        Parameters
+        ----------
+        directory (str): output directory, created if missing
+        workers (int) default 0: number of worker processes, 0 uses one per cpu
+
+        Returns
+        -------
+        list[str]: written file paths
+        """
+        os.makedirs(directory, exist_ok=True)
+        workers = min(workers or os.cpu_count() or 1, max(len(self._frames), 1))
+        chunk: int = max(-(-len(self._frames) // workers), 1)
+        paths: list[str] = [os.path.join(directory, f"frame_{index:05d}.png")
+                            for index in range(len(self._frames))]
+        jobs = [(self._width, self._height, self._background, self._markers,
+                 self._frames[start:start + chunk], paths[start:start + chunk])
+                for start in range(0, len(self._frames), chunk)]
+        with ProcessPoolExecutor(len(jobs) or 1) as pool:
+            list(pool.map(_render_frames, *zip(*jobs)))
+        return paths
+
+
+def _render_frames(width: int, height: int, background: bytes, markers: dict[int, tuple],
+                   frames: list[array], paths: list[str]) -> None:
+    """
+    Worker: render consecutive frames, redrawing only changed markers and
+    compressing again only the bands of rows they touch
+    """
+    pixels = bytearray(background)
+    stride: int = width * 3
+    bands: int = -(-height // BAND)
+    compressed: list[Union[bytes, None]] = [None] * bands
+    shown: set[int] = set()
+
+    def draw(marker: int, erase: bool) -> None:
+        (x, y), colour = markers[marker]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + MARKER, width), min(y + MARKER, height)
+        for row in range(y0, y1):
+            start, stop = row * stride + x0 * 3, row * stride + x1 * 3
+            pixels[start:stop] = background[start:stop] if erase else bytes(colour) * (x1 - x0)
+        for band in range(y0 // BAND, min(-(-y1 // BAND), bands)):
+            compressed[band] = None
+
+    # markers by band of rows, to find markers overlapping an erased one
+    by_band: dict[int, list[int]] = {}
+    for marker, ((_, y), _) in markers.items():
+        for band in range(max(y, 0) // BAND, max(y + MARKER - 1, 0) // BAND + 1):
+            by_band.setdefault(band, []).append(marker)
+
+    def overlaps(first: int, second: int) -> bool:
+        (x0, y0), _ = markers[first]
+        (x1, y1), _ = markers[second]
+        return abs(x0 - x1) < MARKER and abs(y0 - y1) < MARKER
+
+    for frame, path in zip(frames, paths):
+        current: set[int] = set(frame)
+        redraw: set[int] = current - shown
+        for marker in shown - current:
+            draw(marker, True)
+            (_, y), _ = markers[marker]
+            for band in range(max(y, 0) // BAND, max(y + MARKER - 1, 0) // BAND + 1):
+                redraw.update(x for x in by_band.get(band, []) if x in current and overlaps(x, marker))
+        for marker in redraw:
+            draw(marker, False)
+        shown = current
+
+        for band in range(bands):
+            if compressed[band] is None:
+                rows = b"".join(b"\x00" + pixels[row * stride:(row + 1) * stride]
+                                for row in range(band * BAND, min((band + 1) * BAND, height)))
+                compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+                compressed[band] = compressor.compress(rows) + compressor.flush(zlib.Z_FULL_FLUSH)
+
+        checksum: int = 1
+        for row in range(height):
+            checksum = zlib.adler32(b"\x00", checksum)
+            checksum = zlib.adler32(pixels[row * stride:(row + 1) * stride], checksum)
+        finish = zlib.compressobj(6, zlib.DEFLATED, -15)
+        data: bytes = (b"\x78\x01" + b"".join(compressed) + finish.flush(zlib.Z_FINISH)
+                       + struct.pack(">I", checksum))
+
+        with open(path, "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n")
+            for kind, body in ((b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+                               (b"IDAT", data), (b"IEND", b"")):
+                f.write(struct.pack(">I", len(body)) + kind + body
+                        + struct.pack(">I", zlib.crc32(kind + body)))
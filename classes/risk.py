@@ -0,0 +1,296 @@
+import math
+import random
+from array import array
+from statistics import NormalDist
+from typing import Union
+from classes.compiled import CompiledNetwork
+
+# samples simulated between checks of the confidence interval
+BATCH: int = 1000
+# most samples of an estimate
+MAX_SAMPLES: int = 1_000_000
+# samples of every cross-entropy iteration
+CE_SAMPLES: int = 2000
+# bounds of the delay odds factors found by cross-entropy, making delays less likely
+# than they are gives rare but huge weights
+TILT_MIN: float = 1.0
+TILT_MAX: float = 1e4
+
+
+class DelayRisk:
+    """
+    A class to estimate how likely a train is delayed at "k" or more consecutive stations.
+
+    A train is delayed at a station if it is delayed at least once before leaving
+    it (turning around at a last station is the same visit). The risk is the
+    probability that this happens within "t" ticks, for a train starting from a
+    random state of a fleet. The delays are simulated like CompiledNetwork.step.
+
+    Rare runs are estimated by importance sampling: the samples are simulated
+    with tilted delay probabilities and weighted by the likelihood ratio of the
+    draws up to the run (or the last tick). The tilt multiplies the odds of a
+    delay by a factor that depends on the phase of the train: the current run
+    while it is not yet delayed at its station, or already delayed (phase "k",
+    where more delays only cost time). The factors are found by the
+    cross-entropy method, raising the run length reached by the best samples
+    every iteration until they reach "k". Without a tilt this is plain
+    Monte Carlo. The exact probability is computed by dynamic programming over
+    (position on the train's path, current run, delayed at the current station).
+
+    ...
+
+    Attributes
+    ----------
+    _network (CompiledNetwork): network the trains run on
+    _run (int): number of consecutive delayed stations
+    _ticks (int): number of ticks
+    _next (array): following state, by station id * 2 + direction
+    _exact (dict[tuple[int, Union[int, None]], float]): exact probabilities, by (state, first tick)
+
+    Methods
+    -------
+    exact():
+        Returns the exact probability of a run from one state
+    cross_entropy():
+        Returns the delay odds factors of every phase for importance sampling
+    estimate():
+        Returns an estimate of the probability of a run with its confidence interval
+    """
+
+    def __init__(self, _network: CompiledNetwork, _run: int = 3, _ticks: int = 100):
+        """
+        Constructs the estimator of a network.
+
+        Parameters
+        ----------
+        _network (CompiledNetwork): network the trains run on
+        _run (int) default 3: number of consecutive delayed stations
+        _ticks (int) default 100: number of ticks
+        """
+        self._network: CompiledNetwork = _network
+        self._run: int = max(_run, 1)
+        self._ticks: int = _ticks
+        move, flip = _network.table("move"), _network.table("flip")
+        self._next: array = array("l", [move[key] * 2 + ((key & 1) ^ flip[key])
+                                        for key in range(_network.size() * 2)])
+        self._exact: dict[tuple[int, Union[int, None]], float] = {}
+
+    def _delays(self, tick: Union[int, None]) -> list:
+        """
+        Get the delay probabilities of every simulated tick
+        """
+        if tick is None or self._network.delay_period() <= 1:
+            return [self._network.delays()] * self._ticks
+        return [self._network.delays(tick + t) for t in range(self._ticks)]
+
+    def exact(self, key: int, tick: Union[int, None] = None) -> float:
+        """
+        Get the exact probability of a run, for a train starting from a state
+
+        Parameters
+        ----------
+        key (int): station id * 2 + direction of the train
+        tick (int) default None: first tick, for stations with a delay profile
+
+        Returns
+        -------
+        float: probability of being delayed at "k" consecutive stations within the ticks
+        """
+        if (key, tick) in self._exact:
+            return self._exact[(key, tick)]
+        path: list[int] = [key]
+        # probability by (position on the path, current run, delayed at the current station)
+        mass: dict[tuple[int, int, bool], float] = {(0, 0, False): 1.0}
+        result: float = 0.0
+        for delays in self._delays(tick):
+            following: dict[tuple[int, int, bool], float] = {}
+            for (position, run, delayed), probability in mass.items():
+                station: int = path[position] >> 1
+                p: float = delays[station]
+                if p > 0.0:
+                    if not delayed and run + 1 >= self._run:
+                        result += probability * p
+                    else:
+                        state = (position, run if delayed else run + 1, True)
+                        following[state] = following.get(state, 0.0) + probability * p
+                if p < 1.0:
+                    if position + 1 == len(path):
+                        path.append(self._next[path[-1]])
+                    if path[position + 1] >> 1 == station:
+                        state = (position + 1, run, delayed)
+                    else:
+                        state = (position + 1, run if delayed else 0, False)
+                    following[state] = following.get(state, 0.0) + probability * (1.0 - p)
+            mass = following
+        self._exact[(key, tick)] = result
+        return result
+
+    def _sample(self, key: int, tilt, delays: list, rng,
+                counts: Union[dict[tuple[int, float], list[float]], None] = None) -> tuple[int, float, int]:
+        """
+        Simulate one train with the delay odds multiplied by the tilt of its phase, returns the
+        longest run (capped at "k"), the likelihood ratio of its draws and the number of simulated
+        ticks. With counts, adds the delays and draws by (phase, delay probability) to them
+        """
+        run_length: int = self._run
+        following = self._next
+        log_weight: float = 0.0
+        run: int = 0
+        longest: int = 0
+        visit_delayed: bool = False
+        for t in range(self._ticks):
+            station: int = key >> 1
+            p: float = delays[t][station]
+            if p <= 0.0:
+                delayed: bool = False
+            elif p >= 1.0:
+                delayed = True
+            else:
+                phase: int = run_length if visit_delayed else run
+                factor: float = tilt[phase]
+                # odds of the tilted probability are the odds of p times the factor
+                normalizer: float = 1.0 - p + p * factor
+                delayed = rng.random() * normalizer < p * factor
+                log_weight += math.log(normalizer) - (math.log(factor) if delayed else 0.0)
+                if counts is not None:
+                    count: list[float] = counts.setdefault((phase, p), [0.0, 0.0])
+                    count[0] += delayed
+                    count[1] += 1.0
+            if delayed:
+                if not visit_delayed:
+                    visit_delayed = True
+                    run += 1
+                    if run >= run_length:
+                        return run, math.exp(log_weight), t + 1
+                    longest = max(longest, run)
+            else:
+                if following[key] >> 1 != station:
+                    run = run if visit_delayed else 0
+                    visit_delayed = False
+                key = following[key]
+        return longest, math.exp(log_weight), self._ticks
+
+    def cross_entropy(self, keys: list[int], samples: int = CE_SAMPLES, rho: float = 0.01,
+                      iterations: int = 20, smoothing: float = 0.7, tick: Union[int, None] = None,
+                      rng=random) -> tuple[array, int]:
+        """
+        Find the delay odds factors of every phase for importance sampling by the cross-entropy method
+
+        Parameters
+        ----------
+        keys (list[int]): station id * 2 + direction of the trains, a sample starts from a random one
+        samples (int) default CE_SAMPLES: samples of every iteration
+        rho (float) default 0.01: fraction of best samples the tilt is fitted to (at least)
+        iterations (int) default 20: most iterations
+        smoothing (float) default 0.7: weight of the new (log) factors against the previous ones
+        tick (int) default None: first tick, for stations with a delay profile
+        rng (random.Random) default random: random number generator
+
+        Returns
+        -------
+        array: delay odds factor by phase (current run, or "k" if delayed at the current station)
+        int: number of simulated train ticks
+        """
+        tilt: array = array("d", [1.0]) * (self._run + 1)
+        delays: list = self._delays(tick)
+        steps: int = 0
+        for _ in range(iterations if keys else 0):
+            results: list[tuple[int, float, dict[tuple[int, float], list[float]]]] = []
+            for _ in range(samples):
+                counts: dict[tuple[int, float], list[float]] = {}
+                longest, weight, ticks = self._sample(keys[rng.randrange(len(keys))], tilt, delays, rng, counts)
+                results.append((longest, weight, counts))
+                steps += ticks
+            # the level is the run length reached by the best rho of the samples
+            scores: list[int] = sorted(x[0] for x in results)
+            level: int = max(min(scores[min(int((1.0 - rho) * samples), samples - 1)], self._run), 1)
+            totals: list[dict[float, list[float]]] = [{} for _ in tilt]
+            for longest, weight, counts in results:
+                if longest < level:
+                    continue
+                for (phase, p), (delayed, draws) in counts.items():
+                    total: list[float] = totals[phase].setdefault(p, [0.0, 0.0])
+                    total[0] += weight * delayed
+                    total[1] += weight * draws
+            for phase, total in enumerate(totals):
+                # a run longer than the level was not needed by the elite, its phase keeps its factor
+                if total and (phase < level or phase == self._run):
+                    fitted: float = self._fit(total, tilt[phase])
+                    tilt[phase] = math.exp(smoothing * math.log(fitted) + (1.0 - smoothing) * math.log(tilt[phase]))
+            if level >= self._run:
+                break
+        return tilt, steps
+
+    @staticmethod
+    def _fit(total: dict[float, list[float]], factor: float) -> float:
+        """
+        Get the odds factor whose expected delays equal the weighted delays of the elite samples
+        (the cross-entropy optimum), by Newton's method on the log of the factor
+        """
+        delayed: float = sum(x[0] for x in total.values())
+        draws: float = sum(x[1] for x in total.values())
+        if delayed <= 0.0 or delayed >= draws:
+            return TILT_MIN if delayed <= 0.0 else TILT_MAX
+        log_factor: float = math.log(factor)
+        for _ in range(50):
+            factor = math.exp(log_factor)
+            expected, slope = 0.0, 0.0
+            for p, (_, count) in total.items():
+                q: float = p * factor / (1.0 - p + p * factor)
+                expected += count * q
+                slope += count * q * (1.0 - q)
+            step: float = (delayed - expected) / slope if slope > 0.0 else 0.0
+            log_factor = min(max(log_factor + max(min(step, 2.0), -2.0), math.log(TILT_MIN)), math.log(TILT_MAX))
+            if abs(step) < 1e-9:
+                break
+        return math.exp(log_factor)
+
+    def estimate(self, keys: list[int], tilt=None, relative_error: float = 0.1, confidence: float = 0.95,
+                 max_samples: int = MAX_SAMPLES, tick: Union[int, None] = None, rng=random) -> dict:
+        """
+        Estimate the probability of a run, sampling until the confidence interval is
+        within the relative error of the estimate
+
+        Parameters
+        ----------
+        keys (list[int]): station id * 2 + direction of the trains, a sample starts from a random one
+        tilt (array) default None: delay odds factor by phase (see cross_entropy), None for plain Monte Carlo
+        relative_error (float) default 0.1: half width of the confidence interval relative to the estimate
+        confidence (float) default 0.95: confidence level of the interval
+        max_samples (int) default MAX_SAMPLES: most samples
+        tick (int) default None: first tick, for stations with a delay profile
+        rng (random.Random) default random: random number generator
+
+        Returns
+        -------
+        dict: "estimate", confidence interval "low" and "high", effective sample size "ess"
+            of the weights, "samples", "hits" (samples with a run) and simulated "train_steps",
+            all 0 without trains
+        """
+        tilt = array("d", [1.0]) * (self._run + 1) if tilt is None else tilt
+        if not keys:
+            return {"estimate": 0.0, "low": 0.0, "high": 0.0, "ess": 0.0, "samples": 0, "hits": 0, "train_steps": 0}
+        delays: list = self._delays(tick)
+        z: float = NormalDist().inv_cdf(0.5 + confidence / 2)
+        samples, hits, steps = 0, 0, 0
+        total, squares, weights, weight_squares = 0.0, 0.0, 0.0, 0.0
+        mean, half_width = 0.0, math.inf
+        while samples < max_samples:
+            for _ in range(min(BATCH, max_samples - samples)):
+                longest, weight, ticks = self._sample(keys[rng.randrange(len(keys))], tilt, delays, rng)
+                steps += ticks
+                weights += weight
+                weight_squares += weight * weight
+                if longest >= self._run:
+                    hits += 1
+                    total += weight
+                    squares += weight * weight
+                samples += 1
+            mean = total / samples
+            variance: float = max(squares / samples - mean * mean, 0.0) * samples / max(samples - 1, 1)
+            half_width = z * math.sqrt(variance / samples)
+            if hits > 1 and half_width <= relative_error * mean:
+                break
+        return {"estimate": mean, "low": max(mean - half_width, 0.0), "high": mean + half_width,
+                "ess": weights * weights / weight_squares if weight_squares > 0.0 else 0.0,
+                "samples": samples, "hits": hits, "train_steps": steps}
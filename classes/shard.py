@@ -0,0 +1,235 @@
+import multiprocessing
+import random
+from typing import Union
+from classes.line import Line
+from classes.station import Station
+from classes.train import Train
+from classes.logic import Logic
+from classes.streams import CounterRandom
+
+
+# state of one train as sent between processes:
+# (train id, line name, index of the station in line.stations(), direction, is delayed)
+TrainState = tuple[int, str, int, str, bool]
+
+
+class ShardedSimulation:
+    """
+    A class to simulate trains in parallel, with lines split across worker processes.
+
+    Trains never leave their line, so every worker builds the network from the
+    raw file lines and simulates only the trains of its own lines. Workers advance
+    on their own and the state is only sent back when it is asked for.
+
+    ...
+
+    Attributes
+    ----------
+    _workers (list[tuple]): (process, pipe) of each worker
+    _shards (list[list[str]]): line names simulated by each worker
+    _ticks (int): number of simulated ticks
+
+    Methods
+    -------
+    shards():
+        Returns the line names simulated by each worker
+    ticks():
+        Returns the number of simulated ticks
+    advance():
+        Lets every worker simulate a number of ticks
+    train_states():
+        Gathers the state of all trains from the workers
+    sync():
+        Copies the gathered state into Train objects
+    close():
+        Stops the worker processes
+    """
+
+    def __init__(self, connections: list[str], stations: list[str], trains: list[Train],
+                 workers: int = 0, seed: Union[int, None] = None, streams: Union[CounterRandom, None] = None,
+                 tick: int = 0):
+        """
+        Partitions the lines between the workers and starts the worker processes.
+
+        Parameters
+        ----------
+        connections (list[str]): lines of the connections file the trains were generated on
+        stations (list[str]): lines of the stations file the trains were generated on
+        trains (list[Train]): trains to simulate
+        workers (int) default 0: number of worker processes, 0 uses one per cpu
+        seed (int) default None: seed of the workers' random generators
+        streams (CounterRandom) default None: counter-based random source, the trajectories
+            are then the same as simulating all trains in one process (seed is not used)
+        tick (int) default 0: tick the trains are at, e.g. of a restored checkpoint
+        """
+        workers = workers or multiprocessing.cpu_count()
+        self._ticks: int = 0
+
+        positions: dict[Station, int] = {}
+        for line in {train.line() for train in trains}:
+            positions.update((station, index) for index, station in enumerate(line.stations()))
+        shard_trains: dict[str, list[TrainState]] = {}
+        for train in trains:
+            shard_trains.setdefault(train.line().name(), []).append(
+                self.train_state(train, positions))
+
+        # greedy partitioning, biggest line first to the least loaded worker
+        self._shards: list[list[str]] = [[] for _ in range(min(workers, len(shard_trains)) or 1)]
+        loads: list[int] = [0 for _ in self._shards]
+        for line in sorted(shard_trains, key=lambda x: len(shard_trains[x]), reverse=True):
+            worker: int = loads.index(min(loads))
+            self._shards[worker].append(line)
+            loads[worker] += len(shard_trains[line])
+
+        self._workers: list[tuple] = []
+        for index, lines in enumerate(self._shards):
+            parent, child = multiprocessing.Pipe()
+            states: list[TrainState] = [state for line in lines for state in shard_trains[line]]
+            process = multiprocessing.Process(
+                target=_run_worker,
+                args=(child, connections, stations, states,
+                      None if seed is None else seed + index, streams, tick),
+                daemon=True)
+            process.start()
+            child.close()
+            self._workers.append((process, parent))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def shards(self) -> list[list[str]]:
+        """
+        Get the line names simulated by each worker
+
+        Returns
+        -------
+        list[list[str]]: line names per worker
+        """
+        return self._shards
+
+    def ticks(self) -> int:
+        """
+        Get number of simulated ticks
+
+        Returns
+        -------
+        int: number of ticks
+        """
+        return self._ticks
+
+    def advance(self, ticks: int = 1) -> None:
+        """
+        Let every worker simulate a number of ticks, without waiting for them
+
+        Parameters
+        ----------
+        ticks (int) default 1: number of ticks to simulate
+        """
+        for _, pipe in self._workers:
+            pipe.send(("advance", ticks))
+        self._ticks += ticks
+
+    def train_states(self) -> list[TrainState]:
+        """
+        Wait for the workers and gather the state of all trains
+
+        Returns
+        -------
+        list[TrainState]: state of every train, sorted by train id
+        """
+        for _, pipe in self._workers:
+            pipe.send(("state", None))
+        result: list[TrainState] = []
+        for _, pipe in self._workers:
+            result.extend(pipe.recv())
+        result.sort()
+        return result
+
+    def sync(self, trains: list[Train]) -> list[Train]:
+        """
+        Copy the workers' train states into Train objects of the same network
+
+        Parameters
+        ----------
+        trains (list[Train]): Train objects the simulation was started with
+
+        Returns
+        -------
+        list[Train]: the updated Train objects
+        """
+        by_id: dict[int, Train] = {train.id(): train for train in trains}
+        for train_id, _, station, direction, delayed in self.train_states():
+            train: Train = by_id[train_id]
+            train._station = train.line().stations()[station]
+            train._direction = direction
+            train._is_delayed = delayed
+        return trains
+
+    def close(self) -> None:
+        """
+        Stop the worker processes
+        """
+        for process, pipe in self._workers:
+            try:
+                pipe.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+            process.join()
+            pipe.close()
+        self._workers = []
+
+    @staticmethod
+    def train_state(train: Train, positions: Union[dict[Station, int], None] = None) -> TrainState:
+        """
+        Get the state of a train in a form that can be sent to another process
+
+        Parameters
+        ----------
+        train (Train): Train object
+        positions (dict[Station, int]) default None: index of each station on its line
+
+        Returns
+        -------
+        TrainState: (id, line name, station index on line, direction, is delayed)
+        """
+        line: Line = train.line()
+        if positions is None:
+            station: int = line.stations().index(train.station_obj())
+        else:
+            station = positions[train.station_obj()]
+        return (train.id(), line.name(), station, train.direction(), train.is_delayed())
+
+
+def _run_worker(pipe, connections: list[str], stations: list[str], states: list[TrainState],
+                seed: Union[int, None], streams: Union[CounterRandom, None] = None, tick: int = 0) -> None:
+    """
+    Worker process: builds the network, then simulates its trains on request
+    """
+    random.seed(seed)
+    logic = Logic()
+    lines, _ = logic.build_network(connections, stations)
+    lines_by_name: dict[str, Line] = {line.name(): line for line in lines}
+    positions: dict[Station, int] = {station: index for line in lines
+                                     for index, station in enumerate(line.stations())}
+
+    trains: list[Train] = []
+    for train_id, line_name, station, direction, delayed in states:
+        line: Line = lines_by_name[line_name]
+        train = Train(train_id, line, line.stations()[station], direction)
+        train._is_delayed = delayed
+        trains.append(train)
+
+    while True:
+        command, value = pipe.recv()
+        if command == "advance":
+            for _ in range(value):
+                logic.simulate(trains, tick, streams=streams)
+                tick += 1
+        elif command == "state":
+            pipe.send([ShardedSimulation.train_state(train, positions) for train in trains])
+        else:
+            break
+    pipe.close()
@@ -0,0 +1,266 @@
+import multiprocessing
+import random
+from array import array
+from multiprocessing import shared_memory
+from typing import Union
+from classes.compiled import CompiledNetwork, FleetState
+from classes.streams import CounterRandom
+
+
+# name of a table -> (shared memory block name, array type code, length)
+Descriptor = dict[str, tuple[str, str, int]]
+
+
+class SharedState:
+    """
+    A class to hold a compiled network and a fleet state in shared memory blocks.
+
+    The process that exports the tables owns the blocks, other processes attach
+    to them by their descriptors and read and write the same memory (zero-copy).
+
+    ...
+
+    Attributes
+    ----------
+    _blocks (list[SharedMemory]): shared memory blocks of all tables
+    _owner (bool): whether the blocks were created (and must be unlinked) by this object
+    _network (CompiledNetwork): network using the shared tables
+    _fleet (FleetState): fleet state using the shared tables
+    _descriptor (dict[str, Descriptor]): "network" and "fleet" table descriptors
+
+    Methods
+    -------
+    export():
+        Copies a network and a fleet state into new shared memory blocks
+    attach():
+        Attaches to shared memory blocks exported by another process
+    network():
+        Returns the network backed by shared memory
+    fleet():
+        Returns the fleet state backed by shared memory
+    descriptor():
+        Returns what another process needs to attach
+    close():
+        Releases the blocks, and removes them if they are owned
+    """
+
+    def __init__(self):
+        """
+        Constructs an empty shared state, use export() or attach()
+        """
+        self._blocks: list[shared_memory.SharedMemory] = []
+        self._owner: bool = False
+        self._network: Union[CompiledNetwork, None] = None
+        self._fleet: Union[FleetState, None] = None
+        self._descriptor: dict[str, Descriptor] = {}
+
+    @classmethod
+    def export(cls, network: CompiledNetwork, fleet: FleetState) -> "SharedState":
+        """
+        Copy a network and a fleet state into new shared memory blocks
+
+        Parameters
+        ----------
+        network (CompiledNetwork): network to share
+        fleet (FleetState): fleet state to share
+
+        Returns
+        -------
+        SharedState: owner of the new blocks
+        """
+        result = cls()
+        result._owner = True
+        network_views: dict = {}
+        for name, table in network.tables().items():
+            network_views[name] = result._share("network", name, table)
+        fleet_views: dict = {}
+        for name, table in fleet.tables().items():
+            fleet_views[name] = result._share("fleet", name, table)
+        result._network = CompiledNetwork.from_tables(network_views)
+        result._fleet = FleetState.from_tables(fleet_views)
+        return result
+
+    @classmethod
+    def attach(cls, descriptor: dict[str, Descriptor]) -> "SharedState":
+        """
+        Attach to shared memory blocks exported by another process
+
+        Parameters
+        ----------
+        descriptor (dict[str, Descriptor]): descriptor of the exporting SharedState
+
+        Returns
+        -------
+        SharedState: state using the shared blocks
+        """
+        result = cls()
+        result._descriptor = descriptor
+        views: dict[str, dict] = {"network": {}, "fleet": {}}
+        for group, tables in descriptor.items():
+            for name, (block_name, code, length) in tables.items():
+                block = shared_memory.SharedMemory(name=block_name)
+                result._blocks.append(block)
+                views[group][name] = result._view(block, code, length)
+        result._network = CompiledNetwork.from_tables(views["network"])
+        result._fleet = FleetState.from_tables(views["fleet"])
+        return result
+
+    def _share(self, group: str, name: str, table) -> memoryview:
+        """
+        Copy a table into a new shared memory block and return a typed view of it
+        """
+        data: bytes = table.tobytes() if hasattr(table, "tobytes") else bytes(table)
+        # zero sized blocks are not allowed
+        block = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        block.buf[:len(data)] = data
+        self._blocks.append(block)
+        self._descriptor.setdefault(group, {})[name] = (block.name, table.typecode, len(table))
+        return self._view(block, table.typecode, len(table))
+
+    def _view(self, block: shared_memory.SharedMemory, code: str, length: int) -> memoryview:
+        """
+        Get a typed view of the first "length" items of a block
+        """
+        return block.buf[:length * array(code).itemsize].cast(code)
+
+    def network(self) -> CompiledNetwork:
+        """
+        Get the network backed by shared memory
+
+        Returns
+        -------
+        CompiledNetwork: shared network
+        """
+        return self._network
+
+    def fleet(self) -> FleetState:
+        """
+        Get the fleet state backed by shared memory
+
+        Returns
+        -------
+        FleetState: shared fleet state
+        """
+        return self._fleet
+
+    def descriptor(self) -> dict[str, Descriptor]:
+        """
+        Get what another process needs to attach to the blocks
+
+        Returns
+        -------
+        dict[str, Descriptor]: "network" and "fleet" table descriptors
+        """
+        return self._descriptor
+
+    def close(self) -> None:
+        """
+        Release the views and blocks, and remove the blocks if this object owns them
+        """
+        for tables in (self._network.tables() if self._network else {},
+                       self._fleet.tables() if self._fleet else {}):
+            for view in tables.values():
+                view.release()
+        self._network, self._fleet = None, None
+        for block in self._blocks:
+            block.close()
+            if self._owner:
+                block.unlink()
+        self._blocks = []
+
+
+class SharedPool:
+    """
+    A class to simulate a shared fleet state with a pool of worker processes.
+
+    Every worker attaches once to the shared blocks and simulates a contiguous
+    range of trains, so the network and the fleet exist once in memory
+    however many workers there are.
+
+    ...
+
+    Attributes
+    ----------
+    _state (SharedState): shared network and fleet state
+    _pool (multiprocessing.Pool): worker processes
+    _workers (int): number of workers
+    _ticks (int): number of simulated ticks
+
+    Methods
+    -------
+    advance():
+        Simulates every train a number of ticks
+    close():
+        Stops the worker processes
+    """
+
+    def __init__(self, state: SharedState, workers: int = 0):
+        """
+        Starts the worker processes and attaches them to the shared state
+
+        Parameters
+        ----------
+        state (SharedState): exported shared state
+        workers (int) default 0: number of worker processes, 0 uses one per cpu
+        """
+        self._state: SharedState = state
+        self._workers: int = workers or multiprocessing.cpu_count()
+        self._ticks: int = 0
+        self._pool = multiprocessing.Pool(
+            self._workers, initializer=_attach_worker, initargs=(state.descriptor(),))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def advance(self, ticks: int = 1, seed: Union[int, None] = None,
+                streams: Union[CounterRandom, None] = None) -> None:
+        """
+        Simulate every train a number of ticks, each worker a range of trains
+
+        Parameters
+        ----------
+        ticks (int) default 1: number of ticks to simulate
+        seed (int) default None: seed of the workers' random generators for this batch
+        streams (CounterRandom) default None: counter-based random source, the result is then
+            the same for any number of workers (seed is not used)
+        """
+        size: int = self._state.fleet().size()
+        chunk: int = max(-(-size // self._workers), 1)
+        jobs = [(start, min(start + chunk, size), ticks,
+                 self._ticks, None if seed is None else (seed, self._ticks, start), streams)
+                for start in range(0, size, chunk)]
+        self._pool.starmap(_advance_worker, jobs)
+        self._ticks += ticks
+
+    def close(self) -> None:
+        """
+        Stop the worker processes
+        """
+        self._pool.close()
+        self._pool.join()
+
+
+# shared state of a pool worker process
+_WORKER_STATE: Union[SharedState, None] = None
+
+
+def _attach_worker(descriptor: dict[str, Descriptor]) -> None:
+    """
+    Pool initializer: attach the worker process to the shared blocks
+    """
+    global _WORKER_STATE
+    _WORKER_STATE = SharedState.attach(descriptor)
+
+
+def _advance_worker(start: int, stop: int, ticks: int, first_tick: int, seed,
+                    streams: Union[CounterRandom, None] = None) -> None:
+    """
+    Simulate trains start..stop of the shared fleet a number of ticks, starting at first_tick
+    """
+    # seeds are (seed, tick, first train) so every batch and range gets its own stream
+    rand = random.Random(None if seed is None else str(seed)).random
+    for tick in range(first_tick, first_tick + ticks):
+        _WORKER_STATE.network().step(_WORKER_STATE.fleet(), start, stop, rand, tick, streams=streams)
@@ -0,0 +1,385 @@
+import heapq
+import random
+from array import array
+from typing import Callable, Union
+from classes.compiled import CompiledNetwork, DIRECTIONS, FleetState
+from classes.station import Station
+from classes.train import Train
+
+
+class FleetSnapshot:
+    """
+    A class to represent the read-only state of all trains at one tick.
+
+    A snapshot is never changed after it was published: its tables are
+    read-only views, the indexes of the queries are built on first use.
+    Any number of threads can query it while the simulation goes on.
+    Trains arriving, departing and the next arrivals follow the same rules as
+    StationOccupancy and DepartureBoard, but from the tables of the tick.
+
+    ...
+
+    Attributes
+    ----------
+    _network (CompiledNetwork): network the trains run on
+    _tick (int): tick of the state
+    _fleet (FleetState): read-only state tables
+    _horizon (int): number of upcoming stops listed per train by arrivals()
+    _by_id (dict[int, int]): fleet position by train id, built on first use
+    _by_key (dict[int, list[int]]): fleet positions by station id * 2 + direction, built on first use
+    _arriving (dict[int, list[int]]): fleet positions by the station id of their next stop, built on first use
+    _arrivals (dict[int, list[tuple[float, int, str]]]): sorted (expected timesteps, train id, direction
+        on arrival) by station id, built on first use
+
+    Methods
+    -------
+    tick():
+        Returns tick of the state
+    fleet():
+        Returns the read-only state tables
+    train():
+        Returns station, line, direction and delay of a train
+    train_info():
+        Returns a printable string of a train or all trains, like Logic.get_train_info
+    trains_at():
+        Returns ids of the trains at a station
+    trains_arriving():
+        Returns ids of the trains whose next stop is a station
+    trains_departing():
+        Returns ids of the trains at a station whose next stop is another station
+    arrivals():
+        Returns the next trains arriving at a station, with their expected arrival
+    """
+
+    def __init__(self, _network: CompiledNetwork, _tick: int, _fleet: FleetState, _horizon: int = 10):
+        """
+        Constructs the snapshot, taking over the tables of a fleet state.
+
+        Parameters
+        ----------
+        _network (CompiledNetwork): network the trains run on (built from Station objects)
+        _tick (int): tick of the state
+        _fleet (FleetState): state tables, must not be changed afterwards
+        _horizon (int) default 10: number of upcoming stops listed per train by arrivals()
+        """
+        self._network: CompiledNetwork = _network
+        self._tick: int = _tick
+        self._fleet: FleetState = FleetState.from_tables(
+            {name: memoryview(table).toreadonly() for name, table in _fleet.tables().items()})
+        self._horizon: int = _horizon
+        self._by_id: Union[dict[int, int], None] = None
+        self._by_key: Union[dict[int, list[int]], None] = None
+        self._arriving: Union[dict[int, list[int]], None] = None
+        self._arrivals: Union[dict[int, list[tuple[float, int, str]]], None] = None
+
+    def tick(self) -> int:
+        """
+        Get tick of the state
+
+        Returns
+        -------
+        int: tick
+        """
+        return self._tick
+
+    def fleet(self) -> FleetState:
+        """
+        Get the read-only state tables
+
+        Returns
+        -------
+        FleetState: state of the trains at the tick
+        """
+        return self._fleet
+
+    def train(self, train_id: int) -> Union[tuple[Station, str, bool], None]:
+        """
+        Get the state of a train
+
+        Parameters
+        ----------
+        train_id (int): train id
+
+        Returns
+        -------
+        Union[tuple[Station, str, bool], None]: station, direction and whether the train
+            is delayed, or None if there is no such train
+        """
+        if self._by_id is None:
+            self._by_id = {train: index for index, train in enumerate(self._fleet.table("id"))}
+        index: Union[int, None] = self._by_id.get(int(train_id))
+        if index is None:
+            return None
+        return (self._network.stations()[self._fleet.table("station")[index]],
+                DIRECTIONS[self._fleet.table("direction")[index]],
+                bool(self._fleet.table("delayed")[index]))
+
+    def train_info(self, train_id: Union[int, None] = None) -> str:
+        """
+        Get information about a train by id, or all trains without an id (like Logic.get_train_info)
+
+        Parameters
+        ----------
+        train_id (int) default None: train id, None for all trains
+
+        Returns
+        -------
+        str: printed string of train information
+        """
+        ids = self._fleet.table("id") if train_id is None else [int(train_id)]
+        result: str = ""
+        for train in ids:
+            state = self.train(train)
+            if state is None:
+                continue
+            station, direction, is_delayed = state
+            delayed: str = "(DELAY)" if is_delayed else ""
+            result += f'\nTrain {train} on {station.line().name().upper()} line is at station {station.name()} heading in {direction} direction {delayed}\n'
+        return result
+
+    def trains_at(self, station: str, direction: Union[str, None] = None) -> list[int]:
+        """
+        Get ids of the trains at a station
+
+        Parameters
+        ----------
+        station (str): station name
+        direction (str) default None: only include trains heading in this direction
+
+        Returns
+        -------
+        list[int]: train ids
+        """
+        by_key: dict[int, list[int]] = self._keys()
+        ids: memoryview = self._fleet.table("id")
+        return [ids[index] for member in self._members(station)
+                for key in self._directions(member, direction)
+                for index in by_key.get(key, [])]
+
+    def trains_arriving(self, station: str, direction: Union[str, None] = None) -> list[int]:
+        """
+        Get ids of the trains at a neighbouring station that will stop at the station on their next move
+
+        Parameters
+        ----------
+        station (str): station name
+        direction (str) default None: only include trains heading in this direction
+
+        Returns
+        -------
+        list[int]: train ids
+        """
+        if self._arriving is None:
+            move = self._network.table("move")
+            arriving: dict[int, list[int]] = {}
+            for key, indexes in self._keys().items():
+                if move[key] != key >> 1:
+                    arriving.setdefault(move[key], []).extend(indexes)
+            self._arriving = arriving
+        ids, directions = self._fleet.table("id"), self._fleet.table("direction")
+        return [ids[index] for member in self._members(station)
+                for index in self._arriving.get(member, [])
+                if direction is None or DIRECTIONS[directions[index]] == direction]
+
+    def trains_departing(self, station: str, direction: Union[str, None] = None) -> list[int]:
+        """
+        Get ids of the trains at a station that will leave for another station on their next move
+        (trains at a last station that still have to turn around are not departing)
+
+        Parameters
+        ----------
+        station (str): station name
+        direction (str) default None: only include trains heading in this direction
+
+        Returns
+        -------
+        list[int]: train ids
+        """
+        move = self._network.table("move")
+        by_key: dict[int, list[int]] = self._keys()
+        ids: memoryview = self._fleet.table("id")
+        return [ids[index] for member in self._members(station)
+                for key in self._directions(member, direction) if move[key] != member
+                for index in by_key.get(key, [])]
+
+    def arrivals(self, station: str, direction: Union[str, None] = None, line: Union[str, None] = None,
+                 limit: int = 5) -> list[tuple[float, int, str]]:
+        """
+        Get the next trains arriving at a station, soonest first (like DepartureBoard.arrivals).
+        A train leaves a station after 1 / (1 - delay probability) timesteps on average, with
+        the delay probability of the tick it is expected to be there
+
+        Parameters
+        ----------
+        station (str): station name
+        direction (str) default None: only include trains arriving in this direction
+        line (str) default None: only include trains on this line
+        limit (int) default 5: most trains returned
+
+        Returns
+        -------
+        list[tuple[float, int, str]]: expected timesteps, train id and direction on arrival
+        """
+        if self._arrivals is None:
+            self._arrivals = self._list_arrivals()
+        network: CompiledNetwork = self._network
+        members: list[int] = [x for x in self._members(station)
+                              if line is None or network.line_name(network.table("line")[x]).lower() == line.lower()]
+        result: list[tuple[float, int, str]] = []
+        for arrival in heapq.merge(*(self._arrivals.get(x, []) for x in members)):
+            if len(result) >= limit:
+                break
+            if direction is None or arrival[2] == direction:
+                result.append(arrival)
+        return result
+
+    def _keys(self) -> dict[int, list[int]]:
+        """
+        Get (build on first use) the fleet positions by station id * 2 + direction
+        """
+        if self._by_key is None:
+            by_key: dict[int, list[int]] = {}
+            for index, (current, heading) in enumerate(zip(self._fleet.table("station"), self._fleet.table("direction"))):
+                by_key.setdefault(current * 2 + heading, []).append(index)
+            self._by_key = by_key
+        return self._by_key
+
+    def _members(self, station: str) -> list[int]:
+        """
+        Get the station ids of a station name, on all lines
+        """
+        network: CompiledNetwork = self._network
+        hub: int = network.hub(station)
+        if hub < 0:
+            return []
+        offsets = network.table("member_offsets")
+        return list(network.table("members")[offsets[hub]:offsets[hub + 1]])
+
+    @staticmethod
+    def _directions(station: int, direction: Union[str, None]) -> list[int]:
+        """
+        Get the keys (station id * 2 + direction) of a station, optionally only one direction
+        """
+        return [station * 2 + index for index, x in enumerate(DIRECTIONS) if direction is None or x == direction]
+
+    def _list_arrivals(self) -> dict[int, list[tuple[float, int, str]]]:
+        """
+        Walk the next stops of every train and collect their arrivals by station id
+        """
+        network: CompiledNetwork = self._network
+        move, flip = network.table("move"), network.table("flip")
+        following_station, previous_station = network.table("next"), network.table("previous")
+        result: dict[int, list[tuple[float, int, str]]] = {}
+        for train, current, heading in zip(self._fleet.table("id"), self._fleet.table("station"),
+                                           self._fleet.table("direction")):
+            key: int = current * 2 + heading
+            expected: float = 0.0
+            listed: int = 0
+            while listed < self._horizon:
+                current = key >> 1
+                delay: float = network.delay(current, self._tick + int(expected))
+                if delay >= 1.0:
+                    break
+                expected += 1.0 / (1.0 - delay)
+                following: int = move[key] * 2 + ((key & 1) ^ flip[key])
+                # turning around at a last station is not an arrival
+                if following >> 1 != current:
+                    result.setdefault(following >> 1, []).append((expected, train, DIRECTIONS[following & 1]))
+                    listed += 1
+                elif following_station[current] < 0 and previous_station[current] < 0:
+                    break
+                key = following
+        for arrivals in result.values():
+            arrivals.sort()
+        return result
+
+
+class SimulationState:
+    """
+    A class to publish a consistent snapshot of the trains after every tick.
+
+    step() simulates the next tick into new tables (the back buffer) and
+    then replaces the published snapshot with a single reference assignment,
+    which is atomic. Readers take the current snapshot and keep using it
+    without locks; the writer never waits for them and they never see a half
+    simulated tick. An old snapshot is freed when its last reader drops it.
+    Train objects are changed in place while Logic.simulate runs, so with
+    them publish() copies their state into new tables once the tick is done;
+    readers must then query the snapshot, not the Train objects or their
+    observers (StationOccupancy, DepartureBoard).
+
+    ...
+
+    Attributes
+    ----------
+    _network (CompiledNetwork): network the trains run on
+    _snapshot (FleetSnapshot): the published snapshot
+
+    Methods
+    -------
+    snapshot():
+        Returns the published snapshot
+    publish():
+        Publishes the state of Train objects
+    step():
+        Simulates the published state one tick and publishes the result
+    """
+
+    def __init__(self, _network: CompiledNetwork, _trains: list[Train], _tick: int = 0):
+        """
+        Constructs the state and publishes the first snapshot.
+
+        Parameters
+        ----------
+        _network (CompiledNetwork): network the trains run on (built from Station objects)
+        _trains (list[Train]): list of Train objects
+        _tick (int) default 0: current tick
+        """
+        self._network: CompiledNetwork = _network
+        self._snapshot: FleetSnapshot = FleetSnapshot(_network, _tick, FleetState.from_trains(_network, _trains))
+
+    def snapshot(self) -> FleetSnapshot:
+        """
+        Get the published snapshot
+
+        Returns
+        -------
+        FleetSnapshot: state of the trains at the latest published tick
+        """
+        return self._snapshot
+
+    def publish(self, trains: list[Train], tick: int) -> FleetSnapshot:
+        """
+        Publish the state of Train objects, e.g. after Logic.simulate
+
+        Parameters
+        ----------
+        trains (list[Train]): list of Train objects
+        tick (int): tick of the state
+
+        Returns
+        -------
+        FleetSnapshot: the published snapshot
+        """
+        self._snapshot = FleetSnapshot(self._network, tick, FleetState.from_trains(self._network, trains))
+        return self._snapshot
+
+    def step(self, tick: Union[int, None] = None, rand: Callable[[], float] = random.random) -> FleetSnapshot:
+        """
+        Copy the published state, simulate the copy one tick (see CompiledNetwork.step) and publish it
+
+        Parameters
+        ----------
+        tick (int) default None: the simulated tick, for stations with a delay profile
+        rand (Callable) default random.random: random number generator
+
+        Returns
+        -------
+        FleetSnapshot: the published snapshot
+        """
+        front: FleetSnapshot = self._snapshot
+        back: FleetState = FleetState.from_tables(
+            {name: array(code, bytes(front.fleet().table(name))) for name, code in FleetState.TABLES.items()})
+        self._network.step(back, rand=rand, tick=tick)
+        self._snapshot = FleetSnapshot(self._network, front.tick() + 1, back)
+        return self._snapshot
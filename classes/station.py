@@ -1,3 +1,6 @@
+from typing import Union
+
+
 class Station:
     """
     A class to represent a Station.
@@ -12,6 +15,7 @@ class Station:
     _next_station (Station) : next station as object
     _previous_station (Station) : previous station as object
     _direction (str) : direction to next station
+    _delay_table (list[float]) : delay probability of each tick of the delay profile's period, or None
 
     Methods
     -------
@@ -20,7 +24,7 @@ class Station:
     line():
         Returns the line of the station object
     delay():
-        Returns station's delay probability
+        Returns station's delay probability, at a given tick if the station has a delay profile
     next_station():
         Returns station's next station object
     previous_station():
@@ -30,7 +34,8 @@ class Station:
         Returns dict of station's all info
     """
 
-    def __init__(self, _name: str, _line, _delay_probability: float, _next_station, _previous_station, _direction: str):
+    def __init__(self, _name: str, _line, _delay_probability: float, _next_station, _previous_station, _direction: str,
+                 _delay_table: Union[list[float], None] = None):
         """
         Constructs all the necessary attributes for the station object.
 
@@ -42,6 +47,7 @@ class Station:
         _next_station (Station): next station object
         _previous_station (Station): previous station object
         _direction (str): direction to next station
+        _delay_table (list[float]) default None: delay probability of each tick of a period
         """
         self._name: str = _name
         self._line = _line
@@ -49,6 +55,7 @@ class Station:
         self._next_station = _next_station
         self._previous_station = _previous_station
         self._direction: str = _direction
+        self._delay_table: Union[list[float], None] = _delay_table
 
     def name(self) -> str:
         """
@@ -70,15 +77,21 @@ class Station:
         """
         return self._line
 
-    def delay(self) -> float:
+    def delay(self, tick: Union[int, None] = None) -> float:
         """
         Get station delay probability
 
+        Parameters
+        ----------
+        tick (int) default None: current tick, used when the station has a delay profile
+
         Returns
         -------
         float : delay probability
         """
-        return self._delay_probability
+        if tick is None or self._delay_table is None:
+            return self._delay_probability
+        return self._delay_table[tick % len(self._delay_table)]
 
     def next_station(self):
         """
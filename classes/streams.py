@@ -0,0 +1,122 @@
+from array import array
+from typing import Sequence
+
+MASK: int = (1 << 64) - 1
+GAMMA: int = 0x9E3779B97F4A7C15
+# random numbers of a train are drawn from one of these streams
+DELAY: int = 0
+STATION: int = 1
+DIRECTION: int = 2
+
+
+def _mix(value: int) -> int:
+    """
+    The splitmix64 finalizer: a 64 bit integer hash
+    """
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+
+class CounterRandom:
+    """
+    A class to draw random numbers that are a pure function of (seed, train id, tick).
+
+    Every train has its own splitmix64 sequence per stream (delays, starting
+    station, starting direction), the tick is the position in the sequence.
+    A draw does not depend on which other trains were drawn before, so the
+    same seed gives the same trajectories whatever the order of the trains,
+    the split of the work between processes or the engine (Train objects,
+    CompiledNetwork.step, FastForward).
+
+    ...
+
+    Attributes
+    ----------
+    _seed (int): seed
+    _key (int): hash of the seed
+    _train_keys (dict[tuple[int, int], int]): start of the sequence, by (train id, stream)
+
+    Methods
+    -------
+    seed():
+        Returns the seed
+    uniform():
+        Returns the draw of a train at a tick
+    uniforms():
+        Returns the draws of many trains at a tick
+    """
+
+    def __init__(self, _seed: int):
+        """
+        Constructs the random source of a seed.
+
+        Parameters
+        ----------
+        _seed (int): seed
+        """
+        self._seed: int = _seed
+        self._key: int = _mix((_seed * GAMMA) & MASK)
+        self._train_keys: dict[tuple[int, int], int] = {}
+
+    def __getstate__(self) -> dict:
+        # the sequence starts are a cache, workers compute their own
+        return {"_seed": self._seed, "_key": self._key, "_train_keys": {}}
+
+    def seed(self) -> int:
+        """
+        Get the seed
+
+        Returns
+        -------
+        int: seed
+        """
+        return self._seed
+
+    def _train_key(self, train_id: int, stream: int) -> int:
+        """
+        Get the start of the sequence of a train in a stream
+        """
+        key: tuple[int, int] = (train_id, stream)
+        if key not in self._train_keys:
+            self._train_keys[key] = _mix(self._key ^ ((train_id * 4 + stream) & MASK))
+        return self._train_keys[key]
+
+    def uniform(self, train_id: int, tick: int, stream: int = DELAY) -> float:
+        """
+        Get the draw of a train at a tick
+
+        Parameters
+        ----------
+        train_id (int): train id
+        tick (int): tick, the position in the train's sequence
+        stream (int) default DELAY: stream of the draw (DELAY, STATION or DIRECTION)
+
+        Returns
+        -------
+        float: random number in [0, 1)
+        """
+        return (_mix((self._train_key(train_id, stream) + (tick + 1) * GAMMA) & MASK) >> 11) * 2.0 ** -53
+
+    def uniforms(self, train_ids: Sequence[int], tick: int, stream: int = DELAY) -> array:
+        """
+        Get the draws of many trains at a tick, the same as calling uniform() for each
+
+        Parameters
+        ----------
+        train_ids (Sequence[int]): train ids
+        tick (int): tick, the position in the trains' sequences
+        stream (int) default DELAY: stream of the draws
+
+        Returns
+        -------
+        array: random numbers in [0, 1), in the order of the train ids
+        """
+        offset: int = ((tick + 1) * GAMMA) & MASK
+        result: array = array("d", bytes(8 * len(train_ids)))
+        for index, train_id in enumerate(train_ids):
+            value: int = (self._train_key(train_id, stream) + offset) & MASK
+            value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+            value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+            result[index] = ((value ^ (value >> 31)) >> 11) * 2.0 ** -53
+        return result
@@ -0,0 +1,196 @@
+import hashlib
+import itertools
+import json
+import os
+import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from classes.logic import Logic
+from classes.station import Station
+from classes.train import Train
+
+
+class ScenarioSweep:
+    """
+    A class to run a grid of simulation scenarios in a process pool, caching every result on disk.
+
+    A scenario is a dict with:
+        trains (int): number of trains
+        delay_scale (float): factor applied to every delay probability (capped at 1)
+        closed_lines (list[str]): lines removed from the connections
+        seed (int): seed of the random generator
+        ticks (int): number of simulated timesteps
+    Results are cached under a hash of the stations and connections data and the scenario,
+    so re-running a sweep only computes the scenarios that were not run before.
+
+    ...
+
+    Attributes
+    ----------
+    _connections (list[str]): connections file lines
+    _stations (list[str]): stations file lines
+    _cache_dir (str): directory of cached results
+    _workers (int): number of worker processes
+
+    Methods
+    -------
+    grid():
+        Returns every combination of the given parameters as scenarios
+    key():
+        Returns the cache key of a scenario
+    run():
+        Returns the results of the scenarios, computing only the uncached ones
+    run_scenario():
+        Simulates one scenario
+    """
+
+    def __init__(self, _connections: list[str], _stations: list[str],
+                 _cache_dir: str = ".sweep_cache", _workers: int = 0):
+        """
+        Constructs all the necessary attributes for the sweep.
+
+        Parameters
+        ----------
+        _connections (list[str]): connections file lines
+        _stations (list[str]): stations file lines
+        _cache_dir (str) default ".sweep_cache": directory of cached results
+        _workers (int) default 0: number of worker processes, 0 uses one per cpu
+        """
+        self._connections: list[str] = _connections
+        self._stations: list[str] = _stations
+        self._cache_dir: str = _cache_dir
+        self._workers: int = _workers or os.cpu_count() or 1
+
+    @staticmethod
+    def grid(trains: list[int], delay_scale: tuple = (1.0,), closed_lines: tuple = ((),),
+             seeds: tuple = (0,), ticks: tuple = (100,)) -> list[dict]:
+        """
+        Get every combination of the given parameters as scenarios
+
+        Parameters
+        ----------
+        trains (list[int]): numbers of trains
+        delay_scale (list[float]) default (1.0,): delay probability factors
+        closed_lines (list[list[str]]) default ((),): sets of closed lines
+        seeds (list[int]) default (0,): random seeds
+        ticks (list[int]) default (100,): numbers of timesteps
+
+        Returns
+        -------
+        list[dict]: scenarios
+        """
+        return [{"trains": n, "delay_scale": scale, "closed_lines": sorted(closed),
+                 "seed": seed, "ticks": t}
+                for n, scale, closed, seed, t in itertools.product(
+                    trains, delay_scale, closed_lines, seeds, ticks)]
+
+    def key(self, scenario: dict) -> str:
+        """
+        Get the cache key of a scenario: a hash of the input data and the scenario
+
+        Parameters
+        ----------
+        scenario (dict): scenario parameters
+
+        Returns
+        -------
+        str: hex digest
+        """
+        result = hashlib.sha256()
+        result.update("".join(self._connections).encode("utf-8") + b"\0")
+        result.update("".join(self._stations).encode("utf-8") + b"\0")
+        result.update(json.dumps(scenario, sort_keys=True).encode("utf-8"))
+        return result.hexdigest()
+
+    def run(self, scenarios: list[dict]) -> list[dict]:
+        """
+        Get the results of the scenarios, uncached scenarios are simulated in the process pool
+
+        Parameters
+        ----------
+        scenarios (list[dict]): scenarios to run
+
+        Returns
+        -------
+        list[dict]: result of each scenario, in the same order
+        """
+        os.makedirs(self._cache_dir, exist_ok=True)
+        results: list = [self._cached(self.key(scenario)) for scenario in scenarios]
+        missing: list[int] = [index for index, result in enumerate(results) if result is None]
+
+        if missing:
+            with ProcessPoolExecutor(min(self._workers, len(missing))) as pool:
+                computed = pool.map(
+                    self.run_scenario,
+                    itertools.repeat(self._connections), itertools.repeat(self._stations),
+                    [scenarios[index] for index in missing])
+                for index, result in zip(missing, computed):
+                    results[index] = result
+                    self._store(self.key(scenarios[index]), result)
+        return results
+
+    def _cached(self, key: str):
+        """
+        Get a cached result, or None
+        """
+        path: str = os.path.join(self._cache_dir, key + ".json")
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError:
+            return None
+
+    def _store(self, key: str, result: dict) -> None:
+        """
+        Write a result to the cache atomically
+        """
+        handle, temporary = tempfile.mkstemp(dir=self._cache_dir, prefix=".result-")
+        with os.fdopen(handle, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(temporary, os.path.join(self._cache_dir, key + ".json"))
+
+    @staticmethod
+    def run_scenario(connections: list[str], stations: list[str], scenario: dict) -> dict:
+        """
+        Simulate one scenario
+
+        Parameters
+        ----------
+        connections (list[str]): connections file lines
+        stations (list[str]): stations file lines
+        scenario (dict): scenario parameters
+
+        Returns
+        -------
+        dict: the scenario and its result
+            stations (int): number of stations after closing lines
+            delays (int): number of train delays over all timesteps
+            delayed_fraction (float): average share of delayed trains per timestep
+        """
+        closed: set[str] = set(scenario["closed_lines"])
+        open_connections: list[str] = [
+            x for x in connections
+            if x.startswith("#") or len(x.split(",")) < 3 or x.split(",")[2].strip() not in closed]
+
+        logic = Logic()
+        _, network = logic.build_network(open_connections, stations)
+        for station in network:
+            station: Station
+            station._delay_probability = min(1.0, station.delay() * scenario["delay_scale"])
+            if station._delay_table:
+                station._delay_table = [min(1.0, x * scenario["delay_scale"]) for x in station._delay_table]
+
+        random.seed(scenario["seed"])
+        trains: list[Train] = logic.generate_trains(scenario["trains"], network)
+        delays: int = 0
+        for tick in range(scenario["ticks"]):
+            trains = logic.simulate(trains, tick)
+            delays += sum(1 for train in trains if train.is_delayed())
+
+        train_steps: int = len(trains) * scenario["ticks"]
+        return {"scenario": scenario,
+                "stations": len(network),
+                "delays": delays,
+                "delayed_fraction": delays / train_steps if train_steps else 0.0}
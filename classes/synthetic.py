@@ -0,0 +1,105 @@
+import random
+
+
+class SyntheticNetwork:
+    """
+    A class to generate large rail networks in the connections/stations file format.
+
+    ...
+
+    Every line runs south through its own stations. At every "transfer_every"
+    station neighbouring lines share a station, alternating the pairs so that
+    the whole network is connected.
+
+    Attributes
+    ----------
+    _lines (int): number of lines
+    _stations_per_line (int): number of stations on each line
+    _transfer_every (int): distance between transfer stations on a line
+    _max_delay (float): highest generated delay probability
+    _seed (int): seed used to generate delay probabilities
+
+    Methods
+    -------
+    station_name():
+        Returns the name of a station on a line
+    connections():
+        Returns the network as connections file lines
+    stations():
+        Returns the network's delay probabilities as stations file lines
+    """
+
+    def __init__(self, _lines: int, _stations_per_line: int, _transfer_every: int = 5,
+                 _max_delay: float = 0.2, _seed: int = 0):
+        """
+        Constructs all the necessary attributes for the synthetic network.
+
+        Parameters
+        ----------
+        _lines (int): number of lines
+        _stations_per_line (int): number of stations on each line (at least 2)
+        _transfer_every (int) default 5: distance between transfer stations on a line
+        _max_delay (float) default 0.2: highest generated delay probability
+        _seed (int) default 0: seed used to generate delay probabilities
+
+        Raises
+        ------
+        ValueError: if a line would have less than two stations
+        """
+        if _stations_per_line < 2 or _lines < 1 or _transfer_every < 1:
+            raise ValueError
+        self._lines: int = _lines
+        self._stations_per_line: int = _stations_per_line
+        self._transfer_every: int = _transfer_every
+        self._max_delay: float = _max_delay
+        self._seed: int = _seed
+
+    def station_name(self, line: int, index: int) -> str:
+        """
+        Get the name of a station on a line
+
+        Parameters
+        ----------
+        line (int): line number
+        index (int): position of the station on the line
+
+        Returns
+        -------
+        str: station name
+        """
+        if index % self._transfer_every == 0 and self._lines > 1:
+            transfer: int = index // self._transfer_every
+            # pair lines (0,1),(2,3)... and (1,2),(3,4)... on every other transfer
+            return f"X{transfer}_{(line + transfer % 2) // 2}"
+        return f"L{line}S{index}"
+
+    def connections(self) -> list[str]:
+        """
+        Get the network as connections file lines
+
+        Returns
+        -------
+        list[str]: connections file lines
+        """
+        result: list[str] = []
+        for line in range(self._lines):
+            result.append(f"#LINE {line}\n")
+            for index in range(self._stations_per_line - 1):
+                result.append(
+                    f"{self.station_name(line, index)},{self.station_name(line, index + 1)},{line},S\n")
+        return result
+
+    def stations(self) -> list[str]:
+        """
+        Get the delay probability of every station as stations file lines
+
+        Returns
+        -------
+        list[str]: stations file lines
+        """
+        generator = random.Random(self._seed)
+        names: dict[str, None] = {}
+        for line in range(self._lines):
+            for index in range(self._stations_per_line):
+                names[self.station_name(line, index)] = None
+        return [f"{name},{generator.uniform(0, self._max_delay)}\n" for name in names]
@@ -1,6 +1,8 @@
 from __future__ import annotations
+from typing import Union
 from classes.station import Station
 from classes.line import Line
+from classes.streams import CounterRandom
 import random
 
 
@@ -17,6 +19,7 @@ class Train:
     _station (Station): train's current station
     _direction (str): train's current direction
     _is_delayed (bool): train is delayed at current station
+    _observers (tuple): objects notified when the train changes station or direction
 
     Methods
     -------
@@ -38,8 +41,14 @@ class Train:
         Changes train's direction from South (S) to North (N) and vice versa
     set_station():
         Changes train's current station
+    next_position():
+        Returns train's station and direction after its next move
+    following_position():
+        Returns the station and direction after a move from any station and direction
     move():
         Moves train to next/previous station based on direction
+    add_observer():
+        Registers an object to be notified whenever the train moves
     """
 
     def __init__(self, _id: int, _line: Line, _station: Station, _direction: str):
@@ -59,6 +68,7 @@ class Train:
         self._station: Station = _station
         self._direction: str = _direction
         self._is_delayed: bool = False
+        self._observers: tuple = ()
 
     def id(self) -> int:
         """
@@ -120,12 +130,28 @@ class Train:
         """
         return self._is_delayed
 
-    def set_delay(self) -> None:
+    def set_delay(self, tick: Union[int, None] = None, streams: Union[CounterRandom, None] = None) -> None:
         """
         Set train delay by comparing random generated number between 0 and 1
         and the station's delay probability
-        """
-        self._is_delayed = random.random() < self._station.delay()
+
+        Parameters
+        ----------
+        tick (int) default None: current tick, for stations with a delay profile
+        streams (CounterRandom) default None: draw from the train's counter-based stream
+            instead of the random module (needs a tick)
+
+        Raises
+        ------
+        ValueError: if streams are given without a tick
+        """
+        if streams is None:
+            draw: float = random.random()
+        elif tick is None:
+            raise ValueError("Counter-based streams need a tick")
+        else:
+            draw = streams.uniform(self._id, tick)
+        self._is_delayed = draw < self._station.delay(tick)
 
     def change_direction(self) -> None:
         """
@@ -136,30 +162,88 @@ class Train:
     def set_station(self) -> None:
         """
         Sets train current station to either next or previous station based on direction
+        and notifies the train's observers
+        """
+        old_station: Station = self._station
+        old_direction: str = self._direction
+        self._station, self._direction = self.next_position()
+
+        for observer in self._observers:
+            observer.train_moved(self, old_station, old_direction)
+
+    def next_position(self) -> tuple[Station, str]:
+        """
+        Get the station and direction the train will have after its next move
+
+        Returns
+        -------
+        Station: next station
+        str: next direction
+        """
+        return Train.following_position(self._station, self._direction)
+
+    @staticmethod
+    def following_position(station: Station, direction: str) -> tuple[Station, str]:
+        """
+        Get the station and direction a train at a station heading in a direction
+        will have after its next move
+
+        Parameters
+        ----------
+        station (Station): current station
+        direction (str): current direction
+
+        Returns
+        -------
+        Station: next station
+        str: next direction
         """
-        if self._station.direction() == self.direction():
-            if self._station.next_station():
-                self._station = self._station.next_station()
+        if station.direction() == direction:
+            if station.next_station():
+                station = station.next_station()
             # after moving to next station
             # if the station is last station, change direction
-            if not self._station.next_station():
-                self.change_direction()
+            if not station.next_station():
+                direction = "N" if (direction == "S") else "S"
         else:
-            if self._station.previous_station():
-                self._station = self._station.previous_station()
+            if station.previous_station():
+                station = station.previous_station()
             # after moving to previous station (next station but opposite direction)
             # if the station is last station, change direction
-            if not self._station.previous_station():
-                self.change_direction()
+            if not station.previous_station():
+                direction = "N" if (direction == "S") else "S"
+        return station, direction
 
-    def move(self) -> Train:
+    def move(self, tick: Union[int, None] = None, blocking=None,
+             streams: Union[CounterRandom, None] = None) -> Train:
         """
         Sets new delay probability to the current station
-        and moves train to its next station based on direction if there is no delay
+        and moves train to its next station based on direction if there is no delay.
+        With a blocking model, a train that would enter an occupied station is held (delayed)
+
+        Parameters
+        ----------
+        tick (int) default None: current tick, for stations with a delay profile
+        blocking (TrackBlocking) default None: blocking model, None lets trains share stations
+        streams (CounterRandom) default None: counter-based random source, None uses the random module
         """
-        self.set_delay()
+        self.set_delay(tick, streams)
         if not self.is_delayed():
+            if blocking is not None and not blocking.can_enter(self):
+                self._is_delayed = True
+                return self
             self.set_station()
             return self
         else:
             return self
+
+    def add_observer(self, observer) -> None:
+        """
+        Register an observer, its train_moved(train, old_station, old_direction)
+        method is called every time the train changes station or direction
+
+        Parameters
+        ----------
+        observer: object implementing train_moved()
+        """
+        self._observers = self._observers + (observer,)
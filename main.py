@@ -2,18 +2,30 @@ import argparse
 from classes.line import Line
 from classes.station import Station
 from classes.train import Train
+from classes.checkpoint import Checkpoint
+from classes.compiled import CompiledNetwork
+from classes.passengers import PassengerFlow
+from classes.blocking import TrackBlocking
+from classes.events import EventLog
+from classes.snapshot import SimulationState
+from classes.streams import CounterRandom
 from classes.logic import Logic as lgc
 
 # declaring globals
-DATA: list = []
-UNIQUE_LINES: list[str] = []
 LINES: list[Line] = []
 STATIONS: list[Station] = []
 TRAINS: list[Train] = []
+STATE: SimulationState
+CHECKPOINT: Checkpoint = None
+PASSENGERS: PassengerFlow = None
+BLOCKING: TrackBlocking = None
+EVENTS: EventLog = None
+STREAMS: CounterRandom = None
+TRANSFER_PENALTY: int = 0
 TRAINS_INDX: str = ""
 
 
-def main(trains):
+def main(trains, tick: int = 0):
     """ 
     Program main menu.
     Options to select from such as:
@@ -21,21 +33,42 @@ def main(trains):
     2. Get train's info by id
     3. Get all trains' info
     4. Route info between two stations
+    5. Trains at, arriving at and departing from a station, and the next arrivals
+    6. Passenger queues and train loads (with a demand file)
+    7. All stations reachable within timesteps
+    8. Fast forward the simulation by many timesteps
     q. Exit the program
+    With a checkpoint file, the simulation is saved periodically and on exit.
+    With an events file, every move, delay and reversal is written to it.
+    With a seed, the same trains and moves are simulated on every run.
     """
     running: bool = True
+    events: EventLog = EVENTS
     while running:
         user_input = str(
-            input("Continue simulation [1], Train info [2], All trains [3], Route info [4] Exit [q].\nSelect an option: "))
+            input("Continue simulation [1], Train info [2], All trains [3], Route info [4], Station info [5], Passengers [6], Reachable [7], Fast forward [8] Exit [q].\nSelect an option: "))
 
         match user_input:
             case "1":
-                trains = Lgc.simulate(trains)
+                trains = Lgc.simulate(trains, tick, BLOCKING, STREAMS)
+                STATE.publish(trains, tick + 1)
+                if events:
+                    try:
+                        events.record(trains, tick)
+                    except Exception as error:
+                        print(f"Event log failed, no more events are written: {error}")
+                        events.close()
+                        events = None
+                tick += 1
+                if PASSENGERS:
+                    PASSENGERS.step_trains(trains)
+                if CHECKPOINT:
+                    CHECKPOINT.step(STATIONS, trains, tick)
             case "2":
                 train_id = int(input(f"Which train {TRAINS_INDX} : "))
-                print(Lgc.get_train_info(trains, train_id))
+                print(STATE.snapshot().train_info(train_id))
             case "3":
-                print(Lgc.get_train_info(trains, all=True))
+                print(STATE.snapshot().train_info())
             case "4":
                 try:
                     station1 = str(input("Select a start station: "))
@@ -45,14 +78,83 @@ def main(trains):
                     print("Invalid input!")
                 else:
                     if Lgc.is_station(station1, STATIONS) and Lgc.is_station(station2, STATIONS):
-                        is_reachable = "is reachable" if (Lgc.get_route_info(
-                            STATIONS, station1, station2, timesteps)) else "is not reachable"
+                        reachable, route = Lgc.get_route_info(
+                            STATIONS, station1, station2, timesteps, with_path=True)
+                        is_reachable = "is reachable" if reachable else "is not reachable"
                         print(
                             f"Station {station2} {is_reachable} from station {station1} within {timesteps} timesteps.")
+                        if reachable:
+                            print(f"Route: {' -> '.join(route)}")
+                            probability = Lgc.get_arrival_probability(
+                                STATIONS, station1, station2, timesteps, tick)
+                            print(f"Probability of arriving within {timesteps} timesteps with delays: "
+                                  f"{probability:.1%}")
+                        for steps, transfers, legs in Lgc.get_journeys(
+                                LINES, station1, station2, TRANSFER_PENALTY):
+                            ride = ", ".join(f"line {line} {start} -> {end}" for line, start, end in legs)
+                            print(f"{steps} timesteps with {transfers} transfers: {ride}")
+                    else:
+                        print("Couldn't find one or more of the given stations!")
+            case "5":
+                station = str(input("Select a station: "))
+                if Lgc.is_station(station, STATIONS):
+                    snapshot = STATE.snapshot()
+                    print(f"\nAt station {station}: {sorted(snapshot.trains_at(station))}")
+                    print(f"Arriving at station {station}: {sorted(snapshot.trains_arriving(station))}")
+                    print(f"Departing from station {station}: {sorted(snapshot.trains_departing(station))}")
+                    for direction in ("N", "S"):
+                        board = ", ".join(
+                            f"train {train} (line {snapshot.train(train)[0].line().name()}) in {expected:.1f}"
+                            for expected, train, _ in snapshot.arrivals(station, direction))
+                        print(f"Next arrivals heading {direction}: {board or '-'}")
+                    print()
+                else:
+                    print("Couldn't find the given station!")
+
+            case "6":
+                if PASSENGERS:
+                    print(PASSENGERS.report(trains))
+                else:
+                    print("Start the program with -demand to simulate passengers!")
+
+            case "7":
+                try:
+                    sources = str(input("Select start stations (comma separated): ")).split(",")
+                    timesteps = int(input("Select timesteps: "))
+                except ValueError:
+                    print("Invalid input!")
+                else:
+                    sources = [x.strip() for x in sources]
+                    if all(Lgc.is_station(x, STATIONS) for x in sources):
+                        reachable = Lgc.get_isochrone(STATIONS, sources, timesteps)
+                        print(f"\n{len(reachable)} stations reachable within {timesteps} timesteps:")
+                        for station, steps in reachable.items():
+                            print(f"{station}: {steps}")
+                        print()
                     else:
                         print("Couldn't find one or more of the given stations!")
 
+            case "8":
+                if BLOCKING or PASSENGERS or events:
+                    print("Fast forward is not available with blocking, passengers or events.")
+                    continue
+                try:
+                    turns = int(input("Select timesteps: "))
+                except ValueError:
+                    print("Invalid input!")
+                else:
+                    trains = Lgc.fast_forward(trains, STATIONS, max(turns, 0), tick, STREAMS)
+                    tick += max(turns, 0)
+                    STATE.publish(trains, tick)
+                    if CHECKPOINT:
+                        CHECKPOINT.save(STATIONS, trains, tick)
+                    print(f"Simulated {max(turns, 0)} timesteps, now at timestep {tick}.")
+
             case "q" | "Q":
+                if CHECKPOINT:
+                    CHECKPOINT.save(STATIONS, trains, tick)
+                if events and events.close():
+                    print("Event log failed, the events file is incomplete.")
                 running = False
             case _:
                 print("Invalid input!")
@@ -65,39 +167,72 @@ if __name__ == "__main__":
     # DEBUG: prints out the result of each function
     parser = argparse.ArgumentParser()
     parser.add_argument('-debug', action="store_true")
+    parser.add_argument('-checkpoint', type=str, default="",
+                        help="file to save the simulation to and resume it from")
+    parser.add_argument('-every', type=int, default=100,
+                        help="save the checkpoint every n simulated timesteps")
+    parser.add_argument('-blocking', action="store_true",
+                        help="trains cannot enter a station another train occupies in the same direction")
+    parser.add_argument('-events', type=str, default="",
+                        help="file to write every train move, delay and reversal to")
+    parser.add_argument('-events-format', choices=["jsonl", "binary"], default="jsonl",
+                        help="format of the events file")
+    parser.add_argument('-distances', type=str, default="",
+                        help="directory of the distance tables (e.g. of the network files) for route info")
+    parser.add_argument('-transfer-penalty', type=int, default=0,
+                        help="timesteps a line change counts for when the journeys in route info are compared")
+    parser.add_argument('-seed', type=int, default=None,
+                        help="seed of the trains' random streams, for reproducible simulations")
+    parser.add_argument('-demand', type=str, default="",
+                        help="file of 'origin,destination,passengers per timestep' lines")
     args = parser.parse_args()
     parser.set_defaults(debug=False)
 
     Lgc = lgc(args.debug)
+    TRANSFER_PENALTY = max(args.transfer_penalty, 0)
+    if args.seed is not None:
+        STREAMS = CounterRandom(args.seed)
+    if args.checkpoint:
+        CHECKPOINT = Checkpoint(args.checkpoint, args.every, args.seed)
 
     validated: bool = True
     while validated:
         connections, stations, no_of_trains = Lgc.get_user_input()
 
         try:
-            splitted_connections = Lgc.validate_connections(
-                Lgc.split_data(connections, "connections"))
-
-            splitted_stations = Lgc.validate_stations(
-                Lgc.split_data(stations, "stations"))
+            LINES, STATIONS = Lgc.build_network(connections, stations)
         except ValueError:
             print("Invalid input!")
 
         else:
-            UNIQUE_LINES = Lgc.get_unique_lines(splitted_connections)
-
-            DATA = Lgc.group_stations(splitted_connections, UNIQUE_LINES)
-            DATA = Lgc.create_last_stations(DATA)
-            DATA = Lgc.populate_probabilities(DATA, splitted_stations)
-
-            LINES = Lgc.create_lines(DATA, UNIQUE_LINES)
-
-            STATIONS = Lgc.create_stations(DATA)
-            STATIONS = Lgc.set_station_objects(STATIONS)
-
-            LINES = Lgc.set_line_stations(LINES, STATIONS)
-            STATIONS = Lgc.set_station_line(LINES, STATIONS)
-            TRAINS = Lgc.generate_trains(no_of_trains, STATIONS)
+            TRAINS = Lgc.generate_trains(no_of_trains, STATIONS, STREAMS)
+            TICK: int = 0
+            if CHECKPOINT and CHECKPOINT.exists():
+                try:
+                    CHECKPOINT_TRAINS, CHECKPOINT_TICK = CHECKPOINT.load(STATIONS)
+                except ValueError:
+                    print("Checkpoint does not match the given files and seed, starting a new simulation.")
+                else:
+                    TRAINS, TICK = CHECKPOINT_TRAINS, CHECKPOINT_TICK
+                    print(f"Resumed {len(TRAINS)} trains from checkpoint at timestep {TICK}.")
+            STATE = SimulationState(Lgc.compile_network(STATIONS), TRAINS, TICK)
+            if args.blocking:
+                BLOCKING = TrackBlocking(LINES, TRAINS)
+            if args.distances:
+                try:
+                    Lgc.load_distances(STATIONS, args.distances)
+                except (OSError, ValueError):
+                    print("Distance table could not be loaded, routes are searched instead.")
+            if args.events:
+                EVENTS = EventLog(args.events, Lgc.compile_network(STATIONS), args.events_format)
+                EVENTS.record(TRAINS, TICK - 1)
+            if args.demand:
+                try:
+                    DEMAND = PassengerFlow.parse_demand(Lgc.read_data(args.demand))
+                except FileNotFoundError:
+                    print("Demand file not found, passengers are not simulated.")
+                else:
+                    PASSENGERS = PassengerFlow(CompiledNetwork(STATIONS), DEMAND, len(TRAINS))
 
             TRAINS_INDX = f"[1 - {len(TRAINS)}]"
 
@@ -105,6 +240,6 @@ if __name__ == "__main__":
             # and lines, stations and trains are generated
             # Run the simulation
             if LINES and STATIONS and TRAINS:
-                validated = main(TRAINS)
+                validated = main(TRAINS, TICK)
             else:
                 validated = False
@@ -0,0 +1,46 @@
+import argparse
+import random
+from classes.logic import Logic as lgc
+from classes.render import FrameRenderer, Image
+
+
+if __name__ == "__main__":
+    # Example:
+    # python render.py stockholm_stations stockholm_connections -trains 200 -ticks 500 -out frames
+    # python render.py stockholm_stations stockholm_connections -coordinates stockholm_coordinates \
+    #     -image stockholm-metro-map.jpg  (the map background needs Pillow)
+    parser = argparse.ArgumentParser(description="Render simulated train positions as PNG frames")
+    parser.add_argument('stations', type=str)
+    parser.add_argument('connections', type=str)
+    parser.add_argument('-trains', type=int, default=100)
+    parser.add_argument('-ticks', type=int, default=100)
+    parser.add_argument('-coordinates', type=str, default="",
+                        help="file of 'station,x,y' lines (pixels of the background)")
+    parser.add_argument('-image', type=str, default="", help="background map image")
+    parser.add_argument('-out', type=str, default="frames")
+    parser.add_argument('-workers', type=int, default=0)
+    parser.add_argument('-seed', type=int, default=None)
+    args = parser.parse_args()
+
+    Lgc = lgc()
+    try:
+        stations = Lgc.read_data(args.stations)
+        connections = Lgc.read_data(args.connections)
+        coordinates = FrameRenderer.parse_coordinates(
+            Lgc.read_data(args.coordinates)) if args.coordinates else None
+    except FileNotFoundError:
+        print("File not found!")
+    else:
+        if args.image and Image is None:
+            print("Pillow is not installed, rendering without the map image.")
+        random.seed(args.seed)
+        _, STATIONS = Lgc.build_network(connections, stations)
+        TRAINS = Lgc.generate_trains(args.trains, STATIONS)
+        renderer = FrameRenderer(Lgc.compile_network(STATIONS), coordinates, args.image)
+
+        renderer.record(TRAINS)
+        for tick in range(args.ticks):
+            TRAINS = Lgc.simulate(TRAINS, tick)
+            renderer.record(TRAINS)
+        paths = renderer.render(args.out, args.workers)
+        print(f"Wrote {len(paths)} frames to {args.out}")
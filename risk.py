@@ -0,0 +1,45 @@
+import argparse
+import random
+from classes.logic import Logic as lgc
+from classes.station import Station
+
+
+if __name__ == "__main__":
+    # Example:
+    # python risk.py stockholm_stations stockholm_connections -trains 100 -run 3 -ticks 100 -scale 0.1
+    parser = argparse.ArgumentParser(description="Estimate how likely a train is delayed at consecutive stations")
+    parser.add_argument('stations', type=str)
+    parser.add_argument('connections', type=str)
+    parser.add_argument('-trains', type=int, default=100)
+    parser.add_argument('-run', type=int, default=3, help="number of consecutive delayed stations")
+    parser.add_argument('-ticks', type=int, default=100)
+    parser.add_argument('-scale', type=float, default=1.0, help="delay probability factor")
+    parser.add_argument('-error', type=float, default=0.1,
+                        help="half width of the 95%% confidence interval relative to the estimate")
+    parser.add_argument('-methods', type=str, nargs="+", choices=["ce", "mc"], default=["ce", "mc"],
+                        help="ce: importance sampling tilted by cross-entropy, mc: plain Monte Carlo")
+    parser.add_argument('-seed', type=int, default=0)
+    args = parser.parse_args()
+
+    Lgc = lgc()
+    try:
+        stations = Lgc.read_data(args.stations)
+        connections = Lgc.read_data(args.connections)
+    except FileNotFoundError:
+        print("File not found!")
+    else:
+        _, network = Lgc.build_network(connections, stations)
+        for station in network:
+            station: Station
+            station._delay_probability = min(1.0, station.delay() * args.scale)
+            if station._delay_table:
+                station._delay_table = [min(1.0, x * args.scale) for x in station._delay_table]
+        random.seed(args.seed)
+        trains = Lgc.generate_trains(args.trains, network)
+
+        print(f"{'method':>6} {'estimate':>10} {'95% interval':>23} {'ess':>9} {'samples':>8} {'train steps':>12} {'exact':>10}")
+        for method in args.methods:
+            result = Lgc.get_delay_risk(trains, network, args.run, args.ticks, args.error, method,
+                                        rng=random.Random(args.seed))
+            print(f"{method:>6} {result['estimate']:>10.3e} [{result['low']:>9.3e}, {result['high']:>9.3e}] "
+                  f"{result['ess']:>9.0f} {result['samples']:>8} {result['train_steps']:>12} {result['exact']:>10.3e}")
@@ -0,0 +1,39 @@
+import argparse
+from classes.logic import Logic as lgc
+from classes.sweep import ScenarioSweep
+
+
+if __name__ == "__main__":
+    # Example:
+    # python sweep.py stockholm_stations stockholm_connections -trains 10 100 1000 -scale 0.5 1 2 -close none 13
+    parser = argparse.ArgumentParser(description="Run a grid of simulation scenarios")
+    parser.add_argument('stations', type=str)
+    parser.add_argument('connections', type=str)
+    parser.add_argument('-trains', type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument('-scale', type=float, nargs="+", default=[0.5, 1.0, 2.0],
+                        help="delay probability factors")
+    parser.add_argument('-close', type=str, nargs="+", default=["none"],
+                        help="lines to close, one scenario each, join several with '+' ('none' keeps all)")
+    parser.add_argument('-seeds', type=int, nargs="+", default=[0])
+    parser.add_argument('-ticks', type=int, nargs="+", default=[100])
+    parser.add_argument('-workers', type=int, default=0)
+    parser.add_argument('-cache', type=str, default=".sweep_cache")
+    args = parser.parse_args()
+
+    Lgc = lgc()
+    try:
+        stations = Lgc.read_data(args.stations)
+        connections = Lgc.read_data(args.connections)
+    except FileNotFoundError:
+        print("File not found!")
+    else:
+        closed_lines = [[] if x == "none" else x.split("+") for x in args.close]
+        sweep = ScenarioSweep(connections, stations, args.cache, args.workers)
+        scenarios = sweep.grid(args.trains, args.scale, closed_lines, args.seeds, args.ticks)
+
+        print(f"{'trains':>8} {'scale':>6} {'closed':>10} {'seed':>5} {'ticks':>6} {'delayed':>8}")
+        for result in sweep.run(scenarios):
+            scenario = result["scenario"]
+            closed = "+".join(scenario["closed_lines"]) or "-"
+            print(f"{scenario['trains']:>8} {scenario['delay_scale']:>6} {closed:>10} "
+                  f"{scenario['seed']:>5} {scenario['ticks']:>6} {result['delayed_fraction']:>8.3f}")
@@ -0,0 +1,26 @@
+import os
+from classes.logic import Logic
+from classes.station import Station
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def data(name: str) -> list[str]:
+    """
+    Get the lines of a bundled data file
+    """
+    return Logic().read_data(os.path.join(ROOT, name))
+
+
+def small_network(logic: Logic) -> tuple[list, list[Station]]:
+    """
+    Build the bundled small network
+    """
+    return logic.build_network(data("connections.txt"), data("stations.txt"))
+
+
+def stockholm_network(logic: Logic) -> tuple[list, list[Station]]:
+    """
+    Build the bundled Stockholm network
+    """
+    return logic.build_network(data("stockholm_connections.txt"), data("stockholm_stations.txt"))
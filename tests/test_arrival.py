@@ -0,0 +1,32 @@
+import unittest
+from classes.arrival import ArrivalProbability
+from classes.logic import Logic
+from tests.helpers import data
+
+PROFILES: dict[str, str] = {"Kista": "0-5:4.0;5-11:0.0", "Husby": "0-3:0.0;3-7:3.0", "Hallonbergen": "0-13:2.0"}
+
+
+class ArrivalProbabilityTest(unittest.TestCase):
+
+    def setUp(self):
+        logic = Logic()
+        stations = [line.strip() + ("," + PROFILES[line.split(",")[0]] if line.split(",")[0] in PROFILES else "")
+                    for line in data("stockholm_stations.txt")]
+        _, network = logic.build_network(data("stockholm_connections.txt"), stations)
+        self.arrivals = ArrivalProbability(logic.compile_network(network))
+        self.route = self.arrivals.route("Akalla", "T-Centralen")
+
+    def test_exact_matches_sampling(self):
+        for tick in (None, 0, 4, 100):
+            for timesteps in (10, 14, 18):
+                exact = sum(self.arrivals.distribution(self.route, timesteps, tick))
+                sampled = self.arrivals.sample(self.route, timesteps, tick, samples=20000, seed=1)
+                self.assertAlmostEqual(exact, sampled, delta=0.02, msg=(tick, timesteps))
+
+    def test_profiles_change_the_probability(self):
+        self.assertNotAlmostEqual(self.arrivals.probability("Akalla", "T-Centralen", 14, 0),
+                                  self.arrivals.probability("Akalla", "T-Centralen", 14, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
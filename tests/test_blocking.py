@@ -0,0 +1,36 @@
+import unittest
+from collections import Counter
+from classes.blocking import TrackBlocking
+from classes.compiled import FleetState
+from classes.logic import Logic
+from classes.streams import CounterRandom
+from tests.helpers import stockholm_network
+
+
+class TrackBlockingTest(unittest.TestCase):
+
+    def test_trains_never_enter_an_occupied_station(self):
+        logic = Logic()
+        lines, stations = stockholm_network(logic)
+        network = logic.compile_network(stations)
+        streams = CounterRandom(5)
+        trains = logic.generate_trains(150, stations, streams)
+        blocking = TrackBlocking(lines, trains)
+        fleet = FleetState.from_trains(network, trains)
+        occupied = network.occupancy(fleet)
+        before = Counter((x.station_obj(), x.direction()) for x in trains)
+        for tick in range(60):
+            trains = logic.simulate(trains, tick, blocking, streams)
+            network.step(fleet, tick=tick, occupied=occupied, streams=streams)
+            self.assertEqual(FleetState.from_trains(network, trains).tables(), fleet.tables(), tick)
+            after = Counter((x.station_obj(), x.direction()) for x in trains)
+            for position, count in after.items():
+                self.assertLessEqual(count, max(before[position], 1), tick)
+            before = after
+        rebuilt = TrackBlocking(lines, trains)
+        self.assertEqual(blocking._occupied, rebuilt._occupied)
+        self.assertEqual(list(occupied), list(network.occupancy(fleet)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from classes.board import DepartureBoard
+from classes.logic import Logic
+from classes.streams import CounterRandom
+from tests.helpers import stockholm_network
+
+
+class DepartureBoardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        _, self.stations = stockholm_network(self.logic)
+        self.names = sorted({station.name() for station in self.stations})
+        streams = CounterRandom(11)
+        self.trains = self.logic.generate_trains(80, self.stations, streams)
+        self.board = DepartureBoard(self.stations, self.trains)
+        for tick in range(40):
+            self.trains = self.logic.simulate(self.trains, tick, streams=streams)
+
+    def test_board_matches_rebuild(self):
+        rebuilt = DepartureBoard(self.stations, self.trains)
+        for name in self.names:
+            self.assertEqual([(x[0], x[1].id(), x[2]) for x in self.board.arrivals(name, limit=100)],
+                             [(x[0], x[1].id(), x[2]) for x in rebuilt.arrivals(name, limit=100)], name)
+
+
+if __name__ == "__main__":
+    unittest.main()
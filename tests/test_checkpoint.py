@@ -0,0 +1,88 @@
+import os
+import random
+import struct
+import tempfile
+import unittest
+from classes.checkpoint import Checkpoint
+from classes.logic import Logic
+from tests.helpers import data, small_network, stockholm_network
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        _, self.stations = stockholm_network(self.logic)
+        random.seed(1)
+        self.trains = self.logic.generate_trains(20, self.stations)
+        for tick in range(5):
+            self.trains = self.logic.simulate(self.trains, tick)
+        self.checkpoint = Checkpoint(os.path.join(tempfile.mkdtemp(), "run.bin"))
+        self.checkpoint.save(self.stations, self.trains, 5)
+
+    def state(self, trains):
+        return [(x.id(), x.station_obj(), x.direction(), x.is_delayed()) for x in trains]
+
+    def corrupt(self, offset: int, value: bytes) -> None:
+        with open(self.checkpoint.path(), "r+b") as f:
+            f.seek(offset)
+            f.write(value)
+
+    def test_round_trip(self):
+        expected = random.random()
+        random.seed(99)
+        trains, tick = self.checkpoint.load(self.stations)
+        self.assertEqual(tick, 5)
+        self.assertEqual(self.state(trains), self.state(self.trains))
+        self.assertEqual(random.random(), expected)
+
+    def test_other_network(self):
+        _, stations = small_network(self.logic)
+        with self.assertRaises(ValueError):
+            self.checkpoint.load(stations)
+
+    def test_invalid_station_ids(self):
+        offset = Checkpoint.HEADER.size + Checkpoint.RANDOM_HEADER.size + len(self.trains) * 4
+        for station_id in (len(self.stations), -1):
+            self.corrupt(offset, struct.pack("<i", station_id))
+            with self.assertRaises(ValueError):
+                self.checkpoint.load(self.stations)
+
+    def test_invalid_direction(self):
+        self.corrupt(Checkpoint.HEADER.size + Checkpoint.RANDOM_HEADER.size + len(self.trains) * 8, b"X")
+        with self.assertRaises(ValueError):
+            self.checkpoint.load(self.stations)
+
+    def test_truncated(self):
+        with open(self.checkpoint.path(), "r+b") as f:
+            f.truncate(Checkpoint.HEADER.size + 3)
+        with self.assertRaises(ValueError):
+            self.checkpoint.load(self.stations)
+
+    def test_same_size_other_network(self):
+        # same number of stations, other delays: the station ids must come from the new list
+        lines = [line.replace("0.1", "0.2") for line in data("stockholm_stations.txt")]
+        _, stations = self.logic.build_network(data("stockholm_connections.txt"), lines)
+        self.assertEqual(len(stations), len(self.stations))
+        _, rebuilt = stockholm_network(self.logic)
+        for network in (stations, rebuilt):
+            trains = self.logic.generate_trains(20, network)
+            self.checkpoint.save(network, trains, 1)
+            loaded, _ = self.checkpoint.load(network)
+            self.assertEqual(self.state(loaded), self.state(trains))
+
+    def test_other_seed(self):
+        path = self.checkpoint.path()
+        Checkpoint(path, _seed=7).save(self.stations, self.trains, 5)
+        trains, tick = Checkpoint(path, _seed=7).load(self.stations)
+        self.assertEqual((self.state(trains), tick), (self.state(self.trains), 5))
+        for seed in (8, None):
+            with self.assertRaises(ValueError):
+                Checkpoint(path, _seed=seed).load(self.stations)
+        self.checkpoint.save(self.stations, self.trains, 5)
+        with self.assertRaises(ValueError):
+            Checkpoint(path, _seed=0).load(self.stations)
+
+
+if __name__ == "__main__":
+    unittest.main()
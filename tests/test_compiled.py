@@ -0,0 +1,36 @@
+import unittest
+from classes.logic import Logic
+from classes.station import Station
+from tests.helpers import small_network, stockholm_network
+
+
+class CompiledNetworkTest(unittest.TestCase):
+
+    def check(self, stations: list[Station]) -> None:
+        network = Logic().compile_network(stations)
+        self.assertEqual(network.size(), len(stations))
+        hub_links: dict[int, set[int]] = {}
+        for index, station in enumerate(stations):
+            self.assertEqual(network.id(station), index)
+            self.assertEqual(network.hub_name(network.hub(station.name())), station.name())
+            self.assertEqual(network.line_name(network.table("line")[index]), station.line().name())
+            linked = {network.id(x) for x in stations
+                      if x is station.next_station() or x is station.previous_station()
+                      or x.next_station() is station or x.previous_station() is station}
+            self.assertEqual(set(network.neighbours(index)), linked, station.name())
+            same_name = {network.id(x) for x in stations if x.name() == station.name() and x is not station}
+            self.assertEqual(set(network.transfers(index)), same_name, station.name())
+            hub_links.setdefault(network.hub(station.name()), set()).update(
+                network.hub(stations[x].name()) for x in linked)
+        for hub, links in hub_links.items():
+            self.assertEqual(set(network.hub_neighbours(hub)), links - {hub}, network.hub_name(hub))
+
+    def test_small_network(self):
+        self.check(small_network(Logic())[1])
+
+    def test_stockholm_network(self):
+        self.check(stockholm_network(Logic())[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
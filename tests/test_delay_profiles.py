@@ -0,0 +1,46 @@
+import unittest
+from classes.compiled import FleetState
+from classes.logic import Logic
+from classes.streams import CounterRandom
+from tests.helpers import data
+
+# coprime periods, their common period has more than 10^10 ticks
+PROFILES: dict[str, str] = {
+    "A": "0-10:50.0;10-97:1.0", "B": "5-20:3.0;20-101:1.0", "D": "0-50:0.0;50-103:1.0",
+    "X": "0-7:5.0;7-107:1.0", "Y": "3-9:0.0;9-109:1.0"}
+
+
+class DelayProfileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        stations = [line.strip() + ("," + PROFILES[line.split(",")[0]] if line.split(",")[0] in PROFILES else "")
+                    for line in data("stations.txt")]
+        self.lines, self.stations = self.logic.build_network(data("connections.txt"), stations)
+        self.network = self.logic.compile_network(self.stations)
+
+    def test_long_common_period_is_not_stored(self):
+        self.assertEqual(self.network.delay_period(), 97 * 101 * 103 * 107 * 109)
+        self.assertLess(len(self.network.table("delay_ticks")), 1000)
+
+    def test_delays_match_stations(self):
+        for tick in (0, 5, 96, 97, 1000, 10 ** 12 + 3):
+            row = self.network.delays(tick)
+            for index, station in enumerate(self.network.stations()):
+                self.assertEqual(row[index], station.delay(tick))
+                self.assertEqual(self.network.delay(index, tick), station.delay(tick))
+
+    def test_compiled_step_matches_simulate(self):
+        streams = CounterRandom(3)
+        trains = self.logic.generate_trains(50, self.stations, streams)
+        fleet = FleetState.from_trains(self.network, trains)
+        for tick in range(200):
+            trains = self.logic.simulate(trains, tick, streams=streams)
+            self.network.step(fleet, tick=tick, streams=streams)
+            expected = FleetState.from_trains(self.network, trains)
+            for name in FleetState.TABLES:
+                self.assertEqual(list(fleet.table(name)), list(expected.table(name)))
+
+
+if __name__ == "__main__":
+    unittest.main()
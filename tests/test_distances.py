@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+from classes.distances import DistanceTable
+from classes.logic import Logic
+from tests.helpers import small_network
+
+
+class DistanceTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        _, self.stations = small_network(self.logic)
+        self.network = self.logic.compile_network(self.stations)
+        self.directory = tempfile.mkdtemp()
+
+    def test_matches_search(self):
+        table = DistanceTable.open(self.directory, self.network)
+        try:
+            for hub in range(self.network.hubs()):
+                distances = self.network.hub_distances([hub])
+                self.assertEqual([table.distance(hub, x) for x in range(table.hubs())], list(distances))
+        finally:
+            table.close()
+
+    def test_truncated_file_is_rejected_and_rebuilt(self):
+        path = DistanceTable.path(self.directory, self.network)
+        for content in (b"", b"TRDT\x01", b"TRDT" + bytes(40)):
+            with open(path, "wb") as f:
+                f.write(content)
+            with self.assertRaises(ValueError):
+                DistanceTable(path, self.network)
+            table = DistanceTable.open(self.directory, self.network)
+            self.assertEqual(table.hubs(), self.network.hubs())
+            table.close()
+
+    def test_too_many_hubs(self):
+        limit = DistanceTable.MAX_HUBS
+        DistanceTable.MAX_HUBS = self.network.hubs() - 1
+        try:
+            with self.assertRaises(ValueError):
+                DistanceTable.open(self.directory, self.network)
+        finally:
+            DistanceTable.MAX_HUBS = limit
+        self.assertFalse(os.path.exists(DistanceTable.path(self.directory, self.network)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from classes.compiled import FleetState
+from classes.events import EventLog
+from classes.logic import Logic
+from classes.streams import CounterRandom
+from tests.helpers import stockholm_network
+
+
+class FailingFile:
+    """
+    File whose writes fail, like a full disk
+    """
+
+    def write(self, data: bytes) -> int:
+        raise OSError("No space left on device")
+
+    def close(self) -> None:
+        pass
+
+
+class EventLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory.name, name)
+
+    def test_trains_and_fleet_give_the_same_events(self):
+        logic = Logic()
+        _, network = stockholm_network(logic)
+        compiled = logic.compile_network(network)
+        streams = CounterRandom(3)
+        trains = logic.generate_trains(50, network, streams)
+        from_trains = EventLog(self.path("trains.bin"), compiled, "binary")
+        from_fleet = EventLog(self.path("fleet.bin"), compiled, "binary")
+        lines = EventLog(self.path("trains.jsonl"), compiled)
+        from_trains.record(trains, -1)
+        from_fleet.record_fleet(FleetState.from_trains(compiled, trains), -1)
+        lines.record(trains, -1)
+        moves = 0
+        for tick in range(30):
+            before = [x.station_obj() for x in trains]
+            trains = logic.simulate(trains, tick, streams=streams)
+            moves += sum(x.station_obj() is not y and not x.is_delayed() for x, y in zip(trains, before))
+            from_trains.record(trains, tick)
+            from_fleet.record_fleet(FleetState.from_trains(compiled, trains), tick)
+            lines.record(trains, tick)
+        for log in (from_trains, from_fleet, lines):
+            self.assertIsNone(log.close())
+
+        with open(self.path("trains.bin"), "rb") as trains_file, open(self.path("fleet.bin"), "rb") as fleet_file:
+            self.assertEqual(trains_file.read(), fleet_file.read())
+        with open(self.path("trains.jsonl"), encoding="utf-8") as file:
+            events = [json.loads(line) for line in file]
+        self.assertEqual(sum(x["event"] == "move" for x in events), moves)
+        last = {x["train"]: x["station"] for x in events if x["event"] == "move"}
+        for train in trains:
+            if train.id() in last:
+                self.assertEqual(last[train.id()], train.station_obj().name())
+
+    def test_failed_writer_is_returned_by_close(self):
+        logic = Logic()
+        _, network = stockholm_network(logic)
+        compiled = logic.compile_network(network)
+        trains = logic.generate_trains(10, network, CounterRandom(0))
+        log = EventLog(self.path("events.jsonl"), compiled, _buffer=1)
+        log._file.close()
+        log._file = FailingFile()
+        log.record(trains, -1)
+        trains = logic.simulate(trains, 0)
+        log.record(trains, 0)
+        # the writer keeps running until close(), wait for its error
+        deadline = time.monotonic() + 5
+        while log._error is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with self.assertRaises(OSError):
+            log.record(trains, 1)
+        self.assertIsInstance(log.close(), OSError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import random
+import unittest
+from array import array
+from collections import Counter
+from classes.compiled import FleetState
+from classes.fastforward import FastForward
+from classes.logic import Logic
+from classes.occupancy import StationOccupancy
+from classes.streams import CounterRandom
+from tests.helpers import data, stockholm_network
+
+PROFILES: dict[str, str] = {"Kista": "0-5:4.0;5-11:0.0", "Husby": "0-3:0.0;3-7:3.0"}
+
+
+class FastForwardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        stations = [line.strip() + ("," + PROFILES[line.split(",")[0]] if line.split(",")[0] in PROFILES else "")
+                    for line in data("stockholm_stations.txt")]
+        _, self.profiled = self.logic.build_network(data("stockholm_connections.txt"), stations)
+
+    def state(self, trains) -> list:
+        return [(x.id(), x.station_obj(), x.direction(), x.is_delayed()) for x in trains]
+
+    def test_profiles_step_every_tick(self):
+        random.seed(3)
+        trains = self.logic.generate_trains(40, self.profiled)
+        occupancy = StationOccupancy(self.profiled, trains)
+        state = random.getstate()
+        forwarded = self.state(self.logic.fast_forward(trains, self.profiled, 30, tick=4))
+        rebuilt = StationOccupancy(self.profiled, trains)
+        for name in {x.name() for x in self.profiled}:
+            self.assertEqual(sorted(x.id() for x in occupancy.trains_at(name)),
+                             sorted(x.id() for x in rebuilt.trains_at(name)))
+
+        random.seed(3)
+        trains = self.logic.generate_trains(40, self.profiled)
+        random.setstate(state)
+        for tick in range(4, 34):
+            trains = self.logic.simulate(trains, tick)
+        self.assertEqual(forwarded, self.state(trains))
+
+    def test_streams_replay_matches_simulate(self):
+        streams = CounterRandom(9)
+        trains = self.logic.generate_trains(40, self.profiled, streams)
+        forwarded = self.state(self.logic.fast_forward(trains, self.profiled, 30, 4, streams))
+        trains = self.logic.generate_trains(40, self.profiled, streams)
+        for tick in range(4, 34):
+            trains = self.logic.simulate(trains, tick, streams=streams)
+        self.assertEqual(forwarded, self.state(trains))
+
+    def test_skipped_laps_have_the_stepped_distribution(self):
+        _, stations = stockholm_network(self.logic)
+        network = self.logic.compile_network(stations)
+        forward = FastForward(network)
+        # a state on a lap of about 235 ticks, so whole laps are skipped
+        key, ticks, samples = 1, 800, 2000
+        rng = random.Random(5)
+        skipped = Counter(forward.advance(key, ticks, rng)[0] // 2 for _ in range(samples))
+        fleet = FleetState.from_tables({
+            "id": array("i", range(samples)), "station": array("i", [key // 2]) * samples,
+            "direction": array("b", [key & 1]) * samples, "delayed": array("b", [0]) * samples})
+        for tick in range(ticks):
+            network.step(fleet, rand=rng.random)
+        stepped = Counter(fleet.table("station"))
+        distance = sum(abs(skipped[x] - stepped[x]) for x in set(skipped) | set(stepped)) / (2 * samples)
+        self.assertLess(distance, 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
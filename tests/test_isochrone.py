@@ -0,0 +1,47 @@
+import unittest
+from collections import deque
+from classes.logic import Logic
+from classes.station import Station
+from tests.helpers import stockholm_network
+
+
+class IsochroneTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        _, self.stations = stockholm_network(self.logic)
+        self.names = sorted({station.name() for station in self.stations})
+
+    def breadth_first(self, sources: list[str], timesteps: int) -> dict[str, int]:
+        """
+        Timesteps to every station name over the Station links, changing lines costs nothing
+        """
+        links: dict[str, set[str]] = {}
+        for station in self.stations:
+            for neighbour in (station.next_station(), station.previous_station()):
+                if isinstance(neighbour, Station):
+                    links.setdefault(station.name(), set()).add(neighbour.name())
+                    links.setdefault(neighbour.name(), set()).add(station.name())
+        result: dict[str, int] = {name: 0 for name in sources}
+        queue = deque(sources)
+        while queue:
+            name = queue.popleft()
+            for neighbour in links.get(name, ()):
+                if neighbour not in result and result[name] < timesteps:
+                    result[neighbour] = result[name] + 1
+                    queue.append(neighbour)
+        return result
+
+    def test_matches_breadth_first_search(self):
+        for sources in ([self.names[0]], self.names[::17], ["Kista", "Slussen"]):
+            for timesteps in (0, 1, 4, 12, 100):
+                isochrone = self.logic.get_isochrone(self.stations, sources, timesteps)
+                self.assertEqual(isochrone, self.breadth_first(sources, timesteps), (sources, timesteps))
+                self.assertEqual(list(isochrone.values()), sorted(isochrone.values()))
+
+    def test_unknown_station(self):
+        self.assertEqual(self.logic.get_isochrone(self.stations, ["Nowhere"], 10), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
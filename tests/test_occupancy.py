@@ -0,0 +1,31 @@
+import unittest
+from classes.logic import Logic
+from classes.occupancy import StationOccupancy
+from classes.streams import CounterRandom
+from tests.helpers import stockholm_network
+
+
+class StationOccupancyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        _, self.stations = stockholm_network(self.logic)
+        self.names = sorted({station.name() for station in self.stations})
+        streams = CounterRandom(11)
+        self.trains = self.logic.generate_trains(80, self.stations, streams)
+        self.occupancy = StationOccupancy(self.stations, self.trains)
+        for tick in range(40):
+            self.trains = self.logic.simulate(self.trains, tick, streams=streams)
+
+    def test_occupancy_matches_rebuild(self):
+        rebuilt = StationOccupancy(self.stations, self.trains)
+        for name in self.names:
+            for query in ("trains_at", "trains_arriving", "trains_departing"):
+                for direction in (None, "N", "S"):
+                    self.assertEqual(
+                        sorted(x.id() for x in getattr(self.occupancy, query)(name, direction=direction)),
+                        sorted(x.id() for x in getattr(rebuilt, query)(name, direction=direction)), (name, query))
+
+
+if __name__ == "__main__":
+    unittest.main()
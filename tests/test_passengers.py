@@ -0,0 +1,61 @@
+import unittest
+from classes.compiled import FleetState
+from classes.logic import Logic
+from classes.passengers import PassengerFlow
+from classes.streams import CounterRandom
+from tests.helpers import stockholm_network
+
+DEMAND: list[str] = [
+    "# origin,destination,riders per tick",
+    "Kista,Slussen,2.5",
+    "Husby,Skarpnäck,0.5",
+    "Alvik,Ropsten,1",
+    "Kista,Slussen,0.5",
+    "Kista,Nowhere,1",
+    "Kista,Slussen",
+    "Kista,Alvik,many",
+]
+
+
+class PassengerFlowTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        _, self.stations = stockholm_network(self.logic)
+        self.network = self.logic.compile_network(self.stations)
+
+    def test_parse_demand(self):
+        self.assertEqual(PassengerFlow.parse_demand(DEMAND), {
+            ("Kista", "Slussen"): 3.0, ("Husby", "Skarpnäck"): 0.5,
+            ("Alvik", "Ropsten"): 1.0, ("Kista", "Nowhere"): 1.0})
+
+    def simulate(self, capacity: int) -> tuple[PassengerFlow, PassengerFlow]:
+        """
+        Run a flow stepped with Train objects and one stepped with a FleetState of the same trains
+        """
+        demand = PassengerFlow.parse_demand(DEMAND)
+        streams = CounterRandom(2)
+        trains = self.logic.generate_trains(60, self.stations, streams)
+        by_trains = PassengerFlow(self.network, demand, len(trains), capacity, _seed=4)
+        by_fleet = PassengerFlow(self.network, demand, len(trains), capacity, _seed=4)
+        for tick in range(200):
+            trains = self.logic.simulate(trains, tick, streams=streams)
+            by_trains.step_trains(trains)
+            by_fleet.step(FleetState.from_trains(self.network, trains))
+        return by_trains, by_fleet
+
+    def test_riders_are_conserved(self):
+        for capacity in (0, 5):
+            by_trains, by_fleet = self.simulate(capacity)
+            self.assertEqual(by_trains.queue_lengths(), by_fleet.queue_lengths())
+            self.assertEqual(list(by_trains.train_loads()), list(by_fleet.train_loads()))
+            flow = by_trains
+            self.assertGreater(flow._delivered, 0)
+            self.assertEqual(flow._generated,
+                             flow._delivered + sum(flow.queue_lengths().values()) + sum(flow.train_loads()))
+            if capacity:
+                self.assertLessEqual(max(flow.train_loads()), capacity)
+
+
+if __name__ == "__main__":
+    unittest.main()
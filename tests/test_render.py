@@ -0,0 +1,65 @@
+import struct
+import tempfile
+import unittest
+import zlib
+from classes.logic import Logic
+from classes.render import FrameRenderer, MARKER
+from classes.streams import CounterRandom
+from tests.helpers import stockholm_network
+
+
+def read_png(path: str) -> tuple[int, int, bytes]:
+    """
+    Get width, height and RGB pixels of a PNG written by FrameRenderer, checking every chunk
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    offset, chunks = 8, {}
+    while offset < len(data):
+        length, kind = struct.unpack_from(">I4s", data, offset)
+        body = data[offset + 8:offset + 8 + length]
+        assert struct.unpack_from(">I", data, offset + 8 + length)[0] == zlib.crc32(kind + body)
+        chunks[kind] = chunks.get(kind, b"") + body
+        offset += 12 + length
+    width, height = struct.unpack_from(">II", chunks[b"IHDR"])
+    rows = zlib.decompress(chunks[b"IDAT"])
+    stride = width * 3 + 1
+    assert len(rows) == height * stride and all(rows[row * stride] == 0 for row in range(height))
+    return width, height, b"".join(rows[row * stride + 1:(row + 1) * stride] for row in range(height))
+
+
+class FrameRendererTest(unittest.TestCase):
+
+    def test_frames_show_the_recorded_markers(self):
+        logic = Logic()
+        _, stations = stockholm_network(logic)
+        renderer = FrameRenderer(logic.compile_network(stations))
+        streams = CounterRandom(1)
+        trains = logic.generate_trains(40, stations, streams)
+        for tick in range(12):
+            renderer.record(trains)
+            trains = logic.simulate(trains, tick, streams=streams)
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = renderer.render(directory, workers=3)
+            self.assertEqual(len(paths), renderer.frames())
+            for frame, path in zip(renderer._frames, paths):
+                width, height, pixels = read_png(path)
+                self.assertEqual((width, height), (renderer._width, renderer._height))
+                # colour of every pixel covered by exactly one marker, None where markers overlap
+                covered: dict[int, tuple] = {}
+                for marker in frame:
+                    (x, y), colour = renderer._markers[marker]
+                    for row in range(max(y, 0), min(y + MARKER, height)):
+                        for column in range(max(x, 0), min(x + MARKER, width)):
+                            pixel = row * width + column
+                            covered[pixel] = None if pixel in covered else tuple(colour)
+                expected = bytearray(renderer._background)
+                for pixel, colour in covered.items():
+                    # where markers overlap the one drawn last is shown
+                    expected[pixel * 3:pixel * 3 + 3] = bytes(colour) if colour else pixels[pixel * 3:pixel * 3 + 3]
+                self.assertEqual(bytes(expected), pixels, path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import random
+import unittest
+from classes.compiled import FleetState
+from classes.logic import Logic
+from classes.risk import DelayRisk
+from tests.helpers import stockholm_network
+
+
+class DelayRiskTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        _, self.stations = stockholm_network(self.logic)
+        random.seed(2)
+        self.trains = self.logic.generate_trains(30, self.stations)
+
+    def test_no_trains(self):
+        for method in ("ce", "mc"):
+            result = self.logic.get_delay_risk([], self.stations, 3, 10, 0.1, method)
+            self.assertEqual((result["estimate"], result["exact"], result["samples"]), (0.0, 0.0, 0))
+
+    def test_exact_matches_simulation(self):
+        # the visits of Train objects moved by Logic.simulate, counted like DelayRisk
+        network = self.logic.compile_network(self.stations)
+        fleet = FleetState.from_trains(network, self.trains)
+        risk = DelayRisk(network, 2, 20)
+        exact = sum(risk.exact(station * 2 + direction) for station, direction
+                    in zip(fleet.table("station"), fleet.table("direction"))) / len(self.trains)
+        samples, hits = 3000, 0
+        for _ in range(samples):
+            train = random.choice(self.trains)
+            trains = [type(train)(0, train.line(), train.station_obj(), train.direction())]
+            run, visit_delayed = 0, False
+            for tick in range(20):
+                before = trains[0].station_obj()
+                trains = self.logic.simulate(trains, tick)
+                if trains[0].is_delayed():
+                    if not visit_delayed:
+                        visit_delayed, run = True, run + 1
+                        if run >= 2:
+                            hits += 1
+                            break
+                elif trains[0].station_obj() is not before:
+                    run, visit_delayed = run if visit_delayed else 0, False
+        self.assertAlmostEqual(hits / samples, exact, delta=4 * (exact * (1 - exact) / samples) ** 0.5)
+
+    def test_importance_sampling_covers_exact(self):
+        for station in self.stations:
+            station._delay_probability *= 0.1
+        # a new Logic compiles the changed delays
+        self.logic = Logic()
+        for method in ("ce", "mc"):
+            result = self.logic.get_delay_risk(self.trains, self.stations, 3, 60, 0.1, method,
+                                               rng=random.Random(4))
+            margin = result["high"] - result["low"]
+            self.assertLessEqual(result["low"] - margin, result["exact"])
+            self.assertGreaterEqual(result["high"] + margin, result["exact"])
+            if method == "ce":
+                ce_steps = result["train_steps"]
+            else:
+                self.assertLess(ce_steps, result["train_steps"])
+
+
+if __name__ == "__main__":
+    unittest.main()
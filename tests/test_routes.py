@@ -0,0 +1,78 @@
+import random
+import unittest
+from classes.logic import Logic
+from tests.helpers import data, stockholm_network
+
+
+class RouteInfoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        _, self.stations = stockholm_network(self.logic)
+        self.network = self.logic.compile_network(self.stations)
+
+    def test_reachable_within_hop_distance(self):
+        names = sorted({station.name() for station in self.stations})[::7]
+        for origin in names:
+            distances = self.network.hub_distances([self.network.hub(origin)])
+            for destination in names:
+                steps = distances[self.network.hub(destination)]
+                reachable, route = self.logic.get_route_info(self.stations, origin, destination, steps, True)
+                self.assertTrue(reachable)
+                self.assertEqual(len(route) - 1, steps)
+                self.assertEqual((route[0], route[-1]), (origin, destination))
+                if steps > 0:
+                    self.assertFalse(self.logic.get_route_info(self.stations, origin, destination, steps - 1))
+
+    def test_unknown_station(self):
+        self.assertEqual(self.logic.get_route_info(self.stations, "Nowhere", "Kista", 10, True), (False, []))
+
+
+class JourneysTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        self.lines, stations = stockholm_network(self.logic)
+        self.names = sorted({station.name() for station in stations})
+
+    def ride(self, legs) -> int:
+        """
+        Timesteps of riding the legs, one per station in between
+        """
+        total = 0
+        for name, start, end in legs:
+            stations = [x.name() for x in next(x for x in self.lines if x.name() == name).stations()]
+            total += abs(stations.index(end) - stations.index(start))
+        return total
+
+    def test_penalty_is_not_reported(self):
+        journeys = self.logic.get_journeys(self.lines, "Abrahamsberg", "Bagarmossen", 1)
+        self.assertEqual([(x[0], x[1]) for x in journeys], [(20, 0), (17, 2)])
+
+    def test_penalty_only_prunes_journeys(self):
+        for origin in self.names[::5]:
+            for destination in self.names[::3]:
+                free = self.logic.get_journeys(self.lines, origin, destination)
+                for penalty in (1, 5):
+                    journeys = self.logic.get_journeys(self.lines, origin, destination, penalty)
+                    self.assertTrue(journeys)
+                    for steps, transfers, legs in journeys:
+                        self.assertEqual(steps, self.ride(legs))
+                        self.assertEqual(transfers, max(len(legs) - 1, 0))
+                        self.assertIn((steps, transfers), [(x[0], x[1]) for x in free])
+
+    def test_shuffled_connections_match_hub_distances(self):
+        connections = data("stockholm_connections.txt")
+        random.Random(1).shuffle(connections)
+        lines, stations = self.logic.build_network(connections, data("stockholm_stations.txt"))
+        network = self.logic.compile_network(stations)
+        for origin in self.names[::4]:
+            distances = network.hub_distances([network.hub(origin)])
+            for destination in self.names[::3]:
+                journeys = self.logic.get_journeys(lines, origin, destination)
+                self.assertEqual(min(x[0] for x in journeys), distances[network.hub(destination)],
+                                 (origin, destination))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from classes.logic import Logic
+from classes.shard import ShardedSimulation
+from classes.streams import CounterRandom
+from tests.helpers import data
+
+PROFILES: dict[str, str] = {"Kista": "0-5:4.0;5-11:0.0", "Husby": "0-3:0.0;3-7:3.0"}
+
+
+class ShardedSimulationTest(unittest.TestCase):
+
+    def test_resumed_tick_matches_single_process(self):
+        logic = Logic()
+        connections = data("stockholm_connections.txt")
+        stations = [line.strip() + ("," + PROFILES[line.split(",")[0]] if line.split(",")[0] in PROFILES else "")
+                    for line in data("stockholm_stations.txt")]
+        _, network = logic.build_network(connections, stations)
+        streams = CounterRandom(5)
+        trains = logic.generate_trains(100, network, streams)
+        start = 7
+        with ShardedSimulation(connections, stations, trains, 2, streams=streams, tick=start) as simulation:
+            simulation.advance(20)
+            sharded = [ShardedSimulation.train_state(x) for x in simulation.sync(trains)]
+
+        trains = logic.generate_trains(100, network, streams)
+        for tick in range(start, start + 20):
+            trains = logic.simulate(trains, tick, streams=streams)
+        self.assertEqual(sharded, [ShardedSimulation.train_state(x) for x in trains])
+
+
+if __name__ == "__main__":
+    unittest.main()
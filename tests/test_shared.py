@@ -0,0 +1,45 @@
+import unittest
+from classes.compiled import FleetState
+from classes.logic import Logic
+from classes.shared import SharedPool, SharedState
+from classes.streams import CounterRandom
+from tests.helpers import stockholm_network
+
+
+class SharedStateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        _, stations = stockholm_network(self.logic)
+        self.network = self.logic.compile_network(stations)
+        self.streams = CounterRandom(4)
+        self.fleet = FleetState.from_trains(self.network, self.logic.generate_trains(60, stations, self.streams))
+
+    def tables(self, tables: dict) -> dict:
+        return {name: bytes(table) for name, table in tables.items()}
+
+    def test_attach_sees_the_exported_tables(self):
+        state = SharedState.export(self.network, self.fleet)
+        self.addCleanup(state.close)
+        attached = SharedState.attach(state.descriptor())
+        try:
+            self.assertEqual(self.tables(attached.network().tables()), self.tables(self.network.tables()))
+            self.assertEqual(self.tables(attached.fleet().tables()), self.tables(self.fleet.tables()))
+            # the blocks are shared, not copied
+            attached.fleet().table("station")[0] = self.network.size() - 1
+            self.assertEqual(state.fleet().table("station")[0], self.network.size() - 1)
+        finally:
+            attached.close()
+
+    def test_pool_matches_compiled_step(self):
+        state = SharedState.export(self.network, self.fleet)
+        self.addCleanup(state.close)
+        with SharedPool(state, 2) as pool:
+            pool.advance(15, streams=self.streams)
+        for tick in range(15):
+            self.network.step(self.fleet, tick=tick, streams=self.streams)
+        self.assertEqual(self.tables(state.fleet().tables()), self.tables(self.fleet.tables()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import sys
+import threading
+import time
+import unittest
+from classes.board import DepartureBoard
+from classes.compiled import FleetState
+from classes.logic import Logic
+from classes.occupancy import StationOccupancy
+from classes.snapshot import SimulationState
+from classes.streams import CounterRandom
+from tests.helpers import stockholm_network
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logic = Logic()
+        _, self.stations = stockholm_network(self.logic)
+        self.network = self.logic.compile_network(self.stations)
+        self.names = sorted({station.name() for station in self.stations})
+
+    def test_station_queries_match_indexes(self):
+        streams = CounterRandom(6)
+        trains = self.logic.generate_trains(80, self.stations, streams)
+        occupancy = StationOccupancy(self.stations, trains)
+        board = DepartureBoard(self.stations, trains)
+        state = SimulationState(self.network, trains)
+        for tick in range(25):
+            trains = self.logic.simulate(trains, tick, streams=streams)
+        snapshot = state.publish(trains, 25)
+        for name in self.names:
+            for direction in (None, "N", "S"):
+                for query in ("trains_at", "trains_arriving", "trains_departing"):
+                    self.assertEqual(sorted(getattr(snapshot, query)(name, direction)),
+                                     sorted(x.id() for x in getattr(occupancy, query)(name, direction=direction)),
+                                     (name, direction, query))
+                self.assertEqual(snapshot.arrivals(name, direction, limit=100),
+                                 [(x[0], x[1].id(), x[2]) for x in board.arrivals(name, direction, limit=100)])
+
+    def test_concurrent_readers_see_whole_ticks(self):
+        streams = CounterRandom(8)
+        trains = self.logic.generate_trains(200, self.stations, streams)
+        reference = FleetState.from_trains(self.network, trains)
+        expected = {0: reference.tables()}
+        for tick in range(40):
+            reference = FleetState.from_tables({name: table[:] for name, table in reference.tables().items()})
+            self.network.step(reference, tick=tick, streams=streams)
+            expected[tick + 1] = reference.tables()
+
+        # switch threads often, so the readers query while the writer steps
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        state = SimulationState(self.network, trains)
+        done = threading.Event()
+        seen: list[list] = [[] for _ in range(3)]
+
+        def read(results: list) -> None:
+            while not done.is_set():
+                snapshot = state.snapshot()
+                at = sum(len(snapshot.trains_at(name)) for name in self.names[::10])
+                results.append((snapshot.tick(), {name: bytes(table) for name, table in snapshot.fleet().tables().items()},
+                                at, sum(len(snapshot.trains_at(name)) for name in self.names[::10])))
+
+        readers = [threading.Thread(target=read, args=(x,)) for x in seen]
+        for reader in readers:
+            reader.start()
+        for tick in range(40):
+            draws = iter(streams.uniforms(state.snapshot().fleet().table("id"), tick))
+            state.step(tick, draws.__next__)
+            # let every reader see most ticks
+            deadline = time.monotonic() + 1
+            while any(not x or x[-1][0] <= tick for x in seen) and time.monotonic() < deadline:
+                time.sleep(0.0001)
+        done.set()
+        for reader in readers:
+            reader.join()
+
+        self.assertTrue(all(len({x[0] for x in results}) > 20 for results in seen))
+        for results in seen:
+            for tick, tables, first, second in results:
+                self.assertEqual(first, second)
+                self.assertEqual(tables, {name: bytes(table) for name, table in expected[tick].items()}, tick)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import random
+import unittest
+from classes.logic import Logic
+from classes.streams import CounterRandom, DELAY, DIRECTION, STATION
+from tests.helpers import stockholm_network
+
+
+class CounterRandomTest(unittest.TestCase):
+
+    def test_draw_is_a_function_of_seed_train_and_tick(self):
+        streams = CounterRandom(12)
+        ids = list(range(50))
+        draws = streams.uniforms(ids, 7)
+        self.assertEqual(list(draws), [streams.uniform(x, 7) for x in ids])
+        self.assertEqual(list(draws), [CounterRandom(12).uniform(x, 7) for x in ids])
+        self.assertEqual(list(reversed(streams.uniforms(ids[::-1], 7))), list(draws))
+        self.assertTrue(all(0.0 <= x < 1.0 for x in draws))
+        self.assertNotEqual(list(draws), list(CounterRandom(13).uniforms(ids, 7)))
+        self.assertNotEqual(list(draws), list(streams.uniforms(ids, 8)))
+        self.assertEqual(len({streams.uniform(0, 0, x) for x in (DELAY, STATION, DIRECTION)}), 3)
+
+    def test_draws_are_uniform(self):
+        streams = CounterRandom(1)
+        draws = [x for tick in range(200) for x in streams.uniforms(range(100), tick)]
+        self.assertAlmostEqual(sum(draws) / len(draws), 0.5, delta=0.01)
+        counts = [0] * 10
+        for x in draws:
+            counts[int(x * 10)] += 1
+        self.assertLess(max(abs(x - len(draws) / 10) for x in counts), 0.05 * len(draws) / 10)
+
+    def test_trajectories_do_not_depend_on_train_order(self):
+        logic = Logic()
+        _, stations = stockholm_network(logic)
+        streams = CounterRandom(2)
+        trains = logic.generate_trains(30, stations, streams)
+        shuffled = logic.generate_trains(30, stations, streams)
+        random.Random(0).shuffle(shuffled)
+        for tick in range(40):
+            trains = logic.simulate(trains, tick, streams=streams)
+            shuffled = logic.simulate(shuffled, tick, streams=streams)
+        state = lambda xs: sorted((x.id(), x.station_obj().name(), x.line().name(), x.direction(), x.is_delayed())
+                                  for x in xs)
+        self.assertEqual(state(trains), state(shuffled))
+
+
+if __name__ == "__main__":
+    unittest.main()
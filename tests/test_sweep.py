@@ -0,0 +1,36 @@
+import json
+import os
+import tempfile
+import unittest
+from classes.sweep import ScenarioSweep
+from tests.helpers import data
+
+
+class ScenarioSweepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.connections, self.stations = data("stockholm_connections.txt"), data("stockholm_stations.txt")
+        self.sweep = ScenarioSweep(self.connections, self.stations, self.directory.name, 2)
+        self.scenarios = ScenarioSweep.grid([20], (1.0, 2.0), ((), ("10", "11")), ticks=(30,))
+
+    def test_results_match_single_runs(self):
+        results = self.sweep.run(self.scenarios)
+        self.assertEqual(results, [json.loads(json.dumps(ScenarioSweep.run_scenario(
+            self.connections, self.stations, x))) for x in self.scenarios])
+        self.assertLess(results[1]["stations"], results[0]["stations"])
+
+    def test_cached_results_are_reused(self):
+        self.sweep.run(self.scenarios)
+        self.assertEqual(len(os.listdir(self.directory.name)), len(self.scenarios))
+        path = os.path.join(self.directory.name, self.sweep.key(self.scenarios[0]) + ".json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"cached": True}, f)
+        self.assertEqual(self.sweep.run(self.scenarios)[0], {"cached": True})
+        other = ScenarioSweep(self.connections, self.stations[:-1], self.directory.name, 2)
+        self.assertNotEqual(other.key(self.scenarios[0]), self.sweep.key(self.scenarios[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()